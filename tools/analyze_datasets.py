@@ -1,26 +1,29 @@
 #!/usr/bin/env python3
 """
-Analyze CryptoKitties dataset JSON files to understand data ranges
+Analyze CryptoKitties dataset files to understand data ranges
 and recommend optimal Z-axis settings for 3D visualization.
 
+Scans aggregation JSON, ck_fetch.py NDJSON streams and CKPD binary files
+(*.json, *.ndjson, *.ckpd), all loaded through ck_pedigree.load_dataset.
+
 Usage:
     python3 analyze_datasets.py [directory]
 
 Default directory: current directory
 """
 
-import json
 import sys
 from pathlib import Path
 from collections import defaultdict
 
+from ck_pedigree import load_dataset
+
+DATASET_PATTERNS = ('*.json', '*.ndjson', '*.ckpd')
+
 def analyze_dataset(filepath):
-    """Analyze a single dataset JSON file."""
+    """Analyze a single dataset file."""
     try:
-        with open(filepath, 'r') as f:
-            data = json.load(f)
-
-        kitties = data.get('kitties', [])
+        kitties = list(load_dataset(str(filepath)).kitties())
         if not kitties:
             return None
 
@@ -146,11 +149,11 @@ def main():
         print(f"Error: {directory} is not a directory", file=sys.stderr)
         sys.exit(1)
 
-    # Find all JSON files
-    json_files = sorted(directory.rglob('*.json'))
+    # Find all dataset files
+    json_files = sorted(path for pattern in DATASET_PATTERNS for path in directory.rglob(pattern))
 
     if not json_files:
-        print(f"No JSON files found in {directory}")
+        print(f"No dataset files found in {directory}")
         sys.exit(0)
 
     print("=" * 80)
@@ -13,7 +13,8 @@ WORKFLOW:
 4. Click the "Permalink" button - this captures cam2d/cam3d params automatically
 5. Copy those params to the HTML examples and documentation
 
-Note: The calculated values are estimates based on simulated force-directed layouts.
+Note: The calculated values are estimates based on simulated force-directed layouts
+(ck_layout.py: the 3D viewer's d3-force model, with a seeded, reproducible start).
 The actual viewer uses non-deterministic layouts, so manual tuning via Permalink
 usually produces better results. The script is useful for:
 - Getting initial starting points for new examples
@@ -21,11 +22,15 @@ usually produces better results. The script is useful for:
 - Understanding the relative sizes and characteristics of datasets
 """
 
-import json
 import math
-import random
+import time
 from pathlib import Path
 
+import numpy as np
+
+import ck_pedigree
+from ck_layout import ForceLayout, graph_arrays
+
 EXAMPLES_DIR = Path(__file__).parent.parent / "dist" / "examples"
 
 # Example datasets linked from the examples pane and NOTABLE_KITTIES.md
@@ -67,102 +72,24 @@ EXAMPLES = [
 ]
 
 
-def load_dataset(file_path: str) -> dict | None:
-    """Load a JSON dataset file."""
+def load_dataset(file_path: str) -> list | None:
+    """Load an example's kitties (aggregation JSON, NDJSON or CKPD) through ck_pedigree."""
     full_path = EXAMPLES_DIR / file_path
     if not full_path.exists():
         print(f"  File not found: {full_path}")
         return None
-    with open(full_path) as f:
-        return json.load(f)
+    return list(ck_pedigree.load_dataset(str(full_path)).kitties())
 
 
-def simulate_layout(kitties: list, iterations: int = 100) -> tuple[dict, list]:
+def simulate_layout(kitties: list, fixed_z: list | None = None) -> tuple[list, np.ndarray, int]:
     """
-    Simple force-directed layout simulation.
-    Returns (nodes dict, links list).
+    Force-directed layout with the viewer's force model (ck_layout).
+    Returns (node ids, positions, link count); with fixed_z the layout is 3D
+    with each node's z pinned, as in the 3D viewer.
     """
-    random.seed(42)  # Reproducible results
-
-    nodes = {}
-    links = []
-
-    # Create nodes
-    for k in kitties:
-        node_id = int(k["id"])
-        nodes[node_id] = {
-            "id": node_id,
-            "x": random.uniform(-500, 500),
-            "y": random.uniform(-500, 500),
-            "vx": 0,
-            "vy": 0,
-            "generation": k.get("generation", 0),
-        }
-
-    # Create links
-    for k in kitties:
-        node_id = int(k["id"])
-        matron_id = k.get("matron_id")
-        sire_id = k.get("sire_id")
-
-        if matron_id and int(matron_id) in nodes:
-            links.append({"source": int(matron_id), "target": node_id})
-        if sire_id and int(sire_id) in nodes:
-            links.append({"source": int(sire_id), "target": node_id})
-
-    # Force simulation parameters
-    link_distance = 80
-    charge_strength = -120
-    alpha = 0.3
-    decay = 0.02
-
-    for i in range(iterations):
-        current_alpha = alpha * ((1 - decay) ** i)
-        if current_alpha < 0.001:
-            break
-
-        # Charge force (repulsion)
-        node_ids = list(nodes.keys())
-        for j, id1 in enumerate(node_ids):
-            for id2 in node_ids[j + 1:]:
-                n1, n2 = nodes[id1], nodes[id2]
-                dx = n2["x"] - n1["x"]
-                dy = n2["y"] - n1["y"]
-                dist = math.sqrt(dx * dx + dy * dy) or 1
-                force = charge_strength / (dist * dist) * current_alpha
-                fx = (dx / dist) * force
-                fy = (dy / dist) * force
-                n1["vx"] -= fx
-                n1["vy"] -= fy
-                n2["vx"] += fx
-                n2["vy"] += fy
-
-        # Link force (attraction)
-        for link in links:
-            source = nodes.get(link["source"])
-            target = nodes.get(link["target"])
-            if not source or not target:
-                continue
-
-            dx = target["x"] - source["x"]
-            dy = target["y"] - source["y"]
-            dist = math.sqrt(dx * dx + dy * dy) or 1
-            force = (dist - link_distance) * 0.1 * current_alpha
-            fx = (dx / dist) * force
-            fy = (dy / dist) * force
-            source["vx"] += fx
-            source["vy"] += fy
-            target["vx"] -= fx
-            target["vy"] -= fy
-
-        # Apply velocities with damping
-        for node in nodes.values():
-            node["x"] += node["vx"]
-            node["y"] += node["vy"]
-            node["vx"] *= 0.6
-            node["vy"] *= 0.6
-
-    return nodes, links
+    ids, source, target = graph_arrays(kitties)
+    z = None if fixed_z is None else np.array(fixed_z, dtype=float)
+    return ids, ForceLayout(len(ids), source, target, fixed_z=z).run(), len(source)
 
 
 def get_gem_type(position: int) -> str:
@@ -176,14 +103,13 @@ def get_gem_type(position: int) -> str:
     return "bronze"
 
 
-def calculate_z(kitty: dict, all_kitties: list, mode: str, max_z_spread: float) -> float:
-    """Calculate Z position based on mode."""
+def calculate_z(kitty: dict, gen_bounds: tuple[int, int], mode: str, max_z_spread: float) -> float:
+    """Calculate Z position based on mode (gen_bounds: min and max generation of the dataset)."""
     if mode == "flat":
         return 0
 
     if mode == "generation":
-        gens = [k.get("generation", 0) for k in all_kitties]
-        min_gen, max_gen = min(gens), max(gens)
+        min_gen, max_gen = gen_bounds
         gen_range = max_gen - min_gen
         if gen_range == 0:
             return 0
@@ -192,7 +118,7 @@ def calculate_z(kitty: dict, all_kitties: list, mode: str, max_z_spread: float)
 
     if mode == "birthday":
         # Simplified - just use generation as proxy
-        return calculate_z(kitty, all_kitties, "generation", max_z_spread)
+        return calculate_z(kitty, gen_bounds, "generation", max_z_spread)
 
     if mode == "rarity":
         # Check for mewtation gems
@@ -235,26 +161,20 @@ def calculate_quaternion_looking_down():
 
 def calculate_viewports(example: dict) -> dict | None:
     """Calculate optimal 2D and 3D viewports for an example dataset."""
-    data = load_dataset(example["file"])
-    if not data:
+    kitties = load_dataset(example["file"])
+    if kitties is None:
         return None
-
-    kitties = data.get("kitties", [])
     if not kitties:
         print("  No kitties in dataset")
         return None
 
     # Run 2D simulation
-    nodes, links = simulate_layout(kitties, iterations=150)
+    ids, pos_2d, link_count = simulate_layout(kitties)
 
     # Calculate 2D bounding box and centroid
-    xs = [n["x"] for n in nodes.values()]
-    ys = [n["y"] for n in nodes.values()]
-
-    min_x, max_x = min(xs), max(xs)
-    min_y, max_y = min(ys), max(ys)
-    centroid_x = sum(xs) / len(xs)
-    centroid_y = sum(ys) / len(ys)
+    min_x, min_y = pos_2d.min(axis=0).tolist()
+    max_x, max_y = pos_2d.max(axis=0).tolist()
+    centroid_x, centroid_y = pos_2d.mean(axis=0).tolist()
     width = max_x - min_x
     height = max_y - min_y
 
@@ -266,9 +186,9 @@ def calculate_viewports(example: dict) -> dict | None:
     zoom_2d = min(zoom_x, zoom_y, 2.0)  # Cap at 2.0
     zoom_2d = max(0.1, zoom_2d)  # Floor at 0.1
 
-    # Calculate 3D positions
+    # Calculate 3D positions: Z from the viewer's Z-axis mode, x/y from a 3D layout with Z pinned
     z_axis_mode = example.get("zAxis", "generation")
-    node_count = len(nodes)
+    node_count = len(ids)
     if node_count > 500:
         max_z_spread = 1000
     elif node_count < 50:
@@ -276,29 +196,15 @@ def calculate_viewports(example: dict) -> dict | None:
     else:
         max_z_spread = 800
 
-    positions_3d = []
-    for k in kitties:
-        node = nodes.get(int(k["id"]))
-        if not node:
-            continue
-        z = calculate_z(k, kitties, z_axis_mode, max_z_spread)
-        positions_3d.append({"x": node["x"], "y": node["y"], "z": z})
+    gens = [k.get("generation", 0) for k in kitties]
+    gen_bounds = (min(gens), max(gens))
+    z_by_id = {int(k["id"]): calculate_z(k, gen_bounds, z_axis_mode, max_z_spread) for k in kitties}
+    _, positions_3d, _ = simulate_layout(kitties, [z_by_id[i] for i in ids])
 
-    if not positions_3d:
-        return None
-
-    centroid_3d_x = centroid_x
-    centroid_3d_y = centroid_y
-    centroid_3d_z = sum(p["z"] for p in positions_3d) / len(positions_3d)
+    centroid_3d_x, centroid_3d_y, centroid_3d_z = positions_3d.mean(axis=0).tolist()
 
     # Calculate 3D bounding sphere radius
-    max_dist = 0
-    for pos in positions_3d:
-        dx = pos["x"] - centroid_3d_x
-        dy = pos["y"] - centroid_3d_y
-        dz = pos["z"] - centroid_3d_z
-        dist = math.sqrt(dx * dx + dy * dy + dz * dz)
-        max_dist = max(max_dist, dist)
+    max_dist = float(np.sqrt(((positions_3d - positions_3d.mean(axis=0)) ** 2).sum(axis=1)).max())
 
     # Calculate optimal 3D camera position (from above, looking down at centroid)
     fov = 75 * math.pi / 180  # Default FOV
@@ -312,20 +218,23 @@ def calculate_viewports(example: dict) -> dict | None:
     # Get quaternion for looking down from +Y with up=+Z (proper kitty orientation)
     quat = calculate_quaternion_looking_down()
 
-    z_values = [p["z"] for p in positions_3d]
+    z_values = positions_3d[:, 2]
+
+    def r(value: float, digits: int) -> float:
+        return round(value, digits) + 0.0  # no -0.0 in the URL params
 
     return {
-        "node_count": len(nodes),
-        "link_count": len(links),
+        "node_count": node_count,
+        "link_count": link_count,
         "cam2d": {
             "zoom": round(zoom_2d, 3),
-            "x": round(centroid_x, 1),
-            "y": round(centroid_y, 1),
+            "x": r(centroid_x, 1),
+            "y": r(centroid_y, 1),
         },
         "cam3d": {
-            "x": round(cam_x, 1),
-            "y": round(cam_y, 1),
-            "z": round(cam_z, 1),
+            "x": r(cam_x, 1),
+            "y": r(cam_y, 1),
+            "z": r(cam_z, 1),
             "quatX": round(quat["x"], 4),
             "quatY": round(quat["y"], 4),
             "quatZ": round(quat["z"], 4),
@@ -335,7 +244,7 @@ def calculate_viewports(example: dict) -> dict | None:
         "stats": {
             "width": round(width),
             "height": round(height),
-            "z_range": round(max(z_values) - min(z_values)) if z_values else 0,
+            "z_range": round(float(z_values.max() - z_values.min())),
             "bounding_sphere_radius": round(max_dist),
         },
     }
@@ -358,10 +267,12 @@ def main():
 
     for example in EXAMPLES:
         print(f"📊 {example['name']} ({example['file']})")
+        t0 = time.perf_counter()
         viewport = calculate_viewports(example)
+        elapsed = time.perf_counter() - t0
 
         if viewport:
-            print(f"   Nodes: {viewport['node_count']}, Links: {viewport['link_count']}")
+            print(f"   Nodes: {viewport['node_count']}, Links: {viewport['link_count']} (layout {elapsed:.2f} s)")
             print(f"   Bounds: {viewport['stats']['width']}x{viewport['stats']['height']}, Z-range: {viewport['stats']['z_range']}")
             print(f"   cam2d={format_cam2d(viewport['cam2d'])}")
             print(f"   cam3d={format_cam3d(viewport['cam3d'])}")
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Local inverted index of alleles: who carries a trait, and how many do.
+
+AlleleIndex maps (trait category, allele position, kai character) to a posting
+list: the sorted slots of every kitty with that allele at that position
+(d = expressed, r1-r3 = recessive). It is built from the (N, 12, 4) allele
+array of ck_genome in one stable sort per (trait, position), stored CSR-style
+like the child lists of ck_pedigree:
+
+- order     (12, 4, M) int32   kitty slots grouped by allele value, ascending
+                               within each group (M = kitties with genes)
+- offsets   (12, 4, 33) int64  postings of value v are
+                               order[t, p, offsets[t, p, v]:offsets[t, p, v + 1]]
+
+Single-term counts come straight from the offsets. Postings are sorted slot
+arrays, so intersection(), union() and index.complement() (NOT, relative to
+the kitties with genes) combine them; index.ids() maps slots to kitty ids.
+
+Usage from a tool:
+    from ck_allele_index import AlleleIndex, intersection
+
+    index = AlleleIndex.from_pedigree(ped, decode_alleles(ped))
+    index.count('body', 'w')                        # expressed liger
+    hits = intersection(index.trait('liger', 'any'), index.complement(index.tier('I')))
+    index.ids(hits)
+
+Query a dataset (terms are trait names or tier:I-IIII, optionally @d/@r1/@r2/@r3/@any):
+    python3 ck_allele_index.py ../dist/examples/tier_iiii/tier_iiii.json --and liger
+    python3 ck_allele_index.py kitties.json --and tier:IIII --not liger --count
+    python3 ck_allele_index.py kitties.json --or liger@any moonrise@any --ids-only
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from functools import reduce
+from typing import Iterable, List, Optional, Union
+
+import numpy as np
+
+from ck_genome import SLOTS, TRAITS, column, decode_alleles, genes_mask
+from ck_pedigree import Pedigree, load_dataset
+from ck_traits import KAI, TRAIT_NAMES, find_trait_genes, get_mewtation_tier
+
+POSITIONS = ('d', 'r1', 'r2', 'r3')
+ANY = 'any'
+
+Position = Union[int, str, None]  # 0-3, 'd'/'r1'/'r2'/'r3', or None/'any' for every position
+
+
+def intersection(*postings: np.ndarray) -> np.ndarray:
+    """Slots in every posting list (AND)."""
+    return reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), postings)
+
+
+def union(*postings: np.ndarray) -> np.ndarray:
+    """Slots in any posting list (OR)."""
+    if len(postings) == 1:
+        return postings[0]
+    return np.unique(np.concatenate(postings)) if postings else np.empty(0, dtype=np.int32)
+
+
+def _positions(position: Position) -> List[int]:
+    if position is None or position == ANY:
+        return list(range(SLOTS))
+    if isinstance(position, str):
+        return [POSITIONS.index(position)]
+    return [position]
+
+
+def _trait_index(trait: Union[int, str]) -> int:
+    return trait if isinstance(trait, int) else TRAIT_NAMES.index(trait)
+
+
+def _value(allele: Union[int, str]) -> int:
+    return allele if isinstance(allele, int) else KAI.index(allele)
+
+
+class AlleleIndex:
+    """Inverted (trait, position, allele) -> kitty slot index; see the module docstring."""
+
+    def __init__(self, ids: np.ndarray, alleles: np.ndarray, mask: Optional[np.ndarray] = None) -> None:
+        self.slot_ids = ids
+        self.universe = np.nonzero(mask)[0].astype(np.int32) if mask is not None else np.arange(len(ids), dtype=np.int32)
+        values = alleles[self.universe]
+
+        m = len(self.universe)
+        self.order = np.empty((TRAITS, SLOTS, m), dtype=np.int32)
+        self.offsets = np.zeros((TRAITS, SLOTS, len(KAI) + 1), dtype=np.int64)
+        for t in range(TRAITS):
+            for p in range(SLOTS):
+                col = values[:, t, p]
+                self.order[t, p] = self.universe[np.argsort(col, kind='stable')]
+                self.offsets[t, p, 1:] = np.cumsum(np.bincount(col, minlength=len(KAI)))
+
+    @classmethod
+    def from_pedigree(cls, ped: Pedigree, alleles: np.ndarray) -> "AlleleIndex":
+        """Index every kitty of a pedigree that has genes."""
+        return cls(column(ped.ids, np.int64), alleles, genes_mask(ped))
+
+    def __len__(self) -> int:
+        return len(self.universe)
+
+    def postings(self, trait: Union[int, str], allele: Union[int, str], position: Position = 0) -> np.ndarray:
+        """Sorted slots with the allele at the position (any of the four for None/'any')."""
+        t, v = _trait_index(trait), _value(allele)
+        lists = [self.order[t, p, self.offsets[t, p, v]:self.offsets[t, p, v + 1]] for p in _positions(position)]
+        return lists[0] if len(lists) == 1 else union(*lists)
+
+    def count(self, trait: Union[int, str], allele: Union[int, str], position: Position = 0) -> int:
+        """Number of kitties with the allele at the position; O(1) for a single position."""
+        t, v = _trait_index(trait), _value(allele)
+        positions = _positions(position)
+        if len(positions) == 1:
+            p = positions[0]
+            return int(self.offsets[t, p, v + 1] - self.offsets[t, p, v])
+        return len(self.postings(t, v, position))
+
+    def counts(self, trait: Union[int, str], position: int = 0) -> np.ndarray:
+        """(32,) kitty counts per allele value at one position."""
+        return np.diff(self.offsets[_trait_index(trait), position])
+
+    def first_slots(self, trait: Union[int, str], position: int = 0) -> np.ndarray:
+        """(32,) lowest slot with each allele value at one position, -1 if none."""
+        t = _trait_index(trait)
+        starts, stops = self.offsets[t, position, :-1], self.offsets[t, position, 1:]
+        first = np.full(len(KAI), -1, dtype=np.int64)
+        present = stops > starts
+        first[present] = self.order[t, position, starts[present]]
+        return first
+
+    def trait(self, name: str, position: Position = 0) -> np.ndarray:
+        """Slots with a named trait (e.g. 'liger') at the position."""
+        genes = find_trait_genes(name)
+        if not genes:
+            raise ValueError(f"Unknown trait: {name}")
+        return union(*(self.postings(t, char, position) for t, char in genes))
+
+    def tier(self, tier: str, traits: Optional[Iterable[Union[int, str]]] = None, position: Position = 0) -> np.ndarray:
+        """Slots with any allele of a mewtation tier ('base', 'I'-'IIII') at the position, in the given traits."""
+        values = [v for v, char in enumerate(KAI) if get_mewtation_tier(char) == tier]
+        if not values:
+            raise ValueError(f"Unknown tier: {tier}")
+        traits = range(TRAITS) if traits is None else traits
+        return union(*(self.postings(t, v, position) for t in traits for v in values))
+
+    def complement(self, postings: np.ndarray) -> np.ndarray:
+        """Indexed slots not in the posting list (NOT)."""
+        return np.setdiff1d(self.universe, postings, assume_unique=True)
+
+    def ids(self, postings: np.ndarray) -> List[int]:
+        """Kitty ids of a posting list, ascending by slot."""
+        return self.slot_ids[postings].tolist()
+
+    def term(self, term: str) -> np.ndarray:
+        """Postings of a query term: TRAIT_NAME or tier:TIER, optionally @d/@r1/@r2/@r3/@any (default @d)."""
+        name, _, position = term.partition('@')
+        position = position or 'd'
+        if position != ANY and position not in POSITIONS:
+            raise ValueError(f"Unknown position in {term!r} (use d, r1, r2, r3 or any)")
+        if name.startswith('tier:'):
+            return self.tier(name[len('tier:'):], position=position)
+        return self.trait(name, position)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Query a dataset's allele index (local rare-trait search)")
+    parser.add_argument("path", help="Aggregation JSON, NDJSON or CKPD file")
+    parser.add_argument("--and", dest="all_of", nargs="+", default=[], metavar="TERM", help="Kitties matching every term")
+    parser.add_argument("--or", dest="any_of", nargs="+", default=[], metavar="TERM", help="Kitties matching at least one term")
+    parser.add_argument("--not", dest="none_of", nargs="+", default=[], metavar="TERM", help="Exclude kitties matching any term")
+    parser.add_argument("--count", action="store_true", help="Print only the number of matches")
+    parser.add_argument("--ids-only", action="store_true", help="Print only comma-separated ids")
+    parser.add_argument("--limit", type=int, default=20, help="Max kitties listed (default 20)")
+    args = parser.parse_args()
+
+    ped = load_dataset(args.path)
+    t0 = time.perf_counter()
+    index = AlleleIndex.from_pedigree(ped, decode_alleles(ped))
+    t1 = time.perf_counter()
+
+    try:
+        hits = index.universe
+        if args.all_of:
+            hits = intersection(hits, *(index.term(t) for t in args.all_of))
+        if args.any_of:
+            hits = intersection(hits, union(*(index.term(t) for t in args.any_of)))
+        if args.none_of:
+            hits = np.setdiff1d(hits, union(*(index.term(t) for t in args.none_of)), assume_unique=True)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    t2 = time.perf_counter()
+
+    if args.count:
+        print(len(hits))
+        return 0
+    ids = index.ids(hits)
+    if args.ids_only:
+        print(",".join(str(i) for i in ids))
+        return 0
+
+    print(f"Indexed {len(index)} kitties in {(t1 - t0) * 1000:.1f} ms; query took {(t2 - t1) * 1000:.2f} ms")
+    print(f"{len(ids)} matching kitties")
+    for slot in hits[:args.limit].tolist():
+        k = ped.record(slot)
+        print(f"  #{ped.ids[slot]:>7}  {k.get('name') or 'unnamed':<25} Gen {k.get('generation', '?')}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
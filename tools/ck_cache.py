@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Persistent on-disk cache for CryptoKitties API kitty payloads.
+
+Shared by ck_fetch.py, find_shortest_path.py, trace_dragon_ancestry.py and
+find_rare_traits.py so overlapping crawls reuse `/v3/kitties/{id}` responses
+instead of re-downloading them.
+
+Storage
+- One SQLite database (kitties.sqlite) under --cache-dir (default tools/data/cache)
+- Keyed by kitty id, payload stored as zlib-compressed JSON
+- Entries older than --cache-ttl are treated as misses (and evicted)
+- When the cache grows past --cache-max-mb, least recently used entries are evicted
+- --offline never touches the network: misses become errors, stale entries are still served
+- Children lists are stored per parent (table children) with the highest child id seen;
+  ck_fetch.py uses it as a watermark and only pages through children born since
+- Kitties taken from batched ?search= responses are stored too, marked with
+  SOURCE_KEY = "search": batched fetches reuse them, single fetches (which want the
+  full /kitties/{id} payload) treat them as misses and overwrite them
+
+Usage from a tool:
+    from ck_cache import add_cache_args, cache_from_args
+
+    add_cache_args(parser)
+    args = parser.parse_args()
+    cache = cache_from_args(args)  # None unless --cache-dir or --offline was given
+
+Inspect or clear a cache:
+    python3 ck_cache.py
+    python3 ck_cache.py --cache-dir /tmp/ck-cache --clear
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_CACHE_DIR = Path(__file__).parent / "data" / "cache"
+DEFAULT_TTL_S = 30 * 24 * 3600
+DEFAULT_MAX_MB = 512
+DB_FILENAME = "kitties.sqlite"
+
+# Run eviction after this many writes (and on close)
+EVICT_EVERY_PUTS = 500
+
+# Payload key marking kitties that came from a list/search response rather than /kitties/{id}
+SOURCE_KEY = "_ck_source"
+SEARCH_SOURCE = "search"
+
+
+def is_search_payload(payload: Dict[str, Any]) -> bool:
+    return payload.get(SOURCE_KEY) == SEARCH_SOURCE
+
+
+def mark_search_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a ?search= list item, marked so it is never mistaken for a /kitties/{id} payload."""
+    return {**payload, SOURCE_KEY: SEARCH_SOURCE}
+
+
+class OfflineCacheMiss(RuntimeError):
+    """Raised when --offline is set and the requested kitty is not cached."""
+
+
+class KittyCache:
+    """Thread-safe SQLite key/value store of kitty payloads keyed by kitty id."""
+
+    def __init__(
+        self,
+        cache_dir: str | Path = DEFAULT_CACHE_DIR,
+        ttl_s: float = DEFAULT_TTL_S,
+        max_mb: float = DEFAULT_MAX_MB,
+        offline: bool = False,
+    ) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.ttl_s = ttl_s
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self._puts_since_evict = 0
+        self._lock = threading.Lock()
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.cache_dir / DB_FILENAME
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS kitties ("
+            " id INTEGER PRIMARY KEY,"
+            " payload BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS kitties_accessed ON kitties(accessed_at)")
+        # Children only ever grow, so these never expire; the watermark makes refreshing them cheap
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS children ("
+            " parent_id INTEGER PRIMARY KEY,"
+            " max_child_id INTEGER NOT NULL,"
+            " child_ids BLOB NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        logging.info("kitty cache: %s (ttl=%ss offline=%s)", self.path, int(ttl_s), offline)
+
+    def _fresh(self, fetched_at: float, now: float) -> bool:
+        # Offline runs prefer stale data over no data
+        return self.offline or self.ttl_s <= 0 or now - fetched_at <= self.ttl_s
+
+    def get(self, kitty_id: int, accept_search: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached payload, or None when missing or expired.
+
+        Search-sourced entries only count unless accept_search is set (or the
+        cache is offline, where a thinner payload beats none).
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT payload, fetched_at FROM kitties WHERE id = ?", (int(kitty_id),)
+            ).fetchone()
+            if row is None or not self._fresh(row[1], now):
+                self.misses += 1
+                return None
+            payload = json.loads(zlib.decompress(row[0]))
+            if is_search_payload(payload) and not (accept_search or self.offline):
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE kitties SET accessed_at = ? WHERE id = ?", (now, int(kitty_id)))
+            self.hits += 1
+        return payload
+
+    def get_many(self, kitty_ids: Iterable[int], accept_search: bool = False) -> Dict[int, Dict[str, Any]]:
+        """Return {id: payload} for every fresh cached id."""
+        out: Dict[int, Dict[str, Any]] = {}
+        for kid in kitty_ids:
+            payload = self.get(kid, accept_search)
+            if payload is not None:
+                out[int(kid)] = payload
+        return out
+
+    def put(self, kitty_id: int, payload: Dict[str, Any]) -> None:
+        blob = zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO kitties (id, payload, size, fetched_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (int(kitty_id), blob, len(blob), now, now),
+            )
+            self._puts_since_evict += 1
+            if self._puts_since_evict >= EVICT_EVERY_PUTS:
+                self._evict_locked()
+
+    def get_children(self, parent_id: int) -> Optional[List[int]]:
+        """Return the stored child ids of parent_id (ascending), or None if never stored."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT child_ids FROM children WHERE parent_id = ?", (int(parent_id),)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]))
+
+    def put_children(self, parent_id: int, child_ids: List[int]) -> None:
+        blob = zlib.compress(json.dumps(sorted(child_ids), separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO children (parent_id, max_child_id, child_ids, updated_at) VALUES (?, ?, ?, ?)",
+                (int(parent_id), max(child_ids, default=0), blob, time.time()),
+            )
+
+    def iter_kitties(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield (id, payload) for every cached kitty, fresh or not, without touching access times."""
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT id, payload FROM kitties WHERE id > ? ORDER BY id LIMIT 1000", (last,)
+                ).fetchall()
+            if not rows:
+                return
+            for kid, blob in rows:
+                yield kid, json.loads(zlib.decompress(blob))
+            last = rows[-1][0]
+
+    def iter_children(self) -> Iterator[Tuple[int, List[int]]]:
+        """Yield (parent_id, child_ids) for every stored children list."""
+        with self._lock:
+            rows = self._db.execute("SELECT parent_id, child_ids FROM children ORDER BY parent_id").fetchall()
+        for parent_id, blob in rows:
+            yield parent_id, json.loads(zlib.decompress(blob))
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones beyond the size cap."""
+        with self._lock:
+            return self._evict_locked()
+
+    def _evict_locked(self) -> int:
+        self._puts_since_evict = 0
+        removed = 0
+        if self.ttl_s > 0 and not self.offline:
+            cur = self._db.execute("DELETE FROM kitties WHERE fetched_at < ?", (time.time() - self.ttl_s,))
+            removed += cur.rowcount
+
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM kitties").fetchone()[0]
+        if self.max_bytes > 0 and total > self.max_bytes:
+            excess = total - self.max_bytes
+            doomed = []
+            for kid, size in self._db.execute("SELECT id, size FROM kitties ORDER BY accessed_at"):
+                if excess <= 0:
+                    break
+                doomed.append((kid,))
+                excess -= size
+            self._db.executemany("DELETE FROM kitties WHERE id = ?", doomed)
+            removed += len(doomed)
+
+        if removed:
+            logging.info("kitty cache: evicted %d entries", removed)
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM kitties")
+            self._db.execute("DELETE FROM children")
+            self._db.execute("VACUUM")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM kitties").fetchone()
+            parents = self._db.execute("SELECT COUNT(*) FROM children").fetchone()[0]
+        return {
+            "path": str(self.path),
+            "entries": count,
+            "payload_bytes": size,
+            "children_lists": parents,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if not self.offline:
+                self._evict_locked()
+            self._db.close()
+
+
+def cached_fetch(
+    cache: Optional[KittyCache],
+    kitty_id: int,
+    fetch: Callable[[int], Optional[Dict[str, Any]]],
+) -> Optional[Dict[str, Any]]:
+    """
+    Return a kitty payload from the cache, falling back to fetch(kitty_id).
+
+    Successful fetches are written back. In offline mode a miss raises
+    OfflineCacheMiss instead of calling fetch.
+    """
+    if cache is not None:
+        payload = cache.get(kitty_id)
+        if payload is not None:
+            return payload
+        if cache.offline:
+            raise OfflineCacheMiss(f"kitty {kitty_id} not in cache (offline)")
+
+    payload = fetch(kitty_id)
+    if cache is not None and payload is not None:
+        cache.put(kitty_id, payload)
+    return payload
+
+
+def add_cache_args(parser: argparse.ArgumentParser, cache_dir_help: str = "") -> None:
+    """Add the shared --cache-dir/--cache-ttl/--cache-max-mb/--offline flags (cache_dir_help extends --cache-dir's help)."""
+    group = parser.add_argument_group("response cache")
+    group.add_argument(
+        "--cache-dir",
+        nargs="?",
+        const=str(DEFAULT_CACHE_DIR),
+        default=None,
+        help=f"Cache kitty API responses on disk (default dir when flag is given: {DEFAULT_CACHE_DIR}){cache_dir_help}",
+    )
+    group.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_TTL_S / 3600,
+        help=f"Hours before a cached kitty is refetched (default {DEFAULT_TTL_S // 3600}, 0 = never expire)",
+    )
+    group.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=DEFAULT_MAX_MB,
+        help=f"Evict least recently used entries beyond this size (default {DEFAULT_MAX_MB})",
+    )
+    group.add_argument(
+        "--offline",
+        action="store_true",
+        help="Serve kitties from the cache only and never touch the network (implies --cache-dir)",
+    )
+
+
+def cache_from_args(args: argparse.Namespace) -> Optional[KittyCache]:
+    """Open the cache requested on the command line, or None when caching is off."""
+    cache_dir = args.cache_dir
+    if cache_dir is None and args.offline:
+        cache_dir = str(DEFAULT_CACHE_DIR)
+    if cache_dir is None:
+        return None
+    return KittyCache(
+        cache_dir=os.path.expanduser(cache_dir),
+        ttl_s=max(0.0, args.cache_ttl) * 3600,
+        max_mb=max(0.0, args.cache_max_mb),
+        offline=args.offline,
+    )
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Inspect or clear the shared kitty response cache.")
+    add_cache_args(ap)
+    ap.add_argument("--evict", action="store_true", help="Run TTL/size eviction now")
+    ap.add_argument("--clear", action="store_true", help="Delete every cached entry")
+    args = ap.parse_args()
+
+    if args.cache_dir is None:
+        args.cache_dir = str(DEFAULT_CACHE_DIR)
+    cache = cache_from_args(args)
+
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {cache.path}")
+    if args.evict:
+        print(f"Evicted {cache.evict()} entries")
+
+    stats = cache.stats()
+    print(f"Cache: {stats['path']}")
+    print(f"Entries: {stats['entries']}  Size: {stats['payload_bytes'] / 1024 / 1024:.1f} MB")
+    print(f"Children lists: {stats['children_lists']}")
+    cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
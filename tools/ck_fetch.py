@@ -8,6 +8,12 @@ What it does
   - parents (matron + sire) up to --parents levels
   - children up to --children levels
 - Optionally, when discovering children, also fetch some parent levels for each child via --child-parent-levels
+- Optionally expands each BFS depth level concurrently via --workers, and fetches each
+  level's unseen kitties in comma-joined id batches via --batch-size
+- Paces all requests with one adaptive token bucket (--max-rps): it slows down on 429s,
+  honours Retry-After and speeds back up while the API stays healthy
+- Optionally checkpoints the crawl (--checkpoint) so a killed run can continue with --resume
+  without refetching anything it already has
 - Computes:
   - kitty_color (prefers API background_color; else uses color-name palette parsed from CK CSS; else None)
   - shadow_color (derived from kitty_color by darken or lighten)
@@ -15,6 +21,8 @@ What it does
   - config, root_ids, counts, errors
   - included_by (why each kitty was included)
   - kitties (normalized objects with raw API payload attached)
+  or, with --format ndjson, streams the same content one record per line while crawling,
+  or, with --format ckpd, writes it as a CKPD binary file (ck_pedigree.py)
 
 Modes
 - Default (recursive): Fetches parents/children via separate API calls
@@ -33,6 +41,18 @@ Examples
   python3 ck_fetch.py --ids "1,4,18" --embedded-only -v --out founders.json
 - From ids-file:
   python3 ck_fetch.py --ids-file my_kitties_ids.txt --parents 4 --children 2 -vv --out ck.json
+- Concurrent (8 workers, at most 10 requests/second overall):
+  python3 ck_fetch.py --ids "124653" --parents 4 --children 2 --workers 8 --max-rps 10 --out ck.json
+- Deep parent crawl with batched requests (up to 50 ids per request):
+  python3 ck_fetch.py --ids "124653" --parents 10 --children 0 --batch-size 50 --out ck.json
+- Long crawl that can be killed and continued (checkpoint files: ck.json.ckpt.*):
+  python3 ck_fetch.py --ids-file big.txt --parents 6 --children 3 --checkpoint --out ck.json
+  python3 ck_fetch.py --ids-file big.txt --parents 6 --children 3 --resume --out ck.json
+- Stream a large crawl as NDJSON, then convert it to the classic JSON:
+  python3 ck_fetch.py --ids-file big.txt --parents 6 --children 3 --format ndjson --out ck.ndjson
+  python3 ck_fetch.py --from-ndjson ck.ndjson --out ck.json
+- Binary CKPD output, memory-mapped by the analysis tools instead of parsed:
+  python3 ck_fetch.py --ids "124653" --parents 4 --children 2 --format ckpd --out ck.ckpd
 """
 
 from __future__ import annotations
@@ -43,12 +63,31 @@ import json
 import logging
 import os
 import re
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, asdict
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 from urllib.parse import urlencode
 
-import requests
+from ck_cache import (
+    KittyCache,
+    OfflineCacheMiss,
+    add_cache_args,
+    cache_from_args,
+    cached_fetch,
+    mark_search_payload,
+)
+from ck_http import (
+    DEFAULT_KEEPALIVE_S,
+    DEFAULT_POOL_SIZE,
+    RateLimiter,
+    add_http_args,
+    get_with_retry,
+    make_session,
+)
+from ck_pedigree import Pedigree, read_ndjson
 
 API_BASE = "https://api.cryptokitties.co/v3"
 KITTIES_ENDPOINT = f"{API_BASE}/kitties"
@@ -150,16 +189,10 @@ def build_palette_from_css(css_text: str) -> Dict[str, str]:
     return palette
 
 
-def fetch_palette_css(css_url: str, timeout_s: int, user_agent: str) -> Dict[str, str]:
+def fetch_palette_css(css_url: str, timeout_s: int, user_agent: str, http2: bool = False) -> Dict[str, str]:
     logging.info("fetch palette css: %s", css_url)
-    r = requests.get(
-        css_url,
-        timeout=timeout_s,
-        headers={
-            "Accept": "text/css,*/*;q=0.1",
-            "User-Agent": user_agent,
-        },
-    )
+    session = make_session(pool_size=1, http2=http2, user_agent=user_agent)
+    r = session.get(css_url, timeout=timeout_s, headers={"Accept": "text/css,*/*;q=0.1"})
     r.raise_for_status()
     palette = build_palette_from_css(r.text)
     logging.info("palette entries found: %d", len(palette))
@@ -184,95 +217,352 @@ class Config:
     css_url: str
     css_palette_enabled: bool
     embedded_only: bool  # If True, only extract embedded parents/children from API response
+    workers: int = 1  # >1 expands each BFS depth level concurrently
+    max_rps: float = 0.0  # Request budget shared by all workers (0 = unlimited)
+    batch_size: int = 0  # >0 fetches unseen kitties of each BFS level in comma-joined id batches
+    pool_size: int = DEFAULT_POOL_SIZE  # Pooled connections (raised to workers if lower)
+    keepalive_s: float = DEFAULT_KEEPALIVE_S  # TCP keep-alive idle seconds (0 = no connection reuse)
+    http2: bool = False  # Use the httpx HTTP/2 backend when installed
+
+
+# Config fields that shape the crawl; a checkpoint only resumes a run with the same values
+CHECKPOINT_CONFIG_FIELDS = ("parent_levels", "child_levels", "child_parent_levels", "max_total_kitties")
+CHECKPOINT_VERSION = 1
+DEFAULT_CHECKPOINT_EVERY = 1000
+
+
+class CrawlCheckpoint:
+    """
+    On-disk crawl state for --checkpoint/--resume.
+
+    PATH.journal.ndjson is append-only: one line per fetched kitty payload or
+    children list, written as soon as it arrives (worker threads included).
+    PATH.state.json is an atomically replaced snapshot of the BFS: pending
+    queue, best depths, included_by, errors and the ids already collected.
+
+    On resume the journal is loaded into a replay pool that CKClient serves
+    before touching the cache or network, so nothing fetched before the
+    interruption is fetched again.
+    """
+
+    def __init__(self, path: str, resume: bool = False) -> None:
+        self.journal_path = path + ".journal.ndjson"
+        self.state_path = path + ".state.json"
+        self.state: Optional[Dict[str, Any]] = None
+        self.kitties: Dict[int, Dict[str, Any]] = {}
+        self.children: Dict[int, List[int]] = {}
+        self._lock = threading.Lock()
+
+        if resume:
+            self._load()
+        self._journal = open(self.journal_path, "a" if resume else "w", encoding="utf-8")
+
+    def _load(self) -> None:
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for lineno, line in enumerate(f, 1):
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    # A kill mid-write leaves a torn last line; everything before it is intact
+                    logging.warning("checkpoint journal: skipping unreadable line %d", lineno)
+                    continue
+                if rec.get("type") == "kitty":
+                    self.kitties[int(rec["id"])] = rec["raw"]
+                elif rec.get("type") == "children":
+                    self.children[int(rec["id"])] = [int(c) for c in rec["ids"]]
+        logging.info(
+            "checkpoint journal: %d kitties, %d children lists (%s)",
+            len(self.kitties), len(self.children), self.journal_path,
+        )
+
+    def _append(self, rec: Dict[str, Any]) -> None:
+        line = json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._journal.write(line)
+            self._journal.flush()
+
+    def record_kitty(self, kitty_id: int, raw: Dict[str, Any]) -> None:
+        self._append({"type": "kitty", "id": int(kitty_id), "raw": raw})
+
+    def record_children(self, kitty_id: int, child_ids: List[int]) -> None:
+        self._append({"type": "children", "id": int(kitty_id), "ids": child_ids})
+
+    def replay_kitty(self, kitty_id: int) -> Optional[Dict[str, Any]]:
+        # Each kitty is consumed once, so replayed payloads are dropped after use
+        with self._lock:
+            return self.kitties.pop(kitty_id, None)
+
+    def replay_children(self, kitty_id: int) -> Optional[List[int]]:
+        with self._lock:
+            return self.children.get(kitty_id)
+
+    def save_state(self, state: Dict[str, Any]) -> None:
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.state_path)
+
+    def close(self) -> None:
+        self._journal.close()
+
+    def remove(self) -> None:
+        """Delete the checkpoint files once the crawl's output is safely written."""
+        self.close()
+        for path in (self.journal_path, self.state_path):
+            if os.path.exists(path):
+                os.remove(path)
 
 
 class CKClient:
-    def __init__(self, cfg: Config) -> None:
+    def __init__(self, cfg: Config, cache: Optional[KittyCache] = None) -> None:
         self.cfg = cfg
-        self.session = requests.Session()
-        self.session.headers.update({"Accept": "application/json", "User-Agent": cfg.user_agent})
+        self.cache = cache
+        self.checkpoint: Optional[CrawlCheckpoint] = None
+        # ETag/Last-Modified per kitty id, from uncached single fetches (for --refresh)
+        self.validators: Dict[int, Dict[str, str]] = {}
+        self.session = make_session(
+            pool_size=max(cfg.pool_size, cfg.workers),
+            keepalive_s=cfg.keepalive_s,
+            http2=cfg.http2,
+            user_agent=cfg.user_agent,
+            headers={"Accept": "application/json"},
+        )
+        # One token bucket paces every request (and every worker thread); it slows
+        # down on 429s and recovers towards max_rps while responses stay healthy
+        self.limiter = RateLimiter(cfg.max_rps, burst=cfg.workers)
+
+    def _get(self, url: str, headers: Optional[Dict[str, str]] = None) -> Any:
+        resp = get_with_retry(
+            self.session.get,
+            url,
+            self.limiter,
+            max_retries=self.cfg.max_retries,
+            backoff_base_s=self.cfg.backoff_base_s,
+            timeout=self.cfg.request_timeout_s,
+            headers=headers,
+        )
+        if resp.status_code == 404:
+            # Don't retry 404s - they're permanent
+            raise RuntimeError(f"404 Not Found: {url}")
+        if resp.status_code >= 400:
+            resp.raise_for_status()
+        return resp
 
     def _get_json(self, url: str) -> Dict[str, Any]:
-        last_err: Optional[Exception] = None
-        for attempt in range(self.cfg.max_retries + 1):
-            try:
-                logging.debug("GET %s", url)
-                resp = self.session.get(url, timeout=self.cfg.request_timeout_s)
-                if resp.status_code == 429:
-                    last_err = RuntimeError(f"429 rate limited: {url}")
-                    sleep = self.cfg.backoff_base_s * (2**attempt)
-                    logging.warning("429 rate limited, sleeping %.2fs", sleep)
-                    time.sleep(sleep)
-                    continue
-                if resp.status_code == 404:
-                    # Don't retry 404s - they're permanent
-                    raise RuntimeError(f"404 Not Found: {url}")
-                resp.raise_for_status()
-                return resp.json()
-            except RuntimeError:
-                # Re-raise our 404 error without retry
-                raise
-            except Exception as e:
-                last_err = e
-                sleep = self.cfg.backoff_base_s * (2**attempt)
-                logging.warning("Request failed (%s), sleeping %.2fs", e, sleep)
-                time.sleep(sleep)
-        raise RuntimeError(f"GET failed after retries: {url} | Last error: {last_err}")
-
-    def fetch_kitty(self, kitty_id: int) -> Dict[str, Any]:
-        url = f"{KITTIES_ENDPOINT}/{kitty_id}"
-        data = self._get_json(url)
+        return self._get(url).json()
+
+    def _remember_validators(self, kitty_id: int, resp: Any) -> None:
+        validators = {
+            key: resp.headers[header]
+            for key, header in (("etag", "ETag"), ("last_modified", "Last-Modified"))
+            if resp.headers.get(header)
+        }
+        if validators:
+            self.validators[kitty_id] = validators
+
+    @staticmethod
+    def _unwrap_kitty(data: Dict[str, Any]) -> Dict[str, Any]:
         if "kitty" in data and isinstance(data["kitty"], dict):
             return data["kitty"]
         return data
 
+    def fetch_kitty(self, kitty_id: int) -> Dict[str, Any]:
+        if self.checkpoint is not None:
+            raw = self.checkpoint.replay_kitty(kitty_id)
+            if raw is not None:
+                return raw
+        raw = cached_fetch(self.cache, kitty_id, self._fetch_kitty_uncached)
+        if self.checkpoint is not None:
+            self.checkpoint.record_kitty(kitty_id, raw)
+        return raw
+
+    def _fetch_kitty_uncached(self, kitty_id: int) -> Dict[str, Any]:
+        resp = self._get(f"{KITTIES_ENDPOINT}/{kitty_id}")
+        self._remember_validators(kitty_id, resp)
+        return self._unwrap_kitty(resp.json())
+
+    def revalidate_kitty(self, kitty_id: int, validators: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """
+        Conditional GET using stored ETag/Last-Modified validators.
+
+        Returns None on 304 Not Modified, else the fresh payload (also written
+        to the cache, with the new validators remembered).
+        """
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        resp = self._get(f"{KITTIES_ENDPOINT}/{kitty_id}", headers=headers)
+        if resp.status_code == 304:
+            return None
+        self._remember_validators(kitty_id, resp)
+        raw = self._unwrap_kitty(resp.json())
+        if self.cache is not None:
+            self.cache.put(kitty_id, raw)
+        return raw
+
+    def search_kitties(self, kitty_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        One comma-joined search request for kitty_ids; returns {id: raw} for ids it contained.
+
+        List items are not the /kitties/{id} payload, so each raw is unwrapped the
+        same way and marked as search-sourced (ck_cache.SOURCE_KEY).
+        """
+        qs = urlencode({"search": ",".join(str(k) for k in kitty_ids), "limit": len(kitty_ids)})
+        wanted = set(kitty_ids)
+        found: Dict[int, Dict[str, Any]] = {}
+        for it in extract_list_items(self._get_json(f"{KITTIES_ENDPOINT}?{qs}")) or []:
+            if isinstance(it, dict) and is_intlike(it.get("id")) and int(it["id"]) in wanted:
+                found[int(it["id"])] = mark_search_payload(self._unwrap_kitty(it))
+        return found
+
+    def fetch_kitties_batch(self, kitty_ids: List[int]) -> Tuple[Dict[int, Dict[str, Any]], Dict[int, Exception]]:
+        """
+        Fetch several kitties with one comma-joined search request.
+
+        Cached kitties (full or search-sourced) are served from the cache, and
+        search hits are written back to it. Ids the batch response omits (or the
+        whole batch, if the request fails) fall back to single fetches.
+        Returns ({id: raw}, {id: error}).
+        """
+        found: Dict[int, Dict[str, Any]] = {}
+        if self.checkpoint is not None:
+            for kid in kitty_ids:
+                raw = self.checkpoint.replay_kitty(kid)
+                if raw is not None:
+                    found[kid] = raw
+        replayed = set(found)
+        if self.cache is not None:
+            found.update(self.cache.get_many((kid for kid in kitty_ids if kid not in found), accept_search=True))
+        pending = [kid for kid in kitty_ids if kid not in found]
+
+        if pending and not (self.cache is not None and self.cache.offline):
+            try:
+                hits = self.search_kitties(pending)
+                if self.cache is not None:
+                    for kid, raw in hits.items():
+                        self.cache.put(kid, raw)
+                found.update(hits)
+                logging.info("batch of %d -> %d kitties", len(pending), len(hits))
+            except Exception as e:
+                logging.warning("batch fetch failed (%s), falling back to single fetches", e)
+
+        if self.checkpoint is not None:
+            for kid, raw in found.items():
+                if kid not in replayed:
+                    self.checkpoint.record_kitty(kid, raw)
+
+        failed: Dict[int, Exception] = {}
+        for kid in kitty_ids:
+            if kid in found:
+                continue
+            try:
+                logging.debug("batch omitted kitty=%d, fetching singly", kid)
+                found[kid] = self.fetch_kitty(kid)
+            except Exception as e:
+                failed[kid] = e
+        return found, failed
+
     def fetch_children_ids(self, parent_id: int, limit_per_page: int) -> List[int]:
+        if self.checkpoint is not None:
+            child_ids = self.checkpoint.replay_children(parent_id)
+            if child_ids is not None:
+                return child_ids
+        child_ids = self._fetch_children_uncached(parent_id, limit_per_page)
+        if self.checkpoint is not None:
+            self.checkpoint.record_children(parent_id, child_ids)
+        return child_ids
+
+    def _fetch_children_uncached(self, parent_id: int, limit_per_page: int) -> List[int]:
+        """
+        Return parent_id's child ids.
+
+        Without a stored list they come back in API order, as a plain crawl
+        always did. With a cache, a stored list's highest child id is a
+        watermark: only children born since are paged (newest first) and merged
+        into it, ascending, so a known parent usually costs one request.
+        Offline, the stored list is served as is.
+        """
+        known = self.cache.get_children(parent_id) if self.cache is not None else None
+        if self.cache is not None and self.cache.offline:
+            if known is None:
+                raise OfflineCacheMiss(f"children of {parent_id} not available offline")
+            return known
+
+        if known is None:
+            child_ids = dedupe_keep_order(self._page_children(parent_id, limit_per_page))
+        else:
+            watermark = max(known, default=0)
+            new_ids = self._page_children(parent_id, limit_per_page, watermark=watermark)
+            logging.debug("children parent=%d: %d known, %d new above %d", parent_id, len(known), len(new_ids), watermark)
+            child_ids = sorted(set(known).union(new_ids))
+
+        if self.cache is not None:
+            self.cache.put_children(parent_id, child_ids)
+        return child_ids
+
+    def _page_children(self, parent_id: int, limit_per_page: int, watermark: Optional[int] = None) -> List[int]:
+        """
+        Page through parent_id's children.
+
+        With a watermark, pages newest first (orderBy=id desc) and stops at the
+        first page reaching an id <= watermark; only ids above it are returned.
+        """
         out: List[int] = []
         page = 1
 
         while True:
-            qs = urlencode({"parent": parent_id, "page": page, "limit": limit_per_page})
-            url = f"{KITTIES_ENDPOINT}?{qs}"
+            params: Dict[str, Any] = {"parent": parent_id, "page": page, "limit": limit_per_page}
+            if watermark is not None:
+                params.update({"orderBy": "id", "orderDirection": "desc"})
+            url = f"{KITTIES_ENDPOINT}?{urlencode(params)}"
             data = self._get_json(url)
 
-            items = None
-            for key in ("kitties", "items", "data", "results"):
-                if key in data and isinstance(data[key], list):
-                    items = data[key]
-                    break
-            if items is None and isinstance(data.get("data"), dict):
-                for key in ("kitties", "items", "results"):
-                    if key in data["data"] and isinstance(data["data"][key], list):
-                        items = data["data"][key]
-                        break
-
+            items = extract_list_items(data)
             if not items:
                 break
 
             got = 0
+            reached = False
             for it in items:
                 if isinstance(it, dict) and is_intlike(it.get("id")):
-                    out.append(int(it["id"]))
+                    cid = int(it["id"])
+                    if watermark is not None and cid <= watermark:
+                        reached = True
+                        continue
+                    out.append(cid)
                     got += 1
 
             logging.debug("children page=%d parent=%d got=%d", page, parent_id, got)
 
+            if reached:
+                break
             if got == 0:
                 break
             if len(items) < limit_per_page:
                 break
 
             page += 1
-            if self.cfg.sleep_s > 0:
-                time.sleep(self.cfg.sleep_s)
 
-        seen: Set[int] = set()
-        deduped: List[int] = []
-        for cid in out:
-            if cid not in seen:
-                deduped.append(cid)
-                seen.add(cid)
-        return deduped
+        return out
+
+
+def extract_list_items(data: Dict[str, Any]) -> Optional[List[Any]]:
+    """Find the kitty list in a list/search API response."""
+    for key in ("kitties", "items", "data", "results"):
+        if key in data and isinstance(data[key], list):
+            return data[key]
+    if isinstance(data.get("data"), dict):
+        for key in ("kitties", "items", "results"):
+            if key in data["data"] and isinstance(data["data"][key], list):
+                return data["data"][key]
+    return None
 
 
 def extract_embedded_kitties(kitty: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -493,8 +783,104 @@ def parse_ids_from_file(path: str) -> List[int]:
     return dedupe_keep_order(ids)
 
 
-def build_aggregation(root_ids: List[int], cfg: Config) -> Dict[str, Any]:
-    client = CKClient(cfg)
+@dataclass
+class PrefetchedNode:
+    """Results of fetching one BFS node ahead of time in a worker thread."""
+    kitty: Optional[Dict[str, Any]] = None
+    kitty_error: Optional[Exception] = None
+    child_ids: Optional[List[int]] = None
+    children_error: Optional[Exception] = None
+
+
+def prefetch_level(
+    client: CKClient,
+    level: List[Tuple[int, int, int, str]],
+    kitties_by_id: Dict[int, Dict[str, Any]],
+    cfg: Config,
+) -> Dict[int, PrefetchedNode]:
+    """
+    Fetch every kitty (and children list) a BFS level will need, concurrently.
+
+    Only network I/O happens here. The caller still walks the level in queue
+    order and applies the results exactly as the serial path would, so the
+    resulting kitties/included_by are identical. New kitty fetches are limited
+    to the remaining --max-total budget; anything beyond it that turns out to be
+    needed (after failures) is fetched inline by the caller.
+    """
+    wants_children: Dict[int, bool] = {}
+    budget = cfg.max_total_kitties - len(kitties_by_id)
+    for kid, _pdepth, cdepth, _reason in level:
+        if kid in wants_children:
+            wants_children[kid] = wants_children[kid] or cdepth > 0
+            continue
+        if kid not in kitties_by_id:
+            if budget <= 0:
+                continue
+            budget -= 1
+        wants_children[kid] = cdepth > 0
+
+    def fetch_children(kid: int, node: PrefetchedNode) -> None:
+        try:
+            node.child_ids = client.fetch_children_ids(kid, cfg.child_page_limit)
+        except Exception as e:
+            node.children_error = e
+
+    def fetch_node(kid: int, need_children: bool, node: PrefetchedNode) -> None:
+        if kid not in kitties_by_id:
+            try:
+                logging.info("fetch kitty=%d (prefetch)", kid)
+                node.kitty = client.fetch_kitty(kid)
+            except Exception as e:
+                node.kitty_error = e
+                return
+        if need_children:
+            fetch_children(kid, node)
+
+    jobs = {kid: need for kid, need in wants_children.items() if need or kid not in kitties_by_id}
+    if not jobs:
+        return {}
+
+    nodes = {kid: PrefetchedNode() for kid in jobs}
+    logging.info("prefetch level: %d nodes across %d workers", len(jobs), cfg.workers)
+    with ThreadPoolExecutor(max_workers=cfg.workers) as pool:
+        if cfg.batch_size > 0:
+            # Unseen kitties go out as comma-joined id batches first; the batch
+            # fetcher falls back to single requests for ids a response omits
+            new_ids = [kid for kid in jobs if kid not in kitties_by_id]
+            chunks = [new_ids[i:i + cfg.batch_size] for i in range(0, len(new_ids), cfg.batch_size)]
+            for found, failed in pool.map(client.fetch_kitties_batch, chunks):
+                for kid, raw in found.items():
+                    nodes[kid].kitty = raw
+                for kid, err in failed.items():
+                    nodes[kid].kitty_error = err
+            futures = [
+                pool.submit(fetch_children, kid, nodes[kid])
+                for kid, need in jobs.items()
+                if need and nodes[kid].kitty_error is None
+            ]
+        else:
+            futures = [pool.submit(fetch_node, kid, need, nodes[kid]) for kid, need in jobs.items()]
+        for fut in futures:
+            fut.result()
+    return nodes
+
+
+def build_aggregation(
+    root_ids: List[int],
+    cfg: Config,
+    cache: Optional[KittyCache] = None,
+    checkpoint: Optional[CrawlCheckpoint] = None,
+    checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+    sink: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Crawl from root_ids and return the aggregation payload.
+
+    With a sink, each normalized kitty is handed to sink() as soon as it is
+    fetched and only its parent ids are kept in memory; the returned payload
+    then has no "kitties" list.
+    """
+    client = CKClient(cfg, cache)
 
     kitties_by_id: Dict[int, Dict[str, Any]] = {}
     included_by: Dict[int, Set[str]] = {}
@@ -503,6 +889,13 @@ def build_aggregation(root_ids: List[int], cfg: Config) -> Dict[str, Any]:
     def mark(kid: int, reason: str) -> None:
         included_by.setdefault(kid, set()).add(reason)
 
+    def collect(kid: int, kitty: Dict[str, Any]) -> None:
+        if sink is None:
+            kitties_by_id[kid] = kitty
+            return
+        sink(kitty)
+        kitties_by_id[kid] = {"matron_id": kitty["matron_id"], "sire_id": kitty["sire_id"]}
+
     # Embedded-only mode: fetch roots and extract embedded parents/children
     if cfg.embedded_only:
         logging.info("embedded-only mode: extracting embedded data from API responses")
@@ -517,7 +910,7 @@ def build_aggregation(root_ids: List[int], cfg: Config) -> Dict[str, Any]:
             try:
                 logging.info("fetch root kitty=%d", rid)
                 raw = client.fetch_kitty(rid)
-                kitties_by_id[rid] = normalize_kitty(raw, cfg)
+                collect(rid, normalize_kitty(raw, cfg))
                 mark(rid, "root")
 
                 # Extract embedded kitties (parents and children)
@@ -532,14 +925,11 @@ def build_aggregation(root_ids: List[int], cfg: Config) -> Dict[str, Any]:
                 logging.warning("failed kitty=%d error=%s", rid, e)
                 continue
 
-            if cfg.sleep_s > 0:
-                time.sleep(cfg.sleep_s)
-
         # Normalize and add embedded kitties
         for emb_id, emb_raw in embedded_kitties.items():
             if len(kitties_by_id) >= cfg.max_total_kitties:
                 break
-            kitties_by_id[emb_id] = normalize_kitty(emb_raw, cfg)
+            collect(emb_id, normalize_kitty(emb_raw, cfg))
             mark(emb_id, "embedded")
 
         logging.info("embedded-only: %d roots + %d embedded = %d total",
@@ -550,7 +940,46 @@ def build_aggregation(root_ids: List[int], cfg: Config) -> Dict[str, Any]:
         best_depths: Dict[int, Tuple[int, int]] = {}
 
         # Each queue entry: (kitty_id, remaining_parent_depth, remaining_child_depth, reason)
-        queue: List[Tuple[int, int, int, str]] = [(rid, cfg.parent_levels, cfg.child_levels, "root") for rid in root_ids]
+        queue: deque = deque((rid, cfg.parent_levels, cfg.child_levels, "root") for rid in root_ids)
+
+        crawl_config = {f: getattr(cfg, f) for f in CHECKPOINT_CONFIG_FIELDS}
+        if checkpoint is not None:
+            client.checkpoint = checkpoint
+            state = checkpoint.state
+            if state is not None:
+                if state.get("version") != CHECKPOINT_VERSION:
+                    raise ValueError(f"unsupported checkpoint version: {state.get('version')}")
+                if state["root_ids"] != root_ids or state["config"] != crawl_config:
+                    raise ValueError(
+                        "checkpoint was made for different roots or crawl settings; "
+                        f"delete {checkpoint.state_path} or rerun with the original arguments"
+                    )
+                queue = deque(tuple(entry) for entry in state["queue"])
+                best_depths = {int(k): (v[0], v[1]) for k, v in state["best_depths"].items()}
+                included_by.update({int(k): set(v) for k, v in state["included_by"].items()})
+                errors.extend(state["errors"])
+                for kid in state["kitty_ids"]:
+                    raw = checkpoint.replay_kitty(kid)
+                    if raw is None:
+                        raise ValueError(f"checkpoint journal is missing kitty {kid}; delete the checkpoint to restart")
+                    collect(kid, normalize_kitty(raw, cfg))
+                logging.warning(
+                    "resuming from checkpoint: %d kitties collected, %d queued", len(kitties_by_id), len(queue)
+                )
+
+        def save_checkpoint(pending: List[Tuple[int, int, int, str]]) -> None:
+            # pending is the rest of the FIFO walk, so resuming it replays the crawl exactly
+            checkpoint.save_state({
+                "version": CHECKPOINT_VERSION,
+                "root_ids": root_ids,
+                "config": crawl_config,
+                "queue": pending,
+                "best_depths": {str(k): list(v) for k, v in best_depths.items()},
+                "included_by": {str(k): sorted(v) for k, v in included_by.items()},
+                "errors": errors,
+                "kitty_ids": sorted(kitties_by_id),
+            })
+            logging.info("checkpoint: %d kitties, %d queued", len(kitties_by_id), len(pending))
 
         def maybe_enqueue(kid: Optional[int], pdepth: int, cdepth: int, reason: str) -> None:
             if kid is None:
@@ -572,66 +1001,336 @@ def build_aggregation(root_ids: List[int], cfg: Config) -> Dict[str, Any]:
             mark(kid, reason)
             logging.debug("enqueue id=%d pdepth=%d cdepth=%d reason=%s", kid, pdepth, cdepth, reason)
 
-        while queue:
-            if len(kitties_by_id) >= cfg.max_total_kitties:
-                logging.warning("Reached max total kitties cap: %d", cfg.max_total_kitties)
-                break
+        capped = False
+        while queue and not capped:
+            # Everything queued now is one BFS depth level; entries enqueued while
+            # processing it form the next level, exactly as in a FIFO walk.
+            level = list(queue)
+            queue.clear()
+            if checkpoint is not None:
+                save_checkpoint(level)
+            use_prefetch = cfg.workers > 1 or cfg.batch_size > 0
+            prefetched = prefetch_level(client, level, kitties_by_id, cfg) if use_prefetch else {}
+
+            for i, (kid, pdepth, cdepth, reason) in enumerate(level):
+                if checkpoint is not None and i and i % checkpoint_every == 0:
+                    save_checkpoint(level[i:] + list(queue))
+
+                if len(kitties_by_id) >= cfg.max_total_kitties:
+                    logging.warning("Reached max total kitties cap: %d", cfg.max_total_kitties)
+                    capped = True
+                    break
 
-            kid, pdepth, cdepth, reason = queue.pop(0)
-            mark(kid, reason)
+                mark(kid, reason)
+                node = prefetched.get(kid)
+
+                if kid not in kitties_by_id:
+                    try:
+                        if node is not None and node.kitty_error is not None:
+                            raise node.kitty_error
+                        if node is not None and node.kitty is not None:
+                            raw = node.kitty
+                        else:
+                            logging.info("fetch kitty=%d (pdepth=%d cdepth=%d) reason=%s", kid, pdepth, cdepth, reason)
+                            raw = client.fetch_kitty(kid)
+                        collect(kid, normalize_kitty(raw, cfg))
+                    except Exception as e:
+                        errors.append({"id": kid, "error": str(e)})
+                        logging.warning("failed kitty=%d error=%s", kid, e)
+                        continue
+
+                kitty = kitties_by_id[kid]
+
+                # Parents
+                if pdepth > 0:
+                    mom = kitty.get("matron_id")
+                    dad = kitty.get("sire_id")
+                    logging.debug("parents of %d -> matron=%s sire=%s", kid, mom, dad)
+                    maybe_enqueue(mom, pdepth - 1, 0, f"parent_of:{kid}")
+                    maybe_enqueue(dad, pdepth - 1, 0, f"parent_of:{kid}")
+
+                # Children
+                if cdepth > 0:
+                    try:
+                        if node is not None and node.children_error is not None:
+                            raise node.children_error
+                        if node is not None and node.child_ids is not None:
+                            child_ids = node.child_ids
+                        else:
+                            child_ids = client.fetch_children_ids(kid, cfg.child_page_limit)
+                        logging.info("children of %d -> %d ids (next depth %d)", kid, len(child_ids), cdepth - 1)
+                        for cid in child_ids:
+                            maybe_enqueue(cid, cfg.child_parent_levels, cdepth - 1, f"child_of:{kid}")
+                    except Exception as e:
+                        errors.append({"id": kid, "error_children_fetch": str(e)})
+                        logging.warning("failed children fetch for %d error=%s", kid, e)
+
+    payload = {
+        "source": "CryptoKitties public API v3",
+        "generated_at_utc": now_utc_iso(),
+        "config": asdict(cfg),
+        "root_ids": root_ids,
+        "included_by": {str(k): sorted(list(v)) for k, v in included_by.items()},
+        "kitties": [kitties_by_id[k] for k in sorted(kitties_by_id.keys())],
+        "errors": errors,
+        "counts": {"kitties": len(kitties_by_id), "errors": len(errors)},
+    }
+    if client.validators:
+        payload["validators"] = {str(k): client.validators[k] for k in sorted(client.validators)}
+    if sink is not None:
+        del payload["kitties"]
+    return payload
+
+
+# Normalized fields that can change after a kitty is born (sales, transfers, breeding),
+# mapped to the API keys normalize_kitty() derives them from. Everything else (genes,
+# parents, traits, birthday, ...) is fixed once minted.
+VOLATILE_SOURCES: Dict[str, Tuple[str, ...]] = {
+    "auction": ("auction",),
+    "seller": ("auction",),
+    "owner": ("owner", "owner_profile"),
+    "owner_address": ("owner", "owner_profile", "owner_address", "ownerAddress", "owner_wallet_address"),
+    "owner_nickname": ("owner", "owner_profile"),
+    "cooldown_ready_at": ("status",),
+}
+VOLATILE_FIELDS = tuple(VOLATILE_SOURCES)
+
+# Derived from the CSS palette and --shadow-* settings rather than the API
+DERIVED_FIELDS = ("kitty_color", "shadow_color")
+
+
+def patch_kitty(kitty: Dict[str, Any], fresh: Dict[str, Any], fields: Iterable[str]) -> bool:
+    """Copy the given fields that kitty already has from fresh. Returns True if any value changed."""
+    changed = False
+    for field in fields:
+        if field in kitty and field in fresh and kitty[field] != fresh[field]:
+            kitty[field] = fresh[field]
+            changed = True
+    return changed
+
+
+def carried_volatile(raw: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    """
+    Volatile fields an API item can refresh, and the raw keys they come from.
+
+    A field is only listed when the item carries one of its source keys, so a
+    sparse search item never overwrites a stored value with normalize_kitty's
+    None default.
+    """
+    fields = [f for f, keys in VOLATILE_SOURCES.items() if any(k in raw for k in keys)]
+    raw_keys = sorted({k for f in fields for k in VOLATILE_SOURCES[f] if k in raw})
+    return fields, raw_keys
 
-            if kid not in kitties_by_id:
+
+def refresh_aggregation(payload: Dict[str, Any], cfg: Config, cache: Optional[KittyCache] = None) -> Dict[str, int]:
+    """
+    Revalidate an existing aggregation's kitties in place.
+
+    - Kitties with stored validators (payload["validators"]) get a conditional
+      GET; a 304 leaves them untouched, a 200 patches every field they carry.
+    - The rest are re-read with comma-joined search requests (--batch-size ids
+      each, default 50). Only the VOLATILE_FIELDS the item carries are patched,
+      together with the matching keys inside "raw".
+
+    Only fields a kitty already has are written, so pruned datasets stay
+    pruned. The cache is never read (that would defeat the refresh), but full
+    payloads are written back to it. Returns counters for the report.
+    """
+    client = CKClient(cfg, cache)
+    validators: Dict[str, Dict[str, str]] = payload.get("validators") or {}
+    kitties: List[Dict[str, Any]] = payload.get("kitties") or []
+    stats = {"kitties": len(kitties), "changed": 0, "failed": 0, "not_modified": 0, "requests": 0}
+    stats_lock = threading.Lock()
+
+    def count(key: str, n: int = 1) -> None:
+        with stats_lock:
+            stats[key] += n
+
+    def apply(kitty: Dict[str, Any], raw: Dict[str, Any], fields: Iterable[str], raw_keys: Iterable[str] = ()) -> None:
+        fresh = normalize_kitty(raw, cfg)
+        changed = patch_kitty(kitty, fresh, fields)
+        stored_raw = kitty.get("raw")
+        if isinstance(stored_raw, dict):
+            # raw mirrors the API payload, so carried keys are written even if absent before
+            for key in raw_keys:
+                if stored_raw.get(key) != fresh["raw"][key]:
+                    stored_raw[key] = fresh["raw"][key]
+                    changed = True
+        if changed:
+            count("changed")
+            logging.info("refresh: kitty %s changed", kitty["id"])
+
+    def revalidate(kitty: Dict[str, Any]) -> None:
+        count("requests")
+        try:
+            raw = client.revalidate_kitty(int(kitty["id"]), validators[str(kitty["id"])])
+        except Exception as e:
+            count("failed")
+            logging.warning("refresh failed kitty=%s error=%s", kitty["id"], e)
+            return
+        if raw is None:
+            count("not_modified")
+            return
+        apply(kitty, raw, [f for f in kitty if f not in DERIVED_FIELDS and f != "id"])
+
+    def refresh_batch(batch: List[Dict[str, Any]]) -> None:
+        ids = [int(k["id"]) for k in batch]
+        count("requests")
+        try:
+            found = client.search_kitties(ids)
+        except Exception as e:
+            logging.warning("refresh batch failed (%s), falling back to single fetches", e)
+            found = {}
+        for kitty in batch:
+            kid = int(kitty["id"])
+            raw = found.get(kid)
+            if raw is None:
+                count("requests")
                 try:
-                    logging.info("fetch kitty=%d (pdepth=%d cdepth=%d) reason=%s", kid, pdepth, cdepth, reason)
-                    raw = client.fetch_kitty(kid)
-                    kitties_by_id[kid] = normalize_kitty(raw, cfg)
+                    raw = client._fetch_kitty_uncached(kid)
+                    if cache is not None:
+                        cache.put(kid, raw)
                 except Exception as e:
-                    errors.append({"id": kid, "error": str(e)})
-                    logging.warning("failed kitty=%d error=%s", kid, e)
+                    count("failed")
+                    logging.warning("refresh failed kitty=%d error=%s", kid, e)
                     continue
+            apply(kitty, raw, *carried_volatile(raw))
 
-                if cfg.sleep_s > 0:
-                    time.sleep(cfg.sleep_s)
+    conditional = [k for k in kitties if str(k.get("id")) in validators]
+    rest = [k for k in kitties if str(k.get("id")) not in validators]
+    batch_size = cfg.batch_size or 50
+    batches = [rest[i:i + batch_size] for i in range(0, len(rest), batch_size)]
+    logging.info("refresh: %d conditional GETs, %d kitties in %d batches", len(conditional), len(rest), len(batches))
 
-            kitty = kitties_by_id[kid]
+    with ThreadPoolExecutor(max_workers=cfg.workers) as pool:
+        futures = [pool.submit(revalidate, k) for k in conditional]
+        futures += [pool.submit(refresh_batch, b) for b in batches]
+        for fut in futures:
+            fut.result()
 
-            # Parents
-            if pdepth > 0:
-                mom = kitty.get("matron_id")
-                dad = kitty.get("sire_id")
-                logging.debug("parents of %d -> matron=%s sire=%s", kid, mom, dad)
-                maybe_enqueue(mom, pdepth - 1, 0, f"parent_of:{kid}")
-                maybe_enqueue(dad, pdepth - 1, 0, f"parent_of:{kid}")
+    if client.validators:
+        validators.update({str(k): v for k, v in client.validators.items()})
+        payload["validators"] = validators
+        stats["new_validators"] = len(client.validators)
+    return stats
 
-            # Children
-            if cdepth > 0:
-                try:
-                    child_ids = client.fetch_children_ids(kid, cfg.child_page_limit)
-                    logging.info("children of %d -> %d ids (next depth %d)", kid, len(child_ids), cdepth - 1)
-                    for cid in child_ids:
-                        maybe_enqueue(cid, cfg.child_parent_levels, cdepth - 1, f"child_of:{kid}")
-                except Exception as e:
-                    errors.append({"id": kid, "error_children_fetch": str(e)})
-                    logging.warning("failed children fetch for %d error=%s", kid, e)
 
+class NdjsonWriter:
+    """
+    Streams an aggregation as NDJSON, one record per line:
+
+      {"type": "header", "source", "generated_at_utc", "config", "root_ids"}
+      {"type": "kitty", "kitty": {...normalized kitty...}}   (in fetch order)
+      {"type": "summary", "included_by", "errors", "counts"}
+
+    Lines are flushed as they are written, so the file can be tailed or piped
+    while the crawl is still running. load_ndjson_aggregation() turns it back
+    into the classic JSON payload.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._f = open(path, "w", encoding="utf-8", buffering=1)
+
+    def _write(self, rec: Dict[str, Any]) -> None:
+        self._f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def header(self, cfg: Config, root_ids: List[int]) -> None:
+        self._write({
+            "type": "header",
+            "source": "CryptoKitties public API v3",
+            "generated_at_utc": now_utc_iso(),
+            "config": asdict(cfg),
+            "root_ids": root_ids,
+        })
+
+    def kitty(self, kitty: Dict[str, Any]) -> None:
+        self._write({"type": "kitty", "kitty": kitty})
+
+    def finish(self, payload: Dict[str, Any]) -> None:
+        """Write the summary record from build_aggregation's payload and close."""
+        self._write({
+            "type": "summary",
+            "included_by": payload["included_by"],
+            "errors": payload["errors"],
+            "counts": payload["counts"],
+        })
+        self._f.close()
+
+
+def load_ndjson_aggregation(path: str) -> Dict[str, Any]:
+    """
+    Reassemble the classic aggregation payload from an NDJSON stream.
+
+    Kitties are sorted by id (last record wins for duplicates). A stream without
+    a summary (crawl still running or killed) loads with empty included_by/errors.
+    """
+    header, summary, stream = read_ndjson(path)
+    kitties: Dict[int, Dict[str, Any]] = {int(k["id"]): k for k in stream}
+
+    if not summary:
+        logging.warning("%s: no summary record (incomplete stream), included_by/errors are empty", path)
+        summary = {"included_by": {}, "errors": []}
+
+    errors = summary["errors"]
     return {
-        "source": "CryptoKitties public API v3",
-        "generated_at_utc": now_utc_iso(),
-        "config": asdict(cfg),
-        "root_ids": root_ids,
-        "included_by": {str(k): sorted(list(v)) for k, v in included_by.items()},
-        "kitties": [kitties_by_id[k] for k in sorted(kitties_by_id.keys())],
+        "source": header.get("source", "CryptoKitties public API v3"),
+        "generated_at_utc": header.get("generated_at_utc"),
+        "config": header.get("config", {}),
+        "root_ids": header.get("root_ids", []),
+        "included_by": summary["included_by"],
+        "kitties": [kitties[k] for k in sorted(kitties)],
         "errors": errors,
-        "counts": {"kitties": len(kitties_by_id), "errors": len(errors)},
+        "counts": {"kitties": len(kitties), "errors": len(errors)},
     }
 
 
+def run_refresh(in_path: str, out_path: str, cfg: Config, cache: Optional[KittyCache]) -> int:
+    with open(in_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    payload = json.loads(text)
+    stats = refresh_aggregation(payload, cfg, cache)
+
+    if stats["changed"] or stats.get("new_validators") or out_path != os.path.abspath(in_path):
+        with open(out_path, "w", encoding="utf-8") as f:
+            if text.lstrip().startswith("{\n"):
+                json.dump(payload, f, ensure_ascii=False, indent=2)
+            else:
+                # Pruned datasets (prune_json.py) are compact; keep them that way
+                f.write(json.dumps(payload, separators=(",", ":")))
+        print(f"Wrote: {out_path}")
+    else:
+        print(f"Unchanged: {out_path}")
+
+    skipped = stats["kitties"] - stats["requests"]
+    print(f"Kitties: {stats['kitties']}  Changed: {stats['changed']}  Failed: {stats['failed']}")
+    print(
+        f"Requests: {stats['requests']} sent, {max(0, skipped)} skipped vs one GET per kitty, "
+        f"{stats['not_modified']} answered 304 Not Modified"
+    )
+    if cache is not None:
+        cache.close()
+    return 0
+
+
 def main() -> int:
     ap = argparse.ArgumentParser(description="Generate CryptoKitties aggregation JSON with recursive parents/children.")
 
     src = ap.add_mutually_exclusive_group(required=True)
     src.add_argument("--ids", help="Comma or whitespace delimited kitty IDs, example: '1,2,3' or '1 2 3'")
     src.add_argument("--ids-file", help="Path to file with one kitty ID per line (# comments allowed)")
+    src.add_argument(
+        "--from-ndjson",
+        metavar="FILE",
+        help="Don't crawl: convert an NDJSON aggregation (from --format ndjson) to classic JSON at --out",
+    )
+    src.add_argument(
+        "--refresh",
+        metavar="FILE",
+        help="Don't crawl: revalidate the kitties of an existing aggregation JSON (conditional GETs where "
+             "validators are stored, else batched re-reads of auction/owner/cooldown fields). "
+             "Writes back to FILE unless --out is given",
+    )
 
     ap.add_argument("--parents", type=int, default=3, help="Number of parent levels to fetch from roots")
     ap.add_argument("--children", type=int, default=2, help="Number of child levels to fetch from roots")
@@ -644,11 +1343,43 @@ def main() -> int:
 
     ap.add_argument("--child-page-limit", type=int, default=100, help="Children list page size (default 100)")
     ap.add_argument("--timeout", type=int, default=30, help="Request timeout seconds (default 30)")
-    ap.add_argument("--sleep", type=float, default=0.15, help="Sleep seconds between requests (default 0.15)")
+    ap.add_argument(
+        "--sleep",
+        type=float,
+        default=0.15,
+        help="Minimum seconds between requests when --max-rps is not given (default 0.15)",
+    )
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Fetch each BFS depth level with this many concurrent workers (default 1 = serial)",
+    )
+    ap.add_argument(
+        "--max-rps",
+        type=float,
+        default=0.0,
+        help="Requests-per-second ceiling shared by all workers; slows down automatically on 429s (default: 1/--sleep)",
+    )
+    ap.add_argument(
+        "--batch-size",
+        type=int,
+        default=0,
+        help="Fetch each BFS level's unseen kitties in comma-joined batches of this size, "
+             "falling back to single fetches for omitted ids (default 0 = one request per kitty)",
+    )
     ap.add_argument("--max-total", type=int, default=5000, help="Hard cap on total kitties (default 5000)")
     ap.add_argument("--retries", type=int, default=8, help="Max retries per request (default 8)")
     ap.add_argument("--backoff", type=float, default=0.75, help="Backoff base seconds (default 0.75)")
-    ap.add_argument("--out", default="cryptokitties_aggregation.json", help="Output JSON path")
+    ap.add_argument("--out", default=None, help="Output JSON path (default cryptokitties_aggregation.json)")
+    ap.add_argument(
+        "--format",
+        choices=["json", "ndjson", "ckpd"],
+        default="json",
+        help="json: one document written at the end (default). ndjson: stream each kitty to --out as it is "
+             "fetched, then a summary record. ckpd: memory-mappable binary columns + records (see ck_pedigree.py); "
+             "also applies to --from-ndjson",
+    )
 
     ap.add_argument(
         "--shadow-mode",
@@ -677,6 +1408,31 @@ def main() -> int:
              "Ignores --parents and --children levels.",
     )
 
+    add_cache_args(ap, "; also stores each parent's children list, whose highest id is the watermark "
+                       "that limits later crawls to children born since (no watermark without a cache)")
+    add_http_args(ap)
+
+    ckpt = ap.add_argument_group("checkpoints")
+    ckpt.add_argument(
+        "--checkpoint",
+        nargs="?",
+        const="",
+        default=None,
+        help="Journal fetched kitties and snapshot the crawl queue to PATH.journal.ndjson/PATH.state.json "
+             "(default PATH when flag is given: <out>.ckpt). Removed after the output is written.",
+    )
+    ckpt.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted crawl from its checkpoint without refetching (implies --checkpoint)",
+    )
+    ckpt.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=DEFAULT_CHECKPOINT_EVERY,
+        help=f"Snapshot the queue every N processed kitties, besides every BFS level (default {DEFAULT_CHECKPOINT_EVERY})",
+    )
+
     ap.add_argument("-v", "--verbose", action="count", default=0, help="Increase verbosity. -v=INFO, -vv=DEBUG")
 
     ns = ap.parse_args()
@@ -688,10 +1444,32 @@ def main() -> int:
         level = logging.DEBUG
     logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(message)s")
 
+    if ns.out is None:
+        ns.out = ns.refresh or "cryptokitties_aggregation.json"
+
+    if ns.from_ndjson:
+        payload = load_ndjson_aggregation(ns.from_ndjson)
+        out_path = os.path.abspath(ns.out)
+        if ns.format == "ckpd":
+            Pedigree.from_payload(payload).save(out_path)
+        else:
+            with open(out_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, indent=2)
+        print(f"Wrote: {out_path}")
+        print(f"Kitties: {payload['counts']['kitties']}  Errors: {payload['counts']['errors']}")
+        return 0
+
+    if ns.refresh and ns.offline:
+        ap.error("--refresh needs the network; it cannot run with --offline")
+    if ns.refresh and ns.format != "json":
+        ap.error("--refresh rewrites aggregation JSON; --format does not apply")
+
     if ns.ids:
         root_ids = parse_ids_from_string(ns.ids)
-    else:
+    elif ns.ids_file:
         root_ids = parse_ids_from_file(ns.ids_file)
+    else:
+        root_ids = []
 
     cfg = Config(
         parent_levels=max(0, ns.parents),
@@ -709,15 +1487,31 @@ def main() -> int:
         css_url=ns.css_url,
         css_palette_enabled=not ns.no_css_palette,
         embedded_only=ns.embedded_only,
+        workers=max(1, ns.workers),
+        batch_size=max(0, min(100, ns.batch_size)),
+        max_rps=max(0.0, ns.max_rps) or (1.0 / ns.sleep if ns.sleep > 0 else 0.0),
+        pool_size=max(1, ns.pool_size),
+        keepalive_s=max(0.0, ns.keepalive),
+        http2=ns.http2,
     )
 
     logging.info("roots=%s", root_ids)
     logging.info("config=%s", asdict(cfg))
 
+    cache = cache_from_args(ns)
+
+    if ns.refresh:
+        return run_refresh(ns.refresh, os.path.abspath(ns.out), cfg, cache)
+
     global COLOR_NAME_TO_BG
-    if cfg.css_palette_enabled:
+    if cfg.css_palette_enabled and ns.offline:
+        COLOR_NAME_TO_BG = {}
+        logging.info("offline: css palette skipped")
+    elif cfg.css_palette_enabled:
         try:
-            COLOR_NAME_TO_BG = fetch_palette_css(cfg.css_url, timeout_s=cfg.request_timeout_s, user_agent=cfg.user_agent)
+            COLOR_NAME_TO_BG = fetch_palette_css(
+                cfg.css_url, timeout_s=cfg.request_timeout_s, user_agent=cfg.user_agent, http2=cfg.http2
+            )
         except Exception as e:
             logging.warning("failed to fetch/parse css palette, continuing without it: %s", e)
             COLOR_NAME_TO_BG = {}
@@ -725,17 +1519,41 @@ def main() -> int:
         COLOR_NAME_TO_BG = {}
         logging.info("css palette disabled")
 
-    payload = build_aggregation(root_ids, cfg)
-
     out_path = os.path.abspath(ns.out)
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+    checkpoint = None
+    if ns.checkpoint is not None or ns.resume:
+        if cfg.embedded_only:
+            logging.warning("--checkpoint/--resume ignored in --embedded-only mode")
+        else:
+            checkpoint = CrawlCheckpoint(ns.checkpoint or out_path + ".ckpt", resume=ns.resume)
+            if ns.resume and checkpoint.state is None:
+                logging.warning("no checkpoint state at %s, starting from the roots", checkpoint.state_path)
+
+    if ns.format == "ndjson":
+        writer = NdjsonWriter(out_path)
+        writer.header(cfg, root_ids)
+        payload = build_aggregation(root_ids, cfg, cache, checkpoint, max(1, ns.checkpoint_every), sink=writer.kitty)
+        writer.finish(payload)
+    else:
+        payload = build_aggregation(root_ids, cfg, cache, checkpoint, max(1, ns.checkpoint_every))
+        if ns.format == "ckpd":
+            Pedigree.from_payload(payload).save(out_path)
+        else:
+            with open(out_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, indent=2)
+    if checkpoint is not None:
+        checkpoint.remove()
 
     # Always print final status so there is no "silent success"
     print(f"Wrote: {out_path}")
     print(f"Kitties: {payload['counts']['kitties']}  Errors: {payload['counts']['errors']}")
     if payload["counts"]["errors"]:
         print("Some errors occurred. Inspect the 'errors' array in the JSON.")
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Cache: {stats['hits']} hits, {stats['misses']} misses ({stats['path']})")
+        cache.close()
 
     return 0
 
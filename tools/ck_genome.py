@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Genome decoding shared by the analysis tools: single genomes (memoized) and
+whole datasets (vectorized).
+
+A kitty genome is 256 bits: 48 genes of 5 bits (values 0-31, written as kai
+characters), grouped into 12 traits of 4 genes each (d, r1, r2, r3). Gene k is
+slot k % 4 of trait k // 4 and sits at bits 5k..5k+4, least significant first.
+
+decode_alleles() turns the four 64-bit gene limb columns of a Pedigree into an
+(N, 12, 4) uint8 array of allele values in 48 shift-and-mask passes over the
+whole dataset, with no per-kitty Python work. Analyses index that array (and
+the parent slot columns) instead of decoding genomes one by one; KAI[value]
+gives the kai character of an allele.
+
+Rows of kitties without genes are zero; genes_mask() tells them apart.
+
+allele_masks() folds each trait block into a uint32 with bit v set when allele
+value v is present, so set algebra over alleles (parent pools, new alleles)
+becomes bitwise ops on whole columns; popcount() counts the members.
+
+kitty_keys() hashes, per kitty, everything a per-kitty genome result depends on
+(id, generation, genome, parent ids and parent genomes), so cached results can
+be reused for exactly the kitties whose key is unchanged.
+
+decode_genome() decodes one genome into a Genome tuple (kai string, trait
+blocks, expressed trait names, mewtation tiers) through a bounded LRU cache
+keyed by the gene integer, so a popular sire's genome is decoded once no matter
+how many children's reports show it. Results are shared: they are immutable.
+
+The whole-dataset decoders require numpy (pip install numpy); decode_genome()
+does not.
+
+Usage from a tool:
+    from ck_genome import decode_alleles, decode_genome, genes_mask, inheritance_triples
+
+    alleles = decode_alleles(ped)             # (N, 12, 4) uint8
+    child, matron, sire = inheritance_triples(ped)
+    dominant = alleles[:, :, 0]               # expressed allele per trait
+
+    g = decode_genome(kitty['genes'])         # cached Genome
+    g.blocks[0], g.expressed[0], g.tiers[0]   # body: 'd r1 r2 r3', trait name, tier
+
+Time a full decode:
+    python3 ck_genome.py ../dist/examples/nivs/nivs_full_parents.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional, only needed for the whole-dataset decoders
+    np = None
+
+from ck_pedigree import GENE_LIMBS, Pedigree, load_dataset, split_genes
+from ck_traits import KAI, TRAIT_NAMES, get_mewtation_tier, get_trait_name
+
+TRAITS = 12
+SLOTS = 4  # d, r1, r2, r3
+GENE_BITS = 5
+GENE_MASK = (1 << GENE_BITS) - 1
+GENOME_CACHE_SIZE = 65536  # decoded genomes kept by decode_genome()
+KEY_MULTIPLIER = 0x9E3779B97F4A7C15  # 64-bit golden ratio, for kitty_keys()
+
+
+class Genome(NamedTuple):
+    """One decoded genome; shared between callers by the decode cache."""
+    genes: int
+    kai: str                             # 48 kai characters, most significant gene first
+    blocks: Tuple[str, ...]              # 12 trait blocks of 4 alleles (d, r1, r2, r3)
+    expressed: Tuple[Optional[str], ...]  # trait name of each dominant allele (None if unknown)
+    tiers: Tuple[Optional[str], ...]     # mewtation tier of each dominant allele
+
+
+def genes_to_kai(genes_int: int | str) -> str:
+    """Convert genes integer to kai string (48 chars)."""
+    n = int(genes_int)
+    chars = []
+    for _ in range(TRAITS * SLOTS):
+        chars.append(KAI[n & GENE_MASK])
+        n >>= GENE_BITS
+    return ''.join(reversed(chars))
+
+
+def kai_to_int(kai: str) -> int:
+    """Convert kai string back to genes integer."""
+    n = 0
+    for char in kai:
+        n = n * 32 + KAI.index(char)
+    return n
+
+
+def kai_to_trait_blocks(kai: str) -> List[str]:
+    """Return list of 12 trait blocks, each with 4 alleles (d, r1, r2, r3)."""
+    # Traits are stored LSB-first in the gene, so reverse the kai string
+    kai_rev = kai[::-1]
+    return [kai_rev[i * SLOTS:(i + 1) * SLOTS] for i in range(TRAITS)]
+
+
+@lru_cache(maxsize=GENOME_CACHE_SIZE)
+def _decode_genome(genes: int) -> Genome:
+    kai = genes_to_kai(genes)
+    blocks = tuple(kai_to_trait_blocks(kai))
+    return Genome(
+        genes=genes,
+        kai=kai,
+        blocks=blocks,
+        expressed=tuple(get_trait_name(i, block[0]) for i, block in enumerate(blocks)),
+        tiers=tuple(get_mewtation_tier(block[0]) for block in blocks),
+    )
+
+
+def decode_genome(genes: int | str) -> Genome:
+    """Decode a genome (int or decimal string), memoized by gene integer."""
+    return _decode_genome(int(genes))
+
+
+def genome_cache_info() -> Any:
+    """Hit/miss statistics of the decode_genome() cache."""
+    return _decode_genome.cache_info()
+
+
+def column(col: Any, dtype: Any) -> np.ndarray:
+    """Zero-copy numpy view of a Pedigree column (array or memory-mapped memoryview)."""
+    return np.frombuffer(col, dtype=dtype)
+
+
+def decode_limbs(limbs: Sequence[np.ndarray]) -> np.ndarray:
+    """(N, 12, 4) uint8 alleles from GENE_LIMBS uint64 arrays, least significant limb first."""
+    n = len(limbs[0])
+    out = np.empty((n, TRAITS * SLOTS), dtype=np.uint8)
+    mask = np.uint64(GENE_MASK)
+    for k in range(TRAITS * SLOTS):
+        limb, shift = divmod(GENE_BITS * k, 64)
+        value = limbs[limb] >> np.uint64(shift)
+        if shift > 64 - GENE_BITS:
+            # Gene straddles two limbs: pull the high bits from the next one
+            value = value | (limbs[limb + 1] << np.uint64(64 - shift))
+        out[:, k] = value & mask
+    return out.reshape(n, TRAITS, SLOTS)
+
+
+def decode_alleles(ped: Pedigree) -> np.ndarray:
+    """Decode every genome of a pedigree into an (N, 12, 4) uint8 allele array."""
+    return decode_limbs([column(col, np.uint64) for col in ped.genes])
+
+
+def decode_genes(genes: Iterable[Any]) -> np.ndarray:
+    """Decode gene integers (or decimal strings, None = zeros) into an (N, 12, 4) array."""
+    rows = [split_genes(g) or (0,) * GENE_LIMBS for g in genes]
+    limbs = np.array(rows, dtype=np.uint64).reshape(len(rows), GENE_LIMBS)
+    return decode_limbs([limbs[:, n] for n in range(GENE_LIMBS)])
+
+
+def genes_mask(ped: Pedigree) -> np.ndarray:
+    """Bool array, True where the kitty has genes."""
+    return column(ped.has_genes, np.uint8).astype(bool)
+
+
+def allele_masks(alleles: np.ndarray) -> np.ndarray:
+    """(N, 12) uint32 allele-presence masks (bit v = allele value v) from an (N, 12, 4) array."""
+    return np.bitwise_or.reduce(np.uint32(1) << alleles.astype(np.uint32), axis=2)
+
+
+def popcount(masks: np.ndarray) -> np.ndarray:
+    """Number of set bits of every element of a uint32 array."""
+    if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+        return np.bitwise_count(masks)
+    return np.unpackbits(masks[..., None].view(np.uint8), axis=-1).sum(axis=-1)
+
+
+def mask_values(mask: int) -> List[int]:
+    """Allele values present in a mask, ascending."""
+    return [v for v in range(len(KAI)) if mask >> v & 1]
+
+
+def mask_cells(masks: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(row, trait, allele) for every set bit of an (N, 12) mask array, in that order."""
+    rows, traits = np.nonzero(masks)
+    bits = (masks[rows, traits][:, None] >> np.arange(len(KAI), dtype=np.uint32)) & 1
+    cell, allele = np.nonzero(bits)
+    return rows[cell], traits[cell], allele
+
+
+class FirstMutationTable:
+    """
+    Who discovered each mewtation: the first kitty to carry a (trait, allele)
+    that neither of its parents had.
+
+    first[trait, allele] is the lowest such kitty id (NONE = not seen yet).
+    Kitty ids are handed out at birth, so id order is birthday order, and every
+    parent precedes its children, so it is a topological order too. Discovery is
+    therefore a single min-fold over the new-allele masks with no sorting, and
+    update() folds in kitties as they arrive. Lookups index the (12, 32) table.
+    """
+
+    NONE = (1 << 63) - 1  # int64 max
+
+    def __init__(self) -> None:
+        self.first = np.full((TRAITS, len(KAI)), self.NONE, dtype=np.int64)
+
+    @classmethod
+    def build(cls, ids: np.ndarray, mutated: np.ndarray) -> "FirstMutationTable":
+        table = cls()
+        table.update(ids, mutated)
+        return table
+
+    def update(self, ids: np.ndarray, mutated: np.ndarray) -> None:
+        """Fold in kitties (ids, (N, 12) new-allele masks); order does not matter."""
+        rows, traits, alleles = mask_cells(mutated)
+        np.minimum.at(self.first, (traits, alleles), ids[rows])
+
+    def __len__(self) -> int:
+        return int((self.first != self.NONE).sum())
+
+    def get(self, trait: str, allele: str) -> Optional[int]:
+        """Discoverer of a (trait name, kai character), None if never seen."""
+        kid = int(self.first[TRAIT_NAMES.index(trait), KAI.index(allele)])
+        return kid if kid != self.NONE else None
+
+    def rows(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(kitty_id, trait, allele) arrays of every discovery, in discovery order."""
+        traits, alleles = np.nonzero(self.first != self.NONE)
+        ids = self.first[traits, alleles]
+        order = np.lexsort((alleles, traits, ids))
+        return ids[order], traits[order], alleles[order]
+
+    def as_dict(self) -> Dict[Tuple[str, str], int]:
+        """{(trait name, kai character): kitty id}, in discovery order."""
+        return {
+            (TRAIT_NAMES[t], KAI[a]): kid
+            for kid, t, a in zip(*(col.tolist() for col in self.rows()))
+        }
+
+
+def inheritance_triples(ped: Pedigree) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (child, matron, sire) slot arrays for every kitty whose parents are both in
+    the dataset, with genes on all three. Children are in slot order.
+    """
+    matron = column(ped.matron, np.int32)
+    sire = column(ped.sire, np.int32)
+    has = genes_mask(ped)
+    ok = (matron >= 0) & (sire >= 0) & has
+    ok[ok] &= has[matron[ok]] & has[sire[ok]]
+    child = np.nonzero(ok)[0]
+    return child, matron[child], sire[child]
+
+
+def _mix(h: np.ndarray, values: np.ndarray) -> np.ndarray:
+    h = (h ^ values.astype(np.uint64)) * np.uint64(KEY_MULTIPLIER)
+    return h ^ (h >> np.uint64(29))
+
+
+def kitty_keys(ped: Pedigree) -> np.ndarray:
+    """uint64 content key per kitty over its id, generation, genome and parents (ids and genomes)."""
+    has = column(ped.has_genes, np.uint8)
+    limbs = [column(col, np.uint64) for col in ped.genes]
+
+    h = np.zeros(len(ped), dtype=np.uint64)
+    for col, dtype in ((ped.ids, np.int64), (ped.matron_id, np.int64), (ped.sire_id, np.int64), (ped.generation, np.int32)):
+        h = _mix(h, column(col, dtype))
+    for values in (has, *limbs):
+        h = _mix(h, values)
+
+    # A parent's genome only counts when the parent is in the dataset
+    for parent in (column(ped.matron, np.int32), column(ped.sire, np.int32)):
+        present = parent >= 0
+        slot = np.where(present, parent, 0)
+        h = _mix(h, present)
+        for values in (has, *limbs):
+            h = _mix(h, np.where(present, values[slot], 0))
+    return h
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Decode every genome of a dataset and report timing")
+    parser.add_argument("path", help="Aggregation JSON, NDJSON or CKPD file")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    ped = load_dataset(args.path, keep_records=False)
+    t1 = time.perf_counter()
+    alleles = decode_alleles(ped)
+    t2 = time.perf_counter()
+    child, matron, sire = inheritance_triples(ped)
+
+    # Per-family decoding, as the reports do it: parents repeat across children
+    for c, m, s in zip(child.tolist(), matron.tolist(), sire.tolist()):
+        for i in (c, m, s):
+            decode_genome(ped.genes_of(i))
+    t3 = time.perf_counter()
+    cache = genome_cache_info()
+
+    print(f"Kitties:        {len(ped)} ({int(genes_mask(ped).sum())} with genes)")
+    print(f"Parent triples: {len(child)}")
+    print(f"Allele array:   {alleles.shape} {alleles.dtype}, {alleles.nbytes:,} bytes")
+    print(f"Load:           {(t1 - t0) * 1000:.1f} ms")
+    print(f"Decode:         {(t2 - t1) * 1000:.1f} ms")
+    print(f"Family decode:  {(t3 - t2) * 1000:.1f} ms ({cache.hits} cached, {cache.misses} decoded)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
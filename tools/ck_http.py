@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP helpers for the CryptoKitties fetching tools.
+
+RateLimiter
+- Token bucket shared by every thread of a tool (one instance per process)
+- Starts at the configured requests/second and never exceeds it
+- On 429 it halves the rate and pauses all callers for Retry-After (or a short penalty)
+- After a run of healthy responses it speeds back up towards the configured rate
+
+get_with_retry
+- GET through a limiter: 429s feed the limiter, connection errors and 5xx back off
+  exponentially per request, anything else is returned to the caller
+
+make_session
+- One pooled client per tool so requests reuse TCP+TLS connections
+- requests.Session with a sized connection pool and TCP keep-alive probes, or with
+  --http2 an httpx client (optional dependency: pip install 'httpx[http2]')
+- Both return responses with status_code/headers/json()/content/raise_for_status();
+  catch HTTP_ERRORS rather than requests.exceptions.RequestException
+
+Usage:
+    from ck_http import RateLimiter, get_with_retry, make_session
+
+    session = make_session(pool_size=8, user_agent="my-tool/1.0")
+    limiter = RateLimiter(rate=5.0)
+    resp = get_with_retry(session.get, url, limiter, timeout=30)
+    if resp.status_code == 404:
+        ...
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import email.utils
+import logging
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+try:
+    import httpx
+except ImportError:  # optional, only needed for --http2
+    httpx = None
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_RETRIES = 8
+DEFAULT_BACKOFF_BASE_S = 0.75
+DEFAULT_POOL_SIZE = 10
+DEFAULT_KEEPALIVE_S = 60.0
+
+# Exceptions raised by either session backend
+HTTP_ERRORS: tuple = (requests.exceptions.RequestException,)
+if httpx is not None:
+    HTTP_ERRORS += (httpx.HTTPError,)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket with adaptive feedback from 429 responses.
+
+    rate <= 0 disables pacing, but Retry-After pauses are still honoured.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        min_rate: float = 0.2,
+        backoff_factor: float = 0.5,
+        recover_factor: float = 1.25,
+        recover_after: int = 20,
+        penalty_s: float = 1.0,
+    ) -> None:
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.min_rate = min(min_rate, rate) if rate > 0 else 0.0
+        self.backoff_factor = backoff_factor
+        self.recover_factor = recover_factor
+        self.recover_after = recover_after
+        self.penalty_s = penalty_s
+
+        self.throttled = 0
+        self._healthy_streak = 0
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate: float) -> None:
+        """Change the ceiling (and current rate), e.g. from a --max-rps flag."""
+        with self._lock:
+            self.max_rate = rate
+            self.rate = rate
+            self.min_rate = min(self.min_rate, rate) if rate > 0 else 0.0
+
+    def acquire(self) -> None:
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                    self._last = self._blocked_until
+                elif self.rate <= 0:
+                    return
+                else:
+                    self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                    self._last = now
+                    if self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        return
+                    wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self._healthy_streak += 1
+            if self._healthy_streak >= self.recover_after and 0 < self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate * self.recover_factor)
+                self._healthy_streak = 0
+                log.debug("rate limiter: healthy, rate -> %.2f/s", self.rate)
+
+    def on_throttled(self, retry_after_s: Optional[float] = None) -> None:
+        with self._lock:
+            self.throttled += 1
+            self._healthy_streak = 0
+            self._tokens = 0.0
+            if self.rate > 0:
+                self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+            pause = retry_after_s if retry_after_s is not None else self.penalty_s
+            self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+            log.warning("429 rate limited, pausing %.2fs (rate now %.2f/s)", pause, self.rate)
+
+    def observe(self, resp: Any) -> bool:
+        """Feed a response back into the limiter. Returns True if it was a 429."""
+        if resp.status_code == 429:
+            self.on_throttled(parse_retry_after(resp.headers.get("Retry-After")))
+            return True
+        if resp.status_code < 500:
+            self.on_success()
+        return False
+
+
+def get_with_retry(
+    get: Callable[..., Any],
+    url: str,
+    limiter: RateLimiter,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    backoff_base_s: float = DEFAULT_BACKOFF_BASE_S,
+    **kwargs: Any,
+) -> Any:
+    """
+    GET url via get(url, **kwargs), paced and retried.
+
+    Returns the first response that is neither a 429 nor a 5xx (callers decide
+    what 404 and other statuses mean). Raises RuntimeError once retries run out.
+    """
+    last_err: Optional[Exception] = None
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            log.debug("GET %s", url)
+            resp = get(url, **kwargs)
+        except Exception as e:
+            last_err = e
+            sleep = backoff_base_s * (2 ** attempt)
+            log.warning("Request failed (%s), sleeping %.2fs", e, sleep)
+            time.sleep(sleep)
+            continue
+
+        if limiter.observe(resp):
+            last_err = RuntimeError(f"429 rate limited: {url}")
+            continue
+        if resp.status_code >= 500:
+            last_err = RuntimeError(f"{resp.status_code} server error: {url}")
+            sleep = backoff_base_s * (2 ** attempt)
+            log.warning("Server error %d, sleeping %.2fs", resp.status_code, sleep)
+            time.sleep(sleep)
+            continue
+        return resp
+
+    raise RuntimeError(f"GET failed after retries: {url} | Last error: {last_err}")
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled sockets send TCP keep-alive probes after keepalive_s idle seconds."""
+
+    def __init__(self, keepalive_s: float = DEFAULT_KEEPALIVE_S, **kwargs: Any) -> None:
+        self.keepalive_s = keepalive_s
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        options = list(HTTPConnection.default_socket_options)
+        if self.keepalive_s > 0:
+            idle = max(1, int(self.keepalive_s))
+            options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+            # Linux / macOS names; elsewhere the OS defaults apply
+            for name in ("TCP_KEEPIDLE", "TCP_KEEPALIVE"):
+                if hasattr(socket, name):
+                    options.append((socket.IPPROTO_TCP, getattr(socket, name), idle))
+                    break
+            if hasattr(socket, "TCP_KEEPINTVL"):
+                options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, idle // 4)))
+        kwargs["socket_options"] = options
+        super().init_poolmanager(*args, **kwargs)
+
+
+def make_session(
+    pool_size: int = DEFAULT_POOL_SIZE,
+    keepalive_s: float = DEFAULT_KEEPALIVE_S,
+    http2: bool = False,
+    user_agent: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> Any:
+    """
+    Build the pooled HTTP client a tool shares across all its requests and threads.
+
+    pool_size should be at least the number of worker threads. keepalive_s <= 0
+    turns connection reuse off (Connection: close). http2 needs httpx with h2
+    installed; without it this logs a warning and falls back to requests.
+    """
+    all_headers = dict(headers or {})
+    if user_agent:
+        all_headers["User-Agent"] = user_agent
+    if keepalive_s <= 0:
+        all_headers["Connection"] = "close"
+
+    if http2:
+        if httpx is None:
+            log.warning("--http2 needs httpx (pip install 'httpx[http2]'), using HTTP/1.1")
+        else:
+            try:
+                return httpx.Client(
+                    http2=True,
+                    follow_redirects=True,
+                    headers=all_headers,
+                    limits=httpx.Limits(
+                        max_connections=pool_size,
+                        max_keepalive_connections=pool_size if keepalive_s > 0 else 0,
+                        keepalive_expiry=keepalive_s if keepalive_s > 0 else None,
+                    ),
+                )
+            except ImportError as e:
+                log.warning("HTTP/2 unavailable (%s), using HTTP/1.1", e)
+
+    session = requests.Session()
+    session.headers.update(all_headers)
+    adapter = KeepAliveAdapter(keepalive_s=keepalive_s, pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@contextlib.contextmanager
+def stream_get(session: Any, url: str, **kwargs: Any) -> Iterator[Any]:
+    """GET url without buffering the body, on either session backend. Read it with iter_body()."""
+    if httpx is not None and isinstance(session, httpx.Client):
+        with session.stream("GET", url, **kwargs) as resp:
+            yield resp
+    else:
+        resp = session.get(url, stream=True, **kwargs)
+        try:
+            yield resp
+        finally:
+            resp.close()
+
+
+def iter_body(resp: Any, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    if hasattr(resp, "iter_bytes"):
+        return resp.iter_bytes(chunk_size)
+    return resp.iter_content(chunk_size)
+
+
+def add_http_args(parser: argparse.ArgumentParser) -> None:
+    """Add the shared --pool-size/--keepalive/--http2 flags."""
+    group = parser.add_argument_group("http client")
+    group.add_argument(
+        "--pool-size",
+        type=int,
+        default=DEFAULT_POOL_SIZE,
+        help=f"Pooled connections kept per host (default {DEFAULT_POOL_SIZE}, raised to --workers if lower)",
+    )
+    group.add_argument(
+        "--keepalive",
+        type=float,
+        default=DEFAULT_KEEPALIVE_S,
+        help=f"Idle seconds before TCP keep-alive probes / pooled connection expiry (default {DEFAULT_KEEPALIVE_S:g}, "
+             "0 = new connection per request)",
+    )
+    group.add_argument(
+        "--http2",
+        action="store_true",
+        help="Use HTTP/2 via httpx if installed (pip install 'httpx[http2]')",
+    )
+
+
+def session_from_args(args: argparse.Namespace, user_agent: Optional[str] = None, min_pool: int = 1) -> Any:
+    """Build the pooled client requested on the command line."""
+    return make_session(
+        pool_size=max(min_pool, args.pool_size),
+        keepalive_s=max(0.0, args.keepalive),
+        http2=args.http2,
+        user_agent=user_agent,
+    )
+
+
+def add_rate_limit_args(parser: argparse.ArgumentParser, default_rps: float) -> None:
+    """Add the shared --max-rps flag."""
+    parser.add_argument(
+        "--max-rps",
+        type=float,
+        default=default_rps,
+        help=f"Requests-per-second ceiling; slows down automatically on 429s (default {default_rps:g}, 0 = unlimited)",
+    )
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Relatedness queries over a pedigree: lowest common ancestors, kinship,
+coefficient of relationship and inbreeding.
+
+Kinship(ped) precomputes each kitty's pedigree depth (0 for kitties without
+parents in the dataset, else 1 + the deeper parent) in one pass over the
+topological order. An ancestor is always shallower than its descendants, so
+the tabular recursion
+
+    phi(x, x) = (1 + phi(matron_x, sire_x)) / 2
+    phi(x, y) = (phi(matron_x, y) + phi(sire_x, y)) / 2    depth(x) >= depth(y)
+
+(parents not in the dataset count as unrelated founders) only ever expands the
+deeper kitty of a pair. It is evaluated with an explicit stack, so lineage
+depth is not limited by Python's recursion limit, and every pair it touches is
+memoized: the table fills sparsely, only over the ancestors of the pairs
+actually asked about, and queries over one herd share their common ancestry.
+
+- kinship(a, b)       probability that alleles drawn from a and b are identical
+                      by descent (0.25 for parent/child or full siblings)
+- inbreeding(a)       kinship of a's parents
+- relationship(a, b)  Wright's coefficient: 2 phi / sqrt((1 + F_a) (1 + F_b))
+- lca(a, b)           lowest common ancestors (not an ancestor of another
+                      common ancestor) with their hop distance to a and b
+
+Arguments and results are slots; use ped.index_of() / ped.ids to convert.
+
+Usage from a tool:
+    from ck_kinship import Kinship
+
+    kin = Kinship(ped)
+    a, b = ped.index_of(896775), ped.index_of(1461)
+    kin.relationship(a, b), kin.lca(a, b)
+    kin.kinship(matron, sire)                 # inbreeding of their offspring
+
+Query a dataset:
+    python3 ck_kinship.py ../dist/examples/nivs/nivs_full_parents.json 124653 129868
+    python3 ck_kinship.py ../dist/examples/nivs/nivs_full_parents.json --rank --limit 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import math
+import sys
+import time
+from array import array
+from typing import Dict, List, Sequence, Tuple
+
+from ck_pedigree import NO_PARENT, Pedigree, load_dataset
+
+
+class Kinship:
+    """Memoized relatedness queries over one pedigree; see the module docstring."""
+
+    def __init__(self, ped: Pedigree) -> None:
+        self.ped = ped
+        self.n = len(ped)
+        self.depth = array("i", [NO_PARENT]) * self.n  # -1 = in a parent cycle (malformed data)
+        for i in ped.topological_order():
+            d = 0
+            for p in ped.parents_of(i):
+                if p >= 0:
+                    d = max(d, self.depth[p] + 1)
+            self.depth[i] = d
+        self._phi: Dict[int, float] = {}
+
+    def __len__(self) -> int:
+        """Number of memoized kinship pairs."""
+        return len(self._phi)
+
+    def parents(self, i: int) -> Tuple[int, int]:
+        """Parent slots used by the recursion; kitties in a parent cycle count as founders."""
+        if self.depth[i] < 0:
+            return NO_PARENT, NO_PARENT
+        return self.ped.parents_of(i)
+
+    def _key(self, x: int, y: int) -> int:
+        return x * self.n + y if x <= y else y * self.n + x
+
+    def _expand(self, x: int, y: int) -> Tuple[float, List[Tuple[int, int]]]:
+        """phi(x, y) as base + (sum of the phi of the returned pairs) / 2."""
+        if x == y:
+            m, s = self.parents(x)
+            return 0.5, ([(m, s)] if m >= 0 and s >= 0 else [])
+        if (self.depth[x], x) < (self.depth[y], y):
+            x, y = y, x  # expand the deeper kitty, which cannot be an ancestor of the other
+        return 0.0, [(p, y) for p in self.parents(x) if p >= 0]
+
+    def kinship(self, a: int, b: int) -> float:
+        """Coefficient of kinship (coancestry) of slots a and b, 0 if either is -1."""
+        if a < 0 or b < 0:
+            return 0.0
+        phi = self._phi
+        key = self._key(a, b)
+        if key in phi:
+            return phi[key]
+        stack = [(a, b)]
+        while stack:
+            x, y = stack[-1]
+            k = self._key(x, y)
+            if k in phi:
+                stack.pop()
+                continue
+            base, pairs = self._expand(x, y)
+            missing = [pair for pair in pairs if self._key(*pair) not in phi]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            phi[k] = base + 0.5 * sum(phi[self._key(*pair)] for pair in pairs)
+        return phi[key]
+
+    def inbreeding(self, a: int) -> float:
+        """Inbreeding coefficient F of slot a: the kinship of its parents."""
+        return self.kinship(*self.parents(a))
+
+    def relationship(self, a: int, b: int) -> float:
+        """Wright's coefficient of relationship of slots a and b (1 for a kitty with itself)."""
+        if a < 0 or b < 0:
+            return 0.0
+        return 2 * self.kinship(a, b) / math.sqrt((1 + self.inbreeding(a)) * (1 + self.inbreeding(b)))
+
+    def hops(self, a: int) -> Dict[int, int]:
+        """Fewest parent hops from slot a to each of its ancestors (a itself at 0)."""
+        dist = {a: 0}
+        frontier = [a]
+        while frontier:
+            nxt = []
+            for i in frontier:
+                for p in self.parents(i):
+                    if p >= 0 and p not in dist:
+                        dist[p] = dist[i] + 1
+                        nxt.append(p)
+            frontier = nxt
+        return dist
+
+    def lca(self, a: int, b: int) -> List[Tuple[int, int, int]]:
+        """
+        Lowest common ancestors of slots a and b as (slot, hops from a, hops from b),
+        closest first. A kitty counts as its own ancestor, so lca(a, a) is [(a, 0, 0)].
+        """
+        if a < 0 or b < 0:
+            return []
+        up_a, up_b = self.hops(a), self.hops(b)
+        common = up_a.keys() & up_b.keys()
+        # Common ancestors of a common ancestor are not lowest
+        covered = set()
+        stack = [p for c in common for p in self.parents(c) if p >= 0]
+        while stack:
+            i = stack.pop()
+            if i in covered:
+                continue
+            covered.add(i)
+            stack.extend(p for p in self.parents(i) if p >= 0 and p not in covered)
+        lowest = [(c, up_a[c], up_b[c]) for c in common - covered]
+        lowest.sort(key=lambda t: (t[1] + t[2], -self.depth[t[0]], t[0]))
+        return lowest
+
+    def rank_pairs(self, slots: Sequence[int]) -> List[Tuple[float, int, int]]:
+        """All pairs of the given slots as (kinship, a, b), least related first."""
+        slots = [s for s in slots if s >= 0]
+        pairs = [(self.kinship(a, b), a, b) for a, b in itertools.combinations(slots, 2)]
+        pairs.sort()
+        return pairs
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Kinship, relationship and common ancestors of kitties in a dataset")
+    parser.add_argument("path", help="Aggregation JSON, NDJSON or CKPD file")
+    parser.add_argument("ids", nargs="*", type=int, help="Two kitty ids to compare, or the herd for --rank")
+    parser.add_argument("--rank", action="store_true",
+                        help="Rank every pair of the given ids (default: the dataset's root ids) by offspring inbreeding")
+    parser.add_argument("--limit", type=int, default=20, help="Max pairs listed with --rank (default 20)")
+    args = parser.parse_args()
+
+    ped = load_dataset(args.path, keep_records=False)
+    t0 = time.perf_counter()
+    kin = Kinship(ped)
+    t1 = time.perf_counter()
+
+    ids = args.ids or (ped.root_ids if args.rank else [])
+    missing = [kid for kid in ids if kid not in ped]
+    if missing:
+        print(f"Error: not in dataset: {', '.join(f'#{kid}' for kid in missing)}", file=sys.stderr)
+        return 2
+
+    if args.rank:
+        pairs = kin.rank_pairs([ped.index_of(kid) for kid in ids])
+        t2 = time.perf_counter()
+        rate = len(pairs) / (t2 - t1) if t2 > t1 else float("inf")
+        print(f"Ranked {len(pairs)} pairs of {len(ids)} kitties in {(t2 - t1) * 1000:.1f} ms "
+              f"({rate:,.0f} pairs/s, {len(kin)} kinship entries)")
+        print(f"{'Pair':>19} {'Kinship':>8} {'Relationship':>13}")
+        for phi, a, b in pairs[:args.limit]:
+            print(f"  #{ped.ids[a]:>7} #{ped.ids[b]:>7} {phi:>8.4f} {kin.relationship(a, b):>13.4f}")
+        return 0
+
+    if len(ids) != 2:
+        parser.error("give two kitty ids, or --rank")
+    a, b = (ped.index_of(kid) for kid in ids)
+    print(f"Pedigree depth computed in {(t1 - t0) * 1000:.1f} ms for {len(ped)} kitties")
+    print(f"#{ids[0]}: depth {kin.depth[a]}, inbreeding {kin.inbreeding(a):.4f}")
+    print(f"#{ids[1]}: depth {kin.depth[b]}, inbreeding {kin.inbreeding(b):.4f}")
+    print(f"Kinship:      {kin.kinship(a, b):.6f}")
+    print(f"Relationship: {kin.relationship(a, b):.6f}")
+    lowest = kin.lca(a, b)
+    if not lowest:
+        print("No common ancestor in the dataset")
+    for c, ha, hb in lowest:
+        print(f"  Common ancestor #{ped.ids[c]}: {ha} generation(s) above #{ids[0]}, {hb} above #{ids[1]}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Force-directed layout of a kitty graph on numpy arrays, matching the viewer.
+
+ForceLayout runs the force model of d3-force / d3-force-3d as the 3D viewer
+configures it (ck-family-graph-3d.js): a link force with distance 80 and
+strength 1 / min(degree), a many-body charge of -120, a centering force, and
+velocity decay 0.4, while alpha cools from 1 to 0.001 over 300 ticks. The 3D
+variant pins every node's z to the value the viewer computes for the Z-axis
+mode (node.fz), so only x and y move but distances are measured in 3D.
+
+Every force is computed for all nodes at once:
+- links: one gather/scatter over the (source, target) index arrays
+- charge: exact pairwise sums in row blocks up to EXACT_MAX_NODES nodes, above
+  that Barnes-Hut (theta 0.9, as in d3). The tree is a stack of regular grids,
+  one per level, with cell masses and centers from bincount. Per level, every
+  open (node, cell) pair is tested at once: far cells act through their center
+  of mass, near ones open into their children, and at the finest level the
+  remaining pairs interact exactly.
+
+Start positions use d3's deterministic phyllotaxis and the only randomness
+(jiggle for coincident nodes) comes from a seeded generator, so the same
+graph always gives the same layout.
+
+Usage from a tool:
+    from ck_layout import ForceLayout, graph_arrays
+
+    ids, source, target = graph_arrays(kitties)
+    xy = ForceLayout(len(ids), source, target).run()                    # (N, 2)
+    xyz = ForceLayout(len(ids), source, target, fixed_z=z).run()        # (N, 3), z pinned
+
+Time a layout:
+    python3 ck_layout.py ../dist/examples/shortest_path/nivs_plus_dragon.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+LINK_DISTANCE = 80.0
+CHARGE_STRENGTH = -120.0
+THETA = 0.9
+DISTANCE_MIN2 = 1.0
+ALPHA_MIN = 0.001
+ALPHA_DECAY = 1 - ALPHA_MIN ** (1 / 300)
+VELOCITY_DECAY = 0.4
+INITIAL_RADIUS = 10.0
+INITIAL_ANGLE_ROLL = math.pi * (3 - math.sqrt(5))
+INITIAL_ANGLE_YAW = math.pi * 20 / (9 + math.sqrt(221))
+
+EXACT_MAX_NODES = 500   # exact charge up to here, Barnes-Hut above
+EXACT_BLOCK = 512       # rows per block of the exact pairwise sum
+LEAF_SIZE = 8           # target nodes per finest Barnes-Hut cell
+MAX_LEVELS = 10
+
+
+def graph_arrays(kitties: List[Dict[str, Any]]) -> Tuple[List[int], np.ndarray, np.ndarray]:
+    """(node ids, link source indices, link target indices): one node per id, parent -> child links."""
+    index: Dict[int, int] = {}
+    for k in kitties:
+        index.setdefault(int(k["id"]), len(index))
+    source, target = [], []
+    for k in kitties:
+        child = index[int(k["id"])]
+        for key in ("matron_id", "sire_id"):
+            parent = k.get(key)
+            if parent and int(parent) in index:
+                source.append(index[int(parent)])
+                target.append(child)
+    return list(index), np.array(source, dtype=np.int64), np.array(target, dtype=np.int64)
+
+
+def initial_positions(n: int, dims: int) -> np.ndarray:
+    """d3-force(-3d)'s phyllotaxis start positions."""
+    i = np.arange(n, dtype=np.float64)
+    roll = i * INITIAL_ANGLE_ROLL
+    if dims == 2:
+        radius = INITIAL_RADIUS * np.sqrt(0.5 + i)
+        return np.column_stack([radius * np.cos(roll), radius * np.sin(roll)])
+    radius = INITIAL_RADIUS * np.cbrt(0.5 + i)
+    yaw = i * INITIAL_ANGLE_YAW
+    return np.column_stack([radius * np.sin(roll) * np.cos(yaw), radius * np.cos(roll), radius * np.sin(roll) * np.sin(yaw)])
+
+
+def _spread(starts: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """For ranges [starts, starts + counts): (owning range of each element, element index)."""
+    owner = np.repeat(np.arange(len(counts)), counts)
+    first = np.cumsum(counts) - counts
+    return owner, np.arange(int(counts.sum())) - first[owner] + starts[owner]
+
+
+def _scatter(out: np.ndarray, rows: np.ndarray, values: np.ndarray) -> None:
+    """out[rows] += values, summing repeated rows."""
+    for d in range(out.shape[1]):
+        out[:, d] += np.bincount(rows, weights=values[:, d], minlength=len(out))
+
+
+def _pull(delta: np.ndarray, weight: np.ndarray) -> np.ndarray:
+    """d3 many-body term: delta * weight / l, with l = |delta|^2 softened below DISTANCE_MIN2."""
+    l = np.einsum("ij,ij->i", delta, delta)
+    l = np.where(l < DISTANCE_MIN2, np.sqrt(DISTANCE_MIN2 * l), l)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scale = np.where(l > 0, weight / l, 0.0)
+    return delta * scale[:, None]
+
+
+def charge_exact(pos: np.ndarray, strength: float) -> np.ndarray:
+    """Velocity change from every pair, summed in row blocks (alpha not applied)."""
+    n, dims = pos.shape
+    cols = [pos[:, d] for d in range(dims)]
+    dv = np.empty_like(pos)
+    for start in range(0, n, EXACT_BLOCK):
+        stop = min(n, start + EXACT_BLOCK)
+        delta = [c[None, :] - c[start:stop, None] for c in cols]  # (B, N) per axis: from i to j
+        l = delta[0] * delta[0]
+        for dd in delta[1:]:
+            l += dd * dd
+        l = np.where(l < DISTANCE_MIN2, np.sqrt(DISTANCE_MIN2 * l), l)
+        with np.errstate(divide="ignore"):
+            w = np.where(l > 0, strength / l, 0.0)  # self and coincident pairs: 0
+        for d, dd in enumerate(delta):
+            dv[start:stop, d] = (dd * w).sum(axis=1)
+    return dv
+
+
+def charge_barnes_hut(pos: np.ndarray, strength: float, theta: float = THETA) -> np.ndarray:
+    """Barnes-Hut approximation of charge_exact over a stack of regular grids."""
+    n, dims = pos.shape
+    lo = pos.min(axis=0)
+    size = max(float((pos.max(axis=0) - lo).max()), 1e-6) * (1 + 1e-9)
+    levels = int(min(MAX_LEVELS, max(1, math.ceil(math.log(max(n / LEAF_SIZE, 2)) / math.log(2 ** dims)))))
+    finest = np.minimum(((pos - lo) / size * (1 << levels)).astype(np.int64), (1 << levels) - 1)
+
+    # Occupied cells per level: ids, center of mass, and CSR children (cells of the next level)
+    cells, inverse, centers = [], [], []
+    for level in range(levels + 1):
+        coords = finest >> (levels - level)
+        key = np.zeros(n, dtype=np.int64)
+        for d in range(dims):
+            key = (key << level) | coords[:, d]
+        ids, inv = np.unique(key, return_inverse=True)
+        count = np.bincount(inv, minlength=len(ids))
+        center = np.column_stack([np.bincount(inv, weights=pos[:, d], minlength=len(ids)) for d in range(dims)])
+        cells.append(count)
+        inverse.append(inv)
+        centers.append(center / count[:, None])
+    children = []
+    for level in range(levels):
+        parent_of_child = np.zeros(len(cells[level + 1]), dtype=np.int64)
+        parent_of_child[inverse[level + 1]] = inverse[level]
+        order = np.argsort(parent_of_child, kind="stable")
+        counts = np.bincount(parent_of_child, minlength=len(cells[level]))
+        children.append((order, np.cumsum(counts) - counts, counts))
+    members = np.argsort(inverse[levels], kind="stable")
+    member_starts = np.cumsum(cells[levels]) - cells[levels]
+
+    dv = np.zeros_like(pos)
+    body = np.arange(n)
+    cell = np.zeros(n, dtype=np.int64)  # every node starts at the root
+    for level in range(levels + 1):
+        delta = centers[level][cell] - pos[body]
+        l = np.einsum("ij,ij->i", delta, delta)
+        width = size / (1 << level)
+        far = width * width / (theta * theta) < l
+        _scatter(dv, body[far], _pull(delta[far], strength * cells[level][cell[far]]))
+        body, cell = body[~far], cell[~far]
+        if level < levels:
+            order, starts, counts = children[level]
+            owner, idx = _spread(starts[cell], counts[cell])
+            body, cell = body[owner], order[idx]
+    # Pairs still open at the finest level interact node by node
+    owner, idx = _spread(member_starts[cell], cells[levels][cell])
+    i, j = body[owner], members[idx]
+    keep = i != j
+    i, j = i[keep], j[keep]
+    _scatter(dv, i, _pull(pos[j] - pos[i], np.full(len(i), strength)))
+    return dv
+
+
+class ForceLayout:
+    """d3-force simulation over index arrays; see the module docstring."""
+
+    def __init__(
+        self,
+        n: int,
+        source: np.ndarray,
+        target: np.ndarray,
+        fixed_z: Optional[np.ndarray] = None,
+        dims: Optional[int] = None,
+        seed: int = 42,
+        barnes_hut: Optional[bool] = None,
+    ) -> None:
+        self.dims = dims or (3 if fixed_z is not None else 2)
+        self.source, self.target = source, target
+        self.fixed_z = None if fixed_z is None else np.asarray(fixed_z, dtype=np.float64)
+        self.barnes_hut = n > EXACT_MAX_NODES if barnes_hut is None else barnes_hut
+        self.rng = np.random.default_rng(seed)
+        self.pos = initial_positions(n, self.dims)
+        if self.fixed_z is not None:
+            self.pos[:, 2] = self.fixed_z
+        self.vel = np.zeros_like(self.pos)
+        self.alpha = 1.0
+
+        # forceLink defaults: strength 1 / min(degree), bias towards the lower-degree end
+        degree = np.bincount(np.concatenate([source, target]), minlength=n).astype(np.float64)
+        self.link_strength = 1 / np.minimum(degree[source], degree[target]) if len(source) else np.zeros(0)
+        self.link_bias = degree[source] / (degree[source] + degree[target]) if len(source) else np.zeros(0)
+
+    def _jiggle(self, shape: Tuple[int, ...]) -> np.ndarray:
+        return (self.rng.random(shape) - 0.5) * 1e-6
+
+    def tick(self) -> None:
+        self.alpha += (0 - self.alpha) * ALPHA_DECAY
+        s, t = self.source, self.target
+
+        # Link force, on positions advanced by the current velocities (as d3 does)
+        if len(s):
+            delta = (self.pos[t] + self.vel[t]) - (self.pos[s] + self.vel[s])
+            zero = ~delta.any(axis=1)
+            if zero.any():
+                delta[zero] = self._jiggle((int(zero.sum()), self.dims))
+            length = np.sqrt(np.einsum("ij,ij->i", delta, delta))
+            delta *= ((length - LINK_DISTANCE) / length * self.alpha * self.link_strength)[:, None]
+            dv = np.zeros_like(self.vel)
+            _scatter(dv, t, -delta * self.link_bias[:, None])
+            _scatter(dv, s, delta * (1 - self.link_bias)[:, None])
+            self.vel += dv
+
+        # Many-body charge
+        charge = charge_barnes_hut if self.barnes_hut else charge_exact
+        self.vel += charge(self.pos, CHARGE_STRENGTH) * self.alpha
+
+        # Centering (pinned z stays where the viewer puts it)
+        free = 2 if self.fixed_z is not None else self.dims
+        self.pos[:, :free] -= self.pos[:, :free].mean(axis=0)
+
+        self.vel *= 1 - VELOCITY_DECAY
+        self.pos += self.vel
+        if self.fixed_z is not None:
+            self.pos[:, 2] = self.fixed_z
+            self.vel[:, 2] = 0
+
+    def run(self, ticks: Optional[int] = None) -> np.ndarray:
+        """Tick until alpha cools below ALPHA_MIN (300 ticks, like the viewer) or for `ticks`; returns positions."""
+        if ticks is None:
+            ticks = math.ceil(math.log(ALPHA_MIN / self.alpha) / math.log(1 - ALPHA_DECAY))
+        for _ in range(ticks):
+            self.tick()
+        return self.pos
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Lay out a dataset's family graph and report timing")
+    parser.add_argument("path", help="Aggregation JSON file")
+    parser.add_argument("--dims", type=int, choices=(2, 3), default=2, help="2D, or 3D with z pinned by generation (0-800, as in the viewer)")
+    parser.add_argument("--ticks", type=int, default=None, help="Ticks to run (default: until cooled, 300)")
+    parser.add_argument("--exact", action="store_true", help="Exact pairwise charge even on large graphs")
+    args = parser.parse_args()
+
+    with open(args.path) as f:
+        data = json.load(f)
+    kitties = data.get("kitties", data) if isinstance(data, dict) else data
+    ids, source, target = graph_arrays(kitties)
+    fixed_z = None
+    if args.dims == 3:
+        gen = {int(k["id"]): k.get("generation", 0) for k in kitties}
+        g = np.array([gen[i] for i in ids], dtype=np.float64)
+        fixed_z = (g.max() - g) / max(g.max() - g.min(), 1) * 800  # the viewer's generation Z axis
+
+    t0 = time.perf_counter()
+    layout = ForceLayout(len(ids), source, target, fixed_z=fixed_z, barnes_hut=False if args.exact else None)
+    pos = layout.run(args.ticks)
+    t1 = time.perf_counter()
+
+    extent = pos.max(axis=0) - pos.min(axis=0)
+    print(f"Nodes: {len(ids)}, links: {len(source)}, charge: {'Barnes-Hut' if layout.barnes_hut else 'exact'}")
+    print(f"Layout: {(t1 - t0) * 1000:.0f} ms, extent {' x '.join(f'{e:.0f}' for e in extent)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
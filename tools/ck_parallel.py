@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Sharded multi-process runner for the analysis tools (--jobs N).
+
+run_sharded() splits the work items 0..n into one contiguous shard per job,
+runs a worker function on each shard in a process pool and folds the partial
+results with an associative reducer, left to right in shard order. Because
+shards are contiguous and merged in order, list concatenation and dict/Counter
+merges give exactly what a single-process run over 0..n would.
+
+Data reaches the workers without per-item pickling:
+- shared: named numpy arrays copied once into multiprocessing.shared_memory
+  blocks; every worker attaches to them and sees zero-copy views. Workers may
+  also write to disjoint slices of the ones named in `outputs`, which are
+  copied back into the caller's arrays on return. A worker that only writes
+  outputs needs no reducer: leave it as None and run_sharded() returns None.
+- state: any other object (e.g. a Pedigree with its records). Where the
+  platform can fork, workers inherit it; otherwise it is pickled once per
+  worker, not once per item.
+
+With jobs <= 1 (or a single shard) the worker runs in-process on the arrays
+themselves, so tools call run_sharded() unconditionally.
+
+Usage from a tool:
+    from ck_parallel import add_jobs_arg, merge_counters, run_sharded
+
+    add_jobs_arg(parser)
+    def count_shard(start, stop, shared, state): ...   # top-level function
+    total = run_sharded(count_shard, n, args.jobs, merge_counters, shared={"genes": arr}, state=ped)
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+    from multiprocessing import shared_memory
+except ImportError:  # optional, only needed for shared arrays
+    np = None
+
+Worker = Callable[[int, int, Dict[str, Any], Any], Any]
+
+# Per-worker-process globals, set by _init_worker (or inherited through fork)
+_SHARED: Dict[str, Any] = {}
+_STATE: Any = None
+_BLOCKS: List[Any] = []
+
+
+def add_jobs_arg(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Worker processes for the analysis (default 1, 0 = one per CPU)",
+    )
+
+
+def resolve_jobs(jobs: int) -> int:
+    """--jobs value as a process count (0 = one per CPU)."""
+    return jobs if jobs > 0 else (os.cpu_count() or 1)
+
+
+def shard_bounds(n: int, shards: int) -> List[Tuple[int, int]]:
+    """Split 0..n into up to `shards` contiguous, non-empty, near-equal ranges."""
+    shards = max(1, min(shards, n))
+    step, extra = divmod(n, shards)
+    bounds = []
+    start = 0
+    for s in range(shards):
+        stop = start + step + (1 if s < extra else 0)
+        bounds.append((start, stop))
+        start = stop
+    return bounds
+
+
+def merge_lists(a: List[Any], b: List[Any]) -> List[Any]:
+    return a + b
+
+
+def merge_counters(a: Counter, b: Counter) -> Counter:
+    a.update(b)
+    return a
+
+
+def merge_dicts(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge result dicts key by key: lists concatenate, Counters add, dicts of those recurse."""
+    for key, value in b.items():
+        if key not in a:
+            a[key] = value
+        elif isinstance(value, Counter):
+            a[key].update(value)
+        elif isinstance(value, dict):
+            merge_dicts(a[key], value)
+        elif isinstance(value, list):
+            a[key].extend(value)
+        else:
+            a[key] = a[key] + value
+    return a
+
+
+def _attach(specs: Dict[str, Tuple[str, Tuple[int, ...], str]]) -> None:
+    for name, (block, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=block)
+        _BLOCKS.append(shm)  # keep the mapping alive for the worker's lifetime
+        _SHARED[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _init_worker(specs: Dict[str, Tuple[str, Tuple[int, ...], str]], inherited: bool, state: Any) -> None:
+    global _STATE
+    _attach(specs)
+    if not inherited:
+        _STATE = state
+
+
+def _run_shard(worker: Worker, start: int, stop: int) -> Any:
+    return worker(start, stop, _SHARED, _STATE)
+
+
+def run_sharded(
+    worker: Worker,
+    n: int,
+    jobs: int,
+    reducer: Optional[Callable[[Any, Any], Any]] = None,
+    shared: Optional[Dict[str, Any]] = None,
+    outputs: Iterable[str] = (),
+    state: Any = None,
+) -> Any:
+    """
+    Run worker(start, stop, shared, state) over contiguous shards of 0..n on
+    `jobs` processes and fold the results with reducer, in shard order.
+    Shared arrays named in `outputs` are updated in place with what the workers wrote.
+    Without a reducer the workers' return values are dropped and None is returned.
+    """
+    global _STATE
+    shared = shared or {}
+    bounds = shard_bounds(n, resolve_jobs(jobs))
+    if len(bounds) == 1:
+        result = worker(0, n, shared, state)
+        return result if reducer is not None else None
+
+    blocks = []
+    specs = {}
+    try:
+        for name, arr in shared.items():
+            shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+            blocks.append(shm)
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+            specs[name] = (shm.name, arr.shape, arr.dtype.str)
+
+        inherited = "fork" in multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context("fork" if inherited else None)
+        _STATE = state  # inherited by forked workers
+        with ProcessPoolExecutor(
+            max_workers=len(bounds),
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(specs, inherited, None if inherited else state),
+        ) as pool:
+            futures = [pool.submit(_run_shard, worker, start, stop) for start, stop in bounds]
+            partials = [f.result() for f in futures]
+
+        for shm, (name, arr) in zip(blocks, shared.items()):
+            if name in outputs:
+                arr[...] = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+    finally:
+        _STATE = None
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    if reducer is None:
+        return None
+    result = partials[0]
+    for partial in partials[1:]:
+        result = reducer(result, partial)
+    return result
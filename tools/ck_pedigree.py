@@ -0,0 +1,746 @@
+#!/usr/bin/env python3
+"""
+Compact array-backed pedigree store shared by the analysis tools.
+
+Every tool used to rebuild its own Dict[int, Dict] of full kitty objects. A
+Pedigree keeps the graph in typed arrays instead, one slot per kitty:
+
+- ids, matron_id, sire_id          int64   raw ids (0 = no parent)
+- matron, sire                     int32   parent slot, -1 = not in dataset
+- generation                       int32   -1 = unknown
+- color                            int32   index into ped.colors, -1 = none
+- genes                            4 x uint64 limbs of the 256-bit genome
+- has_genes                        uint8
+- name_offsets, names              uint64, uint8   UTF-8 names back to back (name of slot
+                                   i is names[name_offsets[i]:name_offsets[i + 1]], empty = none)
+- child_offsets, child_index       int32   CSR child lists (children of slot i are
+                                   child_index[child_offsets[i]:child_offsets[i + 1]])
+- index                            id -> slot (built on first use)
+
+Slots follow file order (duplicate ids: last record wins, keeping the first
+slot). Full records are optional: tools that only need ids, parents, generation,
+genes, color and name load with keep_records=False and never hold the JSON
+objects past parsing; load_records() re-reads the full records of a few ids
+when a report needs more.
+
+Reads classic aggregation JSON ({"kitties": [...]}, also {"data": [...]} and
+bare lists), ck_fetch.py NDJSON streams (kitty by kitty) and the CKPD binary
+format below.
+
+CKPD binary format (.ckpd, written by ck_fetch.py/prune_json.py --format ckpd)
+- "CKPD", uint32 version, uint64 header length (little-endian)
+- UTF-8 JSON header: count, byteorder, root_ids, meta, colors, and for every
+  column its struct type code, element count and offset into the data section
+- data section (8-byte aligned): the columns above back to back, then the name
+  columns (absent in files written before they existed), then, unless written
+  without records, record_offsets (uint64, count + 1) and records (the compact
+  JSON of each kitty, concatenated)
+Loading memory-maps the file and casts each column to a memoryview in place: no
+parsing or copying, and records are only decoded when a tool asks for one.
+
+Usage from a tool:
+    from ck_pedigree import load_dataset
+
+    ped = load_dataset(path)              # Pedigree, records kept
+    kitties = ped.as_dict()               # {id: kitty} for record-level code
+    i = ped.index[kitty_id]
+    for c in ped.children_of(i): ...
+
+Inspect a dataset, or convert it to CKPD:
+    python3 ck_pedigree.py ../dist/examples/nivs/nivs.json
+    python3 ck_pedigree.py ../dist/examples/nivs/nivs.json --write-ckpd nivs.ckpd
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+GENE_LIMBS = 4  # 256-bit genome as unsigned 64-bit limbs, least significant first
+LIMB_MASK = (1 << 64) - 1
+NO_PARENT = -1
+
+CKPD_MAGIC = b"CKPD"
+CKPD_VERSION = 1
+CKPD_PREFIX = struct.Struct("<4sIQ")  # magic, version, header length
+CKPD_COLUMNS = (
+    ("ids", "q"),
+    ("matron_id", "q"),
+    ("sire_id", "q"),
+    ("matron", "i"),
+    ("sire", "i"),
+    ("generation", "i"),
+    ("color", "i"),
+    *((f"genes{n}", "Q") for n in range(GENE_LIMBS)),
+    ("has_genes", "B"),
+    ("child_offsets", "i"),
+    ("child_index", "i"),
+)
+
+
+def parent_id(kitty: Dict[str, Any], key: str) -> int:
+    """matron/sire id from either the flat *_id field or the nested API object, 0 = none."""
+    value = kitty.get(f"{key}_id")
+    if not value:
+        nested = kitty.get(key)
+        value = nested.get("id") if isinstance(nested, dict) else None
+    return int(value) if value else 0
+
+
+def split_genes(genes: Any) -> Optional[Tuple[int, ...]]:
+    """Genome (int or decimal string) as GENE_LIMBS 64-bit limbs, None if absent."""
+    if genes is None or genes == "":
+        return None
+    g = int(genes)
+    return tuple((g >> (64 * n)) & LIMB_MASK for n in range(GENE_LIMBS))
+
+
+class Pedigree:
+    """Typed-array pedigree graph; see the module docstring for the layout."""
+
+    def __init__(self) -> None:
+        # Columns are arrays when built from JSON, read-only memoryviews over an mmap for CKPD
+        self.ids = array("q")
+        self.matron_id = array("q")
+        self.sire_id = array("q")
+        self.matron = array("i")
+        self.sire = array("i")
+        self.generation = array("i")
+        self.color = array("i")
+        self.colors: List[str] = []
+        self.genes: Tuple[Any, ...] = tuple(array("Q") for _ in range(GENE_LIMBS))
+        self.has_genes = array("B")
+        self.name_offsets: Optional[Sequence[int]] = array("Q", [0])  # None: CKPD file without names
+        self.names: Any = bytearray()
+        self._renamed: Dict[int, bytes] = {}  # names of duplicate ids, spliced in by _link()
+        self.child_offsets = array("i", [0])
+        self.child_index = array("i")
+        self._index: Optional[Dict[int, int]] = {}
+        self.records: Optional[Sequence[Dict[str, Any]]] = None
+        self.root_ids: List[int] = []
+        self.meta: Dict[str, Any] = {}  # top-level keys besides the kitties
+        self._mapping: Optional[mmap.mmap] = None
+
+    @property
+    def index(self) -> Dict[int, int]:
+        """id -> slot; for a memory-mapped pedigree built on first access."""
+        if self._index is None:
+            self._index = dict(zip(self.ids, range(len(self.ids))))
+        return self._index
+
+    @classmethod
+    def from_kitties(
+        cls,
+        kitties: Iterable[Dict[str, Any]],
+        root_ids: Iterable[Any] = (),
+        meta: Optional[Dict[str, Any]] = None,
+        keep_records: bool = True,
+    ) -> "Pedigree":
+        """Build from kitty dicts (any iterable, consumed once)."""
+        ped = cls()
+        ped.records = [] if keep_records else None
+        ped.root_ids = [int(r) for r in root_ids]
+        ped.meta = dict(meta or {})
+        for kitty in kitties:
+            ped._put(kitty)
+        ped._link()
+        return ped
+
+    @classmethod
+    def from_payload(cls, data: Any, keep_records: bool = True) -> "Pedigree":
+        """Build from a parsed aggregation document (or a bare list of kitties)."""
+        if isinstance(data, list):
+            return cls.from_kitties(data, keep_records=keep_records)
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object or list of kitties")
+        key = "kitties" if "kitties" in data else "data"
+        meta = {k: v for k, v in data.items() if k not in (key, "root_ids")}
+        return cls.from_kitties(data.get(key) or [], data.get("root_ids") or [], meta, keep_records=keep_records)
+
+    def _put(self, kitty: Dict[str, Any]) -> None:
+        kid = kitty.get("id")
+        if not kid:
+            return
+        kid = int(kid)
+        gen = kitty.get("generation")
+        limbs = split_genes(kitty.get("genes"))
+        name = (kitty.get("name") or "").encode("utf-8")
+        values = (
+            parent_id(kitty, "matron"),
+            parent_id(kitty, "sire"),
+            int(gen) if gen is not None else -1,
+            self._color_code(kitty.get("color")),
+        )
+
+        slot = self.index.get(kid)
+        if slot is None:
+            self.index[kid] = len(self.ids)
+            self.ids.append(kid)
+            self.matron_id.append(values[0])
+            self.sire_id.append(values[1])
+            self.generation.append(values[2])
+            self.color.append(values[3])
+            for n, limb in enumerate(limbs or (0,) * GENE_LIMBS):
+                self.genes[n].append(limb)
+            self.has_genes.append(limbs is not None)
+            self.names += name
+            self.name_offsets.append(len(self.names))
+            if self.records is not None:
+                self.records.append(kitty)
+            return
+
+        self.matron_id[slot], self.sire_id[slot], self.generation[slot], self.color[slot] = values
+        for n, limb in enumerate(limbs or (0,) * GENE_LIMBS):
+            self.genes[n][slot] = limb
+        self.has_genes[slot] = limbs is not None
+        self._renamed[slot] = name
+        if self.records is not None:
+            self.records[slot] = kitty
+
+    def _color_code(self, color: Optional[str]) -> int:
+        if not color:
+            return -1
+        try:
+            return self.colors.index(color)
+        except ValueError:
+            self.colors.append(color)
+            return len(self.colors) - 1
+
+    def _link(self) -> None:
+        """Resolve parent slots, apply the names of duplicate ids and build the CSR child lists."""
+        n = len(self.ids)
+        index = self.index
+        if self._renamed:
+            offsets, names = array("Q", [0]), bytearray()
+            for i in range(n):
+                names += self._renamed.get(i, self.names[self.name_offsets[i]:self.name_offsets[i + 1]])
+                offsets.append(len(names))
+            self.name_offsets, self.names, self._renamed = offsets, names, {}
+        self.matron = array("i", (index.get(m, NO_PARENT) if m else NO_PARENT for m in self.matron_id))
+        self.sire = array("i", (index.get(s, NO_PARENT) if s else NO_PARENT for s in self.sire_id))
+
+        counts = array("i", bytes(array("i").itemsize * (n + 1)))
+        for i in range(n):
+            m, s = self.matron[i], self.sire[i]
+            if m >= 0:
+                counts[m + 1] += 1
+            if s >= 0 and s != m:  # self-bred: one child entry, not two
+                counts[s + 1] += 1
+        for i in range(n):
+            counts[i + 1] += counts[i]
+        self.child_offsets = counts
+
+        fill = array("i", counts[:n])
+        self.child_index = array("i", bytes(array("i").itemsize * counts[n]))
+        for i in range(n):
+            m, s = self.matron[i], self.sire[i]
+            if m >= 0:
+                self.child_index[fill[m]] = i
+                fill[m] += 1
+            if s >= 0 and s != m:
+                self.child_index[fill[s]] = i
+                fill[s] += 1
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, kitty_id: Any) -> bool:
+        return int(kitty_id) in self.index
+
+    def index_of(self, kitty_id: Any) -> int:
+        """Slot of kitty_id, -1 if it is not in the dataset."""
+        return self.index.get(int(kitty_id), NO_PARENT)
+
+    def parents_of(self, i: int) -> Tuple[int, int]:
+        """(matron slot, sire slot), -1 where the parent is unknown or not loaded."""
+        return self.matron[i], self.sire[i]
+
+    def children_of(self, i: int) -> Sequence[int]:
+        return self.child_index[self.child_offsets[i]:self.child_offsets[i + 1]]
+
+    def neighbors(self, i: int) -> List[int]:
+        """Parent and child slots of i (undirected pedigree edges)."""
+        m, s = self.matron[i], self.sire[i]
+        out = [p for p in ((m, s) if s != m else (m,)) if p >= 0]
+        out.extend(self.children_of(i))
+        return out
+
+    def ancestor_mask(self, roots: Iterable[int], matron: bool = True, sire: bool = True) -> bytearray:
+        """
+        Slots reachable from the root slots through parent edges (roots included),
+        1 per slot. One iterative pass for all roots: shared ancestors are visited once.
+        """
+        seen = bytearray(len(self.ids))
+        stack = [r for r in roots if r >= 0]
+        while stack:
+            i = stack.pop()
+            if seen[i]:
+                continue
+            seen[i] = 1
+            if matron and self.matron[i] >= 0 and not seen[self.matron[i]]:
+                stack.append(self.matron[i])
+            if sire and self.sire[i] >= 0 and not seen[self.sire[i]]:
+                stack.append(self.sire[i])
+        return seen
+
+    def ancestor_bitsets(self, roots: Iterable[int]) -> Tuple[List[int], Dict[int, int]]:
+        """
+        Per-root ancestor sets from one post-order pass over the roots' closure.
+        Returns (order, sets): order lists the closure's slots, parents before
+        children; sets[root] is a bitset whose bit k means order[k] is the root or
+        one of its ancestors. Each kitty's set is built once from its parents' sets,
+        however many roots share it, and dropped once its last child has used it.
+        """
+        roots = [r for r in roots if r >= 0]
+        closure = self.ancestor_mask(roots)
+        pending = array("i", [0]) * len(self.ids)  # children in the closure not built yet
+        for i, inside in enumerate(closure):
+            if inside:
+                for p in (self.matron[i], self.sire[i]):
+                    if p >= 0:
+                        pending[p] += 1
+        for r in roots:
+            pending[r] += 1  # keep the roots' sets
+
+        pos = array("i", [NO_PARENT]) * len(self.ids)  # slot -> bit, once built
+        entered = bytearray(len(self.ids))
+        order: List[int] = []
+        bits: List[int] = []
+        for root in roots:
+            stack = [(root, False)]
+            while stack:
+                i, expanded = stack.pop()
+                if pos[i] >= 0:
+                    continue
+                parents = [p for p in (self.matron[i], self.sire[i]) if p >= 0]
+                if not expanded:
+                    if entered[i]:
+                        continue  # cycle in malformed data
+                    entered[i] = 1
+                    stack.append((i, True))
+                    stack.extend((p, False) for p in parents if pos[p] < 0)
+                    continue
+                b = 1 << len(order)
+                for p in parents:
+                    if pos[p] >= 0:
+                        b |= bits[pos[p]]
+                        pending[p] -= 1
+                        if not pending[p]:
+                            bits[pos[p]] = 0
+                pos[i] = len(order)
+                order.append(i)
+                bits.append(b)
+        return order, {r: bits[pos[r]] for r in roots}
+
+    def topological_order(self) -> List[int]:
+        """
+        Slots with every in-dataset parent before its children (Kahn's algorithm over
+        the parent edges). Kitties caught in a parent cycle (malformed data) are left out.
+        """
+        n = len(self.ids)
+        waiting = array("B", [0]) * n  # parents not yet placed
+        for i in range(n):
+            m, s = self.matron[i], self.sire[i]
+            waiting[i] = (m >= 0) + (s >= 0 and s != m)
+        order = [i for i in range(n) if not waiting[i]]
+        for i in order:  # grows while iterating
+            for c in self.children_of(i):
+                waiting[c] -= 1
+                if not waiting[c]:
+                    order.append(c)
+        return order
+
+    def genes_of(self, i: int) -> Optional[int]:
+        """Genome of slot i as an int, None if the record had no genes."""
+        if not self.has_genes[i]:
+            return None
+        g = 0
+        for n in reversed(range(GENE_LIMBS)):
+            g = (g << 64) | self.genes[n][i]
+        return g
+
+    def color_of(self, i: int) -> Optional[str]:
+        code = self.color[i]
+        return self.colors[code] if code >= 0 else None
+
+    def name_of(self, i: int) -> Optional[str]:
+        """Name of slot i, None if it has none (or the CKPD file has no name columns and no records)."""
+        if self.name_offsets is None:
+            return self.records[i].get("name") if self.records is not None else None
+        return bytes(self.names[self.name_offsets[i]:self.name_offsets[i + 1]]).decode("utf-8") or None
+
+    def record(self, i: int) -> Dict[str, Any]:
+        """Full kitty dict for slot i, or a minimal one rebuilt from the arrays."""
+        if self.records is not None:
+            return self.records[i]
+        genes = self.genes_of(i)
+        gen = self.generation[i]
+        return {
+            "id": self.ids[i],
+            "name": self.name_of(i),
+            "matron_id": self.matron_id[i] or None,
+            "sire_id": self.sire_id[i] or None,
+            "generation": gen if gen >= 0 else None,
+            "genes": str(genes) if genes is not None else None,
+            "color": self.color_of(i),
+        }
+
+    def get(self, kitty_id: Any) -> Optional[Dict[str, Any]]:
+        i = self.index_of(kitty_id)
+        return self.record(i) if i >= 0 else None
+
+    def kitties(self) -> Iterator[Dict[str, Any]]:
+        """Records in slot (file) order."""
+        for i in range(len(self.ids)):
+            yield self.record(i)
+
+    def as_dict(self) -> Dict[int, Dict[str, Any]]:
+        """{id: kitty} view for code that still works on records."""
+        return {self.ids[i]: self.record(i) for i in range(len(self.ids))}
+
+    def nbytes(self) -> int:
+        """Approximate size of the array columns, names included (records and index excluded)."""
+        names = len(self.name_offsets) * 8 + len(self.names) if self.name_offsets is not None else 0
+        return sum(len(col) * col.itemsize for _name, col in self.columns()) + names
+
+    def columns(self) -> Iterator[Tuple[str, Any]]:
+        """(name, column) in CKPD order."""
+        for name, _typecode in CKPD_COLUMNS:
+            if name.startswith("genes"):
+                yield name, self.genes[int(name[5:])]
+            else:
+                yield name, getattr(self, name)
+
+    def save(self, path: str, records: bool = True) -> None:
+        """Write the CKPD binary format (atomically, via a temp file next to path)."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.dumps(records))
+        os.replace(tmp, path)
+
+    def dumps(self, records: bool = True) -> bytes:
+        """The CKPD encoding of this pedigree (records included unless records=False)."""
+        blobs: List[bytes] = []
+        specs: Dict[str, Dict[str, Any]] = {}
+        offset = 0
+
+        def add(name: str, typecode: str, count: int, data: bytes) -> None:
+            nonlocal offset
+            specs[name] = {"type": typecode, "count": count, "offset": offset}
+            pad = -len(data) % 8
+            blobs.append(data + b"\0" * pad)
+            offset += len(data) + pad
+
+        for (name, typecode), (_name, col) in zip(CKPD_COLUMNS, self.columns()):
+            add(name, typecode, len(col), bytes(col))
+        if self.name_offsets is not None:
+            add("name_offsets", "Q", len(self.name_offsets), bytes(self.name_offsets))
+            add("names", "B", len(self.names), bytes(self.names))
+
+        if records and self.records is not None:
+            encoded = [
+                json.dumps(rec, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                for rec in self.kitties()
+            ]
+            rec_offsets = array("Q", [0])
+            for data in encoded:
+                rec_offsets.append(rec_offsets[-1] + len(data))
+            add("record_offsets", "Q", len(rec_offsets), rec_offsets.tobytes())
+            add("records", "B", rec_offsets[-1], b"".join(encoded))
+
+        header = json.dumps({
+            "count": len(self),
+            "byteorder": sys.byteorder,
+            "root_ids": self.root_ids,
+            "meta": self.meta,
+            "colors": self.colors,
+            "columns": specs,
+        }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+        prefix = CKPD_PREFIX.pack(CKPD_MAGIC, CKPD_VERSION, len(header))
+        pad = b"\0" * (-(CKPD_PREFIX.size + len(header)) % 8)
+        return b"".join([prefix, header, pad, *blobs])
+
+
+class LazyRecords:
+    """Kitty records of a CKPD file, decoded from the mapped JSON on each access."""
+
+    def __init__(self, offsets: Sequence[int], blob: memoryview) -> None:
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        return json.loads(bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]))
+
+
+class FounderDistances:
+    """
+    Fewest parent hops from every kitty to a Gen 0 founder, with the next slot on one
+    shortest path. Built in one pass over the pedigree in topological order:
+    dist[i] = 0 for founders (generation <= 0, unknown counts as one, as in the
+    greedy walk), else 1 + min over in-dataset parents; -1 = no founder reachable.
+    Ties prefer the matron. Saved next to a dataset, the table is reused as long
+    as the ids, parents and generations it was built from are unchanged.
+    """
+
+    MAGIC = b"CKFD"
+    VERSION = 1
+    PREFIX = struct.Struct("<4sI16sQ")  # magic, version, dataset fingerprint, count
+
+    def __init__(self, dist: Sequence[int], via: Sequence[int]) -> None:
+        self.dist = dist  # int32 hops, -1 = unreachable
+        self.via = via    # int32 parent slot on a shortest path, -1 at founders
+
+    @classmethod
+    def build(cls, ped: Pedigree) -> "FounderDistances":
+        n = len(ped)
+        dist = array("i", [NO_PARENT]) * n
+        via = array("i", [NO_PARENT]) * n
+        for i in ped.topological_order():
+            if ped.generation[i] <= 0:
+                dist[i] = 0
+                continue
+            best = NO_PARENT
+            for p in ped.parents_of(i):
+                if p >= 0 and dist[p] >= 0 and (best < 0 or dist[p] < dist[best]):
+                    best = p
+            if best >= 0:
+                dist[i] = dist[best] + 1
+                via[i] = best
+        return cls(dist, via)
+
+    def __len__(self) -> int:
+        return len(self.dist)
+
+    def path(self, i: int) -> List[int]:
+        """Slots from i to its nearest founder (i first), [] if none is reachable."""
+        if i < 0 or self.dist[i] < 0:
+            return []
+        path = [i]
+        while self.via[path[-1]] >= 0:
+            path.append(self.via[path[-1]])
+        return path
+
+    @staticmethod
+    def fingerprint(ped: Pedigree) -> bytes:
+        """Digest of the columns the table depends on."""
+        h = hashlib.blake2b(digest_size=16)
+        for col in (ped.ids, ped.matron, ped.sire, ped.generation):
+            h.update(memoryview(col).cast("B"))
+        return h.digest()
+
+    @classmethod
+    def load(cls, path: str, ped: Pedigree) -> Optional["FounderDistances"]:
+        """Table saved for this pedigree, None if absent, stale or unreadable."""
+        try:
+            with open(path, "rb") as f:
+                magic, version, digest, count = cls.PREFIX.unpack(f.read(cls.PREFIX.size))
+                if magic != cls.MAGIC or version != cls.VERSION or count != len(ped) or digest != cls.fingerprint(ped):
+                    return None
+                dist, via = array("i"), array("i")
+                dist.fromfile(f, count)
+                via.fromfile(f, count)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, struct.error) as e:
+            logging.warning("%s: ignoring unreadable founder distance cache (%s)", path, e)
+            return None
+        return cls(dist, via)
+
+    def save(self, path: str, ped: Pedigree) -> None:
+        """Write the table atomically, tagged with the pedigree's fingerprint."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.PREFIX.pack(self.MAGIC, self.VERSION, self.fingerprint(ped), len(self)))
+            array("i", self.dist).tofile(f)
+            array("i", self.via).tofile(f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def cached(cls, ped: Pedigree, path: Optional[str]) -> "FounderDistances":
+        """Load the table from path if it matches ped, else build it (and save it if path is set)."""
+        table = cls.load(path, ped) if path else None
+        if table is None:
+            table = cls.build(ped)
+            if path:
+                table.save(path, ped)
+        return table
+
+
+def is_ckpd(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(CKPD_MAGIC)) == CKPD_MAGIC
+
+
+def load_ckpd(path: str, keep_records: bool = True) -> Pedigree:
+    """Memory-map a CKPD file; columns are zero-copy memoryviews into the mapping."""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, header_len = CKPD_PREFIX.unpack_from(mapped, 0)
+    if magic != CKPD_MAGIC:
+        raise ValueError(f"{path}: not a CKPD file")
+    if version != CKPD_VERSION:
+        raise ValueError(f"{path}: unsupported CKPD version {version}")
+
+    start = CKPD_PREFIX.size
+    header = json.loads(mapped[start:start + header_len].decode("utf-8"))
+    base = start + header_len
+    base += -base % 8
+    view = memoryview(mapped)
+    swap = header["byteorder"] != sys.byteorder
+
+    def column(name: str) -> Any:
+        spec = header["columns"][name]
+        typecode = spec["type"]
+        begin = base + spec["offset"]
+        raw = view[begin:begin + spec["count"] * struct.calcsize(typecode)]
+        if swap and typecode != "B":
+            col = array(typecode, raw.tobytes())
+            col.byteswap()
+            return col
+        return raw.cast(typecode)
+
+    ped = Pedigree()
+    for name, _typecode in CKPD_COLUMNS:
+        if not name.startswith("genes"):
+            setattr(ped, name, column(name))
+    ped.genes = tuple(column(f"genes{n}") for n in range(GENE_LIMBS))
+    if "names" in header["columns"]:
+        ped.name_offsets, ped.names = column("name_offsets"), column("names")
+    else:
+        ped.name_offsets, ped.names = None, b""
+    ped._index = None
+    ped.colors = header["colors"]
+    ped.root_ids = header["root_ids"]
+    ped.meta = header["meta"]
+    ped._mapping = mapped  # keep the mapping alive as long as the views
+    if keep_records and "records" in header["columns"]:
+        ped.records = LazyRecords(column("record_offsets"), column("records"))
+    return ped
+
+
+def read_ndjson(path: str) -> Tuple[Dict[str, Any], Dict[str, Any], Iterator[Dict[str, Any]]]:
+    """
+    Open a ck_fetch.py NDJSON stream as (header, summary, kitties).
+
+    kitties is a generator; header and summary are filled in as it is consumed
+    (summary stays empty for a stream that was cut short). Unreadable lines
+    (a torn last write) are skipped with a warning.
+    """
+    header: Dict[str, Any] = {}
+    summary: Dict[str, Any] = {}
+
+    def kitties() -> Iterator[Dict[str, Any]]:
+        with open(path, "r", encoding="utf-8") as f:
+            for lineno, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    logging.warning("%s: skipping unreadable line %d", path, lineno)
+                    continue
+                rtype = rec.get("type")
+                if rtype == "kitty":
+                    yield rec["kitty"]
+                elif rtype == "header":
+                    header.update(rec)
+                elif rtype == "summary":
+                    summary.update(rec)
+
+    return header, summary, kitties()
+
+
+def is_ndjson(path: str) -> bool:
+    """True for ck_fetch.py NDJSON streams (by extension, else by the first line)."""
+    if str(path).endswith(".ndjson"):
+        return True
+    with open(path, "r", encoding="utf-8") as f:
+        first = f.readline()
+    try:
+        rec = json.loads(first)
+    except ValueError:
+        return False
+    return isinstance(rec, dict) and rec.get("type") == "header"
+
+
+def load_dataset(path: str, keep_records: bool = True) -> Pedigree:
+    """
+    Load an aggregation JSON, NDJSON stream or CKPD file into a Pedigree.
+
+    root_ids and all other top-level keys (config, included_by, errors, ...) end
+    up in ped.root_ids and ped.meta. NDJSON streams are built kitty by kitty, so
+    with keep_records=False only the arrays are ever held in memory; CKPD files
+    are memory-mapped.
+    """
+    if is_ckpd(path):
+        return load_ckpd(path, keep_records=keep_records)
+    if is_ndjson(path):
+        header, summary, kitties = read_ndjson(path)
+        ped = Pedigree.from_kitties(kitties, keep_records=keep_records)
+        ped.root_ids = [int(r) for r in header.get("root_ids", [])]
+        ped.meta = {k: v for k, v in header.items() if k not in ("type", "root_ids")}
+        ped.meta.update({k: v for k, v in summary.items() if k != "type"})
+        return ped
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    try:
+        return Pedigree.from_payload(data, keep_records=keep_records)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from None
+
+
+def load_records(path: str, kitty_ids: Iterable[Any]) -> Dict[int, Dict[str, Any]]:
+    """
+    Full records of just kitty_ids, re-read from a dataset that was loaded with
+    keep_records=False ({id: kitty} for the ids present; last record wins).
+    NDJSON streams are scanned kitty by kitty and CKPD records decoded per id.
+    """
+    wanted = {int(k) for k in kitty_ids}
+    if is_ckpd(path):
+        ped = load_ckpd(path)
+        return {kid: ped.record(ped.index_of(kid)) for kid in wanted if kid in ped}
+    if is_ndjson(path):
+        kitties: Iterable[Dict[str, Any]] = read_ndjson(path)[2]
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        kitties = data if isinstance(data, list) else (data.get("kitties") or data.get("data") or [])
+    return {int(k["id"]): k for k in kitties if k.get("id") and int(k["id"]) in wanted}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load a kitty dataset into the compact pedigree store and print stats")
+    parser.add_argument("path", help="Aggregation JSON, NDJSON or CKPD file")
+    parser.add_argument("--write-ckpd", metavar="FILE", help="Also write the dataset to FILE in CKPD binary format")
+    parser.add_argument("--no-records", action="store_true", help="With --write-ckpd: columns only, no kitty records")
+    args = parser.parse_args()
+
+    ped = load_dataset(args.path, keep_records=bool(args.write_ckpd) and not args.no_records)
+    in_set = sum(1 for i in range(len(ped)) if ped.matron[i] >= 0 or ped.sire[i] >= 0)
+    print(f"Kitties:             {len(ped)}")
+    print(f"Roots:               {len(ped.root_ids)}")
+    print(f"With parents loaded: {in_set}")
+    print(f"Child edges:         {len(ped.child_index)}")
+    print(f"With genes:          {sum(ped.has_genes)}")
+    print(f"Array bytes:         {ped.nbytes():,}")
+    if args.write_ckpd:
+        ped.save(args.write_ckpd, records=not args.no_records)
+        print(f"Wrote: {args.write_ckpd} ({os.path.getsize(args.write_ckpd):,} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -257,6 +257,17 @@ def get_trait_by_category(category: str, kai_char: str) -> Optional[str]:
     return None
 
 
+def find_trait_genes(trait_name: str) -> List[Tuple[int, str]]:
+    """All (category index, Kai character) that express a trait name."""
+    name = trait_name.lower()
+    return [
+        (idx, kai_char)
+        for idx, (_, _, traits) in enumerate(TRAIT_CATEGORIES)
+        for kai_char, trait in traits.items()
+        if trait == name
+    ]
+
+
 # =============================================================================
 # FANCY CAT RECIPES
 # Format: {fancy_name: {trait_category: required_trait_name, ...}}
@@ -2,18 +2,47 @@
 """
 Download kitty images (SVG or PNG) from a JSON file.
 
+Images are stored once by content under <output>/.blobs/sha256/ and linked into
+<output>/<id>.<ext> (hard link, else symlink, else copy). Every finished download
+is appended to <output>/manifest.ndjson, so --skip-existing re-runs skip known ids
+without probing the filesystem. Interrupted downloads are kept as .part files and
+resumed with HTTP Range requests. Each .part has a .part.json sidecar with its URL,
+ETag and total length: a .part from another URL is discarded, If-Range makes the
+server send the whole body again if the image changed, and a .part is only
+committed once its size matches the expected length.
+
 Usage:
     python3 download_svgs.py kitties.json -o ./images/
     python3 download_svgs.py kitties.json -o ./images/ --skip-existing
+    python3 download_svgs.py kitties.json -o ./images/ --skip-existing --workers 8
 """
 
 import argparse
+import hashlib
 import json
+import os
+import re
+import shutil
 import sys
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from urllib.request import urlopen, Request
-from urllib.error import HTTPError, URLError
+from typing import Any
+
+from ck_http import (
+    HTTP_ERRORS,
+    RateLimiter,
+    add_http_args,
+    iter_body,
+    make_session,
+    session_from_args,
+    stream_get,
+)
+
+USER_AGENT = "CK-Image-Downloader/1.0"
+MANIFEST_NAME = "manifest.ndjson"
+BLOB_DIR = Path(".blobs") / "sha256"
+PARTIAL_DIR = Path(".blobs") / "partial"
 
 
 def load_kitties(json_path: str) -> list[dict]:
@@ -64,32 +93,210 @@ def detect_format(url: str, content: bytes, content_type: str | None) -> str:
     return "svg"
 
 
-def download_image(url: str, output_dir: Path, kitty_id: int, timeout: int = 30) -> tuple[bool, str | None]:
-    """Download image from URL. Returns (success, extension)."""
+class BlobStore:
+    """
+    Content-addressed image store for one output directory.
+
+    Blobs live at .blobs/sha256/<h[:2]>/<h>.<ext> and are linked to <id>.<ext>.
+    The manifest is append-only NDJSON ({"id", "url", "sha256", "ext", "size"}
+    per line, last line per id wins) and is safe to write from worker threads.
+    """
+
+    def __init__(self, output_dir: Path) -> None:
+        self.output_dir = output_dir
+        self.manifest_path = output_dir / MANIFEST_NAME
+        self.manifest: dict[int, dict] = {}
+        self._lock = threading.Lock()
+
+        if self.manifest_path.exists():
+            with open(self.manifest_path, "r") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from an interrupted run
+                    self.manifest[int(rec["id"])] = rec
+
+    def known(self, kitty_id: int, url: str) -> dict | None:
+        """Manifest entry for kitty_id if it was downloaded from the same URL."""
+        rec = self.manifest.get(kitty_id)
+        if rec is not None and rec.get("url") == url:
+            return rec
+        return None
+
+    def partial_path(self, kitty_id: int) -> Path:
+        return self.output_dir / PARTIAL_DIR / f"{kitty_id}.part"
+
+    @staticmethod
+    def partial_meta_path(part: Path) -> Path:
+        return part.with_name(part.name + ".json")
+
+    def read_partial(self, part: Path) -> dict | None:
+        """Sidecar of a .part ({"url", "etag", "length"}), or None if missing or unreadable."""
+        try:
+            with open(self.partial_meta_path(part), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_partial(self, part: Path, meta: dict) -> None:
+        with open(self.partial_meta_path(part), "w") as f:
+            json.dump(meta, f)
+
+    def discard_partial(self, part: Path) -> None:
+        for path in (part, self.partial_meta_path(part)):
+            if path.exists():
+                path.unlink()
+
+    def commit(self, kitty_id: int, url: str, part: Path, sha256: str, ext: str) -> dict:
+        """Move a finished .part into the blob store, link it by id and record it."""
+        blob = self.output_dir / BLOB_DIR / sha256[:2] / f"{sha256}.{ext}"
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        if blob.exists():
+            part.unlink()
+        else:
+            os.replace(part, blob)
+        meta = self.partial_meta_path(part)
+        if meta.exists():
+            meta.unlink()
+
+        for old_ext in ("svg", "png"):
+            old = self.output_dir / f"{kitty_id}.{old_ext}"
+            if old.is_symlink() or old.exists():
+                old.unlink()
+        link_file(blob, self.output_dir / f"{kitty_id}.{ext}")
+
+        rec = {"id": kitty_id, "url": url, "sha256": sha256, "ext": ext, "size": blob.stat().st_size}
+        with self._lock:
+            self.manifest[kitty_id] = rec
+            with open(self.manifest_path, "a") as f:
+                f.write(json.dumps(rec) + "\n")
+        return rec
+
+
+def link_file(blob: Path, dest: Path) -> None:
+    """Hard-link dest to blob, falling back to a relative symlink, then a copy."""
+    try:
+        os.link(blob, dest)
+        return
+    except OSError:
+        pass
+    try:
+        os.symlink(os.path.relpath(blob, dest.parent), dest)
+        return
+    except OSError:
+        pass
+    shutil.copyfile(blob, dest)
+
+
+def parse_content_range(value: str | None) -> tuple[int | None, int | None]:
+    """(first byte, total length) from a Content-Range header; None where absent or "*"."""
+    m = re.fullmatch(r"\s*bytes\s+(?:(\d+)-\d+|\*)/(\d+|\*)\s*", value or "")
+    if not m:
+        return None, None
+    first, total = m.groups()
+    return (int(first) if first else None), (int(total) if total and total != "*" else None)
+
+
+def download_image(
+    url: str,
+    store: BlobStore,
+    kitty_id: int,
+    timeout: int = 30,
+    session: Any = None,
+    limiter: RateLimiter | None = None,
+) -> tuple[bool, str | None, bool]:
+    """
+    Download one image into the blob store. Returns (success, extension, resumed).
+
+    The body streams into a .part file; if one is left from an earlier attempt
+    for the same URL, only the missing bytes are requested (Range, with If-Range
+    on its ETag), unless the server ignores that and sends the whole body. A
+    .part that does not match (other URL, other range, 416 for a different
+    length) is discarded and the download restarts from scratch once.
+    """
+    if session is None:
+        session = make_session(pool_size=1, user_agent=USER_AGENT)
+    part = store.partial_path(kitty_id)
+    part.parent.mkdir(parents=True, exist_ok=True)
+
     try:
-        req = Request(url, headers={"User-Agent": "CK-Image-Downloader/1.0"})
-        with urlopen(req, timeout=timeout) as response:
-            content = response.read()
-            content_type = response.headers.get("Content-Type")
-
-            ext = detect_format(url, content, content_type)
-            output_path = output_dir / f"{kitty_id}.{ext}"
-
-            output_dir.mkdir(parents=True, exist_ok=True)
-            with open(output_path, "wb") as f:
-                f.write(content)
-
-            return True, ext
-
-    except HTTPError as e:
-        print(f"HTTP Error {e.code}: {e.reason}")
-        return False, None
-    except URLError as e:
-        print(f"URL Error: {e.reason}")
-        return False, None
+        for _attempt in range(2):
+            meta = store.read_partial(part) if part.exists() else None
+            if meta is None or meta.get("url") != url:
+                store.discard_partial(part)
+                meta = None
+            offset = part.stat().st_size if meta is not None else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            if offset and meta.get("etag"):
+                headers["If-Range"] = meta["etag"]
+
+            if limiter is not None:
+                limiter.acquire()
+            with stream_get(session, url, headers=headers, timeout=timeout) as response:
+                if limiter is not None:
+                    limiter.observe(response)
+                first, total = parse_content_range(response.headers.get("Content-Range"))
+                if response.status_code == 416 and offset:
+                    # Range past the end: complete only if the server's length is the one we expect
+                    expected = meta.get("length")
+                    if total is None or total != offset or (expected is not None and expected != total):
+                        print(f"  #{kitty_id}: stale partial download, restarting")
+                        store.discard_partial(part)
+                        continue
+                    resumed = True
+                elif response.status_code >= 400:
+                    print(f"  #{kitty_id}: HTTP Error {response.status_code}")
+                    return False, None, False
+                else:
+                    resumed = offset > 0 and response.status_code == 206
+                    if resumed:
+                        expected = meta.get("length")
+                        if first != offset or (expected is not None and total is not None and expected != total):
+                            print(f"  #{kitty_id}: partial download does not match the server's copy, restarting")
+                            store.discard_partial(part)
+                            continue
+                        if expected is None and total is not None:
+                            store.write_partial(part, {**meta, "length": total})
+                    else:
+                        # Content-Length counts encoded bytes, so only an unencoded body has a usable one
+                        length = response.headers.get("Content-Length")
+                        encoded = response.headers.get("Content-Encoding", "identity").lower() != "identity"
+                        total = int(length) if length and length.isdigit() and not encoded else None
+                        store.write_partial(part, {"url": url, "etag": response.headers.get("ETag"), "length": total})
+                    with open(part, "ab" if resumed else "wb") as f:
+                        for chunk in iter_body(response):
+                            f.write(chunk)
+                content_type = response.headers.get("Content-Type")
+            break
+        else:
+            print(f"  #{kitty_id}: could not resume or restart the download")
+            return False, None, False
+
+        expected = (store.read_partial(part) or {}).get("length")
+        size = part.stat().st_size
+        if expected is not None and size != expected:
+            # Keep the .part so the next run resumes it
+            print(f"  #{kitty_id}: incomplete download ({size} of {expected} bytes)")
+            return False, None, False
+
+        digest = hashlib.sha256()
+        with open(part, "rb") as f:
+            head = f.read(64)
+            digest.update(head)
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+
+        ext = detect_format(url, head, content_type)
+        store.commit(kitty_id, url, part, digest.hexdigest(), ext)
+        return True, ext, resumed
+
+    except HTTP_ERRORS as e:
+        print(f"  #{kitty_id}: Request Error: {e}")
+        return False, None, False
     except Exception as e:
-        print(f"Error: {e}")
-        return False, None
+        print(f"  #{kitty_id}: Error: {e}")
+        return False, None, False
 
 
 def find_existing(output_dir: Path, kitty_id: int) -> Path | None:
@@ -114,21 +321,32 @@ def main():
     parser.add_argument(
         "--skip-existing",
         action="store_true",
-        help="Skip download if file already exists (any format)"
+        help="Skip ids already in the manifest (same URL), or whose file already exists (any format)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Concurrent downloads (default: 1)"
     )
     parser.add_argument(
         "--delay",
         type=float,
         default=0.5,
-        help="Delay between downloads in seconds (default: 0.5)"
+        help="Minimum seconds between download starts per worker; the shared limit is workers/delay starts per second (default: 0.5, 0 = no pacing)"
     )
     parser.add_argument(
         "-v", "--verbose",
         action="store_true",
         help="Verbose output"
     )
+    add_http_args(parser)
 
     args = parser.parse_args()
+    workers = max(1, args.workers)
+    session = session_from_args(args, user_agent=USER_AGENT, min_pool=workers)
+    # Pace per worker so --workers N is N times faster; 429/Retry-After still slows everyone down
+    limiter = RateLimiter(workers / args.delay if args.delay > 0 else 0.0, burst=workers)
 
     try:
         kitties = load_kitties(args.json_file)
@@ -139,10 +357,11 @@ def main():
     print(f"Found {len(kitties)} kitties in {args.json_file}")
 
     output_dir = Path(args.output)
-    downloaded = 0
+    output_dir.mkdir(parents=True, exist_ok=True)
+    store = BlobStore(output_dir)
     skipped = 0
-    failed = 0
     no_url = 0
+    jobs: list[tuple[int, str]] = []
 
     for kitty in kitties:
         kitty_id = kitty.get("id")
@@ -157,27 +376,36 @@ def main():
             continue
 
         if args.skip_existing:
-            existing = find_existing(output_dir, kitty_id)
-            if existing:
+            known = store.known(kitty_id, image_url)
+            existing = None if known else find_existing(output_dir, kitty_id)
+            if known or existing:
                 if args.verbose:
-                    print(f"  #{kitty_id}: Skipping (exists: {existing.suffix})")
+                    print(f"  #{kitty_id}: Skipping (exists: .{known['ext'] if known else existing.suffix[1:]})")
                 skipped += 1
                 continue
 
-        print(f"  #{kitty_id}: Downloading...", end=" ", flush=True)
+        jobs.append((kitty_id, image_url))
 
-        success, ext = download_image(image_url, output_dir, kitty_id)
-        if success:
-            print(f"OK ({ext})")
-            downloaded += 1
-        else:
-            failed += 1
+    print(f"Downloading {len(jobs)} images with {workers} worker(s)...")
+    downloaded = 0
+    resumed = 0
+    failed = 0
+
+    def run(job: tuple[int, str]) -> tuple[int, bool, str | None, bool]:
+        kitty_id, image_url = job
+        return (kitty_id, *download_image(image_url, store, kitty_id, session=session, limiter=limiter))
 
-        if args.delay > 0:
-            time.sleep(args.delay)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for kitty_id, success, ext, was_resumed in pool.map(run, jobs):
+            if success:
+                print(f"  #{kitty_id}: OK ({ext}{', resumed' if was_resumed else ''})")
+                downloaded += 1
+                resumed += was_resumed
+            else:
+                failed += 1
 
     print()
-    print(f"Done: {downloaded} downloaded, {skipped} skipped, {failed} failed, {no_url} no URL")
+    print(f"Done: {downloaded} downloaded ({resumed} resumed), {skipped} skipped, {failed} failed, {no_url} no URL")
 
 
 if __name__ == "__main__":
@@ -18,10 +18,12 @@ Examples:
 """
 
 import argparse
-import json
-from typing import Dict, List, Set, Tuple, Optional, Any
+from typing import Dict, Iterable, Iterator, List, Set, Tuple, Optional, Any
 from collections import defaultdict
 
+from ck_parallel import add_jobs_arg, merge_dicts, merge_lists, run_sharded
+from ck_pedigree import Pedigree, load_dataset
+
 # Import trait data
 try:
     from ck_traits import (
@@ -38,21 +40,6 @@ except ImportError:
         return []
 
 
-def load_kitties(json_path: str) -> Tuple[Dict[int, Dict], List[int]]:
-    """Load kitties from JSON file, return (kitties_by_id, root_ids)."""
-    with open(json_path, 'r') as f:
-        data = json.load(f)
-
-    kitties = {}
-    for k in data.get('kitties', []):
-        kid = k.get('id')
-        if kid:
-            kitties[int(kid)] = k
-
-    root_ids = [int(r) for r in data.get('root_ids', [])]
-    return kitties, root_ids
-
-
 def get_kitty_traits(kitty: Dict) -> Dict[str, str]:
     """Extract trait values from a kitty."""
     traits = {}
@@ -116,8 +103,8 @@ def check_is_special_edition(kitty: Dict) -> bool:
     return raw.get('is_special_edition', False)
 
 
-def analyze_collection(kitties: Dict[int, Dict], verbose: bool = False) -> Dict[str, Any]:
-    """Analyze a collection for fancy cats and potential fancies."""
+def scan_kitties(items: Iterable[Tuple[int, Dict]]) -> Dict[str, Any]:
+    """Fancy/exclusive/special edition/recipe results for (id, kitty) pairs."""
     results = {
         'fancies': [],
         'exclusives': [],
@@ -126,7 +113,7 @@ def analyze_collection(kitties: Dict[int, Dict], verbose: bool = False) -> Dict[
         'recipe_matches': defaultdict(list),
     }
 
-    for kid, k in kitties.items():
+    for kid, k in items:
         # Check API-marked fancies
         is_fancy, fancy_type = check_is_fancy(k)
         if is_fancy:
@@ -170,17 +157,27 @@ def analyze_collection(kitties: Dict[int, Dict], verbose: bool = False) -> Dict[
     return results
 
 
-def check_potential_fancies(kitties: Dict[int, Dict]) -> List[Dict]:
-    """
-    Check for kitties that are close to matching a fancy recipe.
-    Returns kitties that match all but 1-2 traits of a recipe.
-    """
-    if not HAS_TRAIT_DATA:
-        return []
+def iter_records(ped: Pedigree, start: int, stop: int) -> Iterator[Tuple[int, Dict]]:
+    """(id, record) for slots start..stop; CKPD records are decoded one at a time."""
+    for i in range(start, stop):
+        yield ped.ids[i], ped.record(i)
+
+
+def collection_shard(start: int, stop: int, shared: Dict, ped: Pedigree) -> Dict[str, Any]:
+    """scan_kitties over slots start..stop (worker for --jobs)."""
+    return scan_kitties(iter_records(ped, start, stop))
+
 
+def analyze_collection(ped: Pedigree, verbose: bool = False, jobs: int = 1) -> Dict[str, Any]:
+    """Analyze a collection for fancy cats and potential fancies (sharded over --jobs processes)."""
+    return run_sharded(collection_shard, len(ped), jobs, merge_dicts, state=ped)
+
+
+def potential_shard(start: int, stop: int, shared: Dict, ped: Pedigree) -> List[Dict]:
+    """Near-fancy matches among slots start..stop, unsorted (worker for --jobs)."""
     potential = []
 
-    for kid, k in kitties.items():
+    for kid, k in iter_records(ped, start, stop):
         traits = get_kitty_traits(k)
         traits_lower = {key.lower(): val.lower() if val else None for key, val in traits.items()}
 
@@ -208,6 +205,19 @@ def check_potential_fancies(kitties: Dict[int, Dict]) -> List[Dict]:
                     'missing': missing,
                 })
 
+    return potential
+
+
+def check_potential_fancies(ped: Pedigree, jobs: int = 1) -> List[Dict]:
+    """
+    Check for kitties that are close to matching a fancy recipe.
+    Returns kitties that match all but 1-2 traits of a recipe.
+    """
+    if not HAS_TRAIT_DATA:
+        return []
+
+    potential = run_sharded(potential_shard, len(ped), jobs, merge_lists, state=ped)
+
     # Sort by closest to complete
     potential.sort(key=lambda x: (x['total'] - x['matches'], x['fancy']))
 
@@ -286,20 +296,22 @@ def main():
     parser.add_argument('json_file', help='JSON file with kitty data')
     parser.add_argument('--verbose', '-v', action='store_true', help='Show detailed output')
     parser.add_argument('--check-potential', action='store_true', help='Check for near-fancy matches')
+    add_jobs_arg(parser)
 
     args = parser.parse_args()
 
-    # Load data
-    kitties, root_ids = load_kitties(args.json_file)
-    print(f"Loaded {len(kitties)} kitties from {args.json_file}")
+    # Load data. Fancy flags and traits have no column, so records are kept, but they are
+    # read slot by slot (decoded on demand from a CKPD file) instead of copied into a dict
+    ped = load_dataset(args.json_file)
+    print(f"Loaded {len(ped)} kitties from {args.json_file}")
 
     # Analyze
-    results = analyze_collection(kitties, args.verbose)
+    results = analyze_collection(ped, args.verbose, args.jobs)
     print_report(results, args.verbose)
 
     # Check potential matches
     if args.check_potential:
-        potential = check_potential_fancies(kitties)
+        potential = check_potential_fancies(ped, args.jobs)
         print_potential_report(potential)
 
     return 0
@@ -15,41 +15,28 @@ import json
 import sys
 from collections import deque
 
+from ck_pedigree import load_dataset
 
-def build_adjacency(kitties_list, kitty_map):
-    """Build undirected adjacency map from parent relationships."""
-    adj = {}
-    for k in kitties_list:
-        kid = k['id']
-        if kid not in adj:
-            adj[kid] = set()
-        for parent_id in [k.get('matron_id'), k.get('sire_id')]:
-            if parent_id and parent_id in kitty_map:
-                if parent_id not in adj:
-                    adj[parent_id] = set()
-                adj[kid].add(parent_id)
-                adj[parent_id].add(kid)
-    return adj
-
-
-def find_connected(adj, roots, kitty_map):
-    """BFS from roots to find all connected kitty IDs."""
-    connected = set()
+
+def find_connected(ped, roots):
+    """BFS over parent/child edges (CSR child lists) from roots, return connected kitty IDs."""
+    seen = bytearray(len(ped))
     queue = deque()
 
     for r in roots:
-        if r in kitty_map:
-            connected.add(r)
-            queue.append(r)
+        i = ped.index_of(r)
+        if i >= 0 and not seen[i]:
+            seen[i] = 1
+            queue.append(i)
 
     while queue:
         curr = queue.popleft()
-        for neighbor in adj.get(curr, []):
-            if neighbor not in connected:
-                connected.add(neighbor)
+        for neighbor in ped.neighbors(curr):
+            if not seen[neighbor]:
+                seen[neighbor] = 1
                 queue.append(neighbor)
 
-    return connected
+    return {ped.ids[i] for i in range(len(ped)) if seen[i]}
 
 
 def main():
@@ -78,24 +65,21 @@ Examples:
     args = parser.parse_args()
 
     # Load input
-    with open(args.input) as f:
-        data = json.load(f)
-
-    kitties_list = data.get('kitties', [])
-    kitty_map = {k['id']: k for k in kitties_list}
+    ped = load_dataset(args.input)
+    data = ped.meta
+    kitties_list = list(ped.kitties())
 
     # Determine roots
-    roots = args.roots if args.roots else data.get('root_ids', [])
+    roots = args.roots if args.roots else ped.root_ids
     if not roots:
         print("Error: No roots specified and no root_ids in file", file=sys.stderr)
         sys.exit(1)
 
-    # Build adjacency and find connected
-    adj = build_adjacency(kitties_list, kitty_map)
-    connected_ids = find_connected(adj, roots, kitty_map)
+    # Find connected
+    connected_ids = find_connected(ped, roots)
 
     # Filter kitties
-    filtered_kitties = [k for k in kitties_list if k['id'] in connected_ids]
+    filtered_kitties = [k for k in kitties_list if int(k['id']) in connected_ids]
     disconnected_count = len(kitties_list) - len(filtered_kitties)
 
     if args.verbose:
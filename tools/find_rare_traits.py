@@ -10,6 +10,13 @@ Usage:
     python3 find_rare_traits.py --tier III --limit 20
     python3 find_rare_traits.py --diamonds --limit 10
 
+Reuse the shared response cache for kitty detail lookups:
+    python3 find_rare_traits.py --diamonds --limit 10 --cache-dir
+
+Search a local dataset (JSON/NDJSON/CKPD) through its allele index instead of the API:
+    python3 find_rare_traits.py --tier IIII --limit 20 --dataset ../dist/examples/tier_iiii/tier_iiii.json
+    python3 find_rare_traits.py --trait liger --dataset kitties.ckpd
+
 Save IDs for use with ck_fetch.py:
     python3 find_rare_traits.py --tier IIII --limit 10 --ids-file tier_iiii_ids.txt
     python3 ck_fetch.py --ids-file tier_iiii_ids.txt --parents 3 --out ../dist/examples/tier_iiii/tier_iiii.json
@@ -17,13 +24,32 @@ Save IDs for use with ck_fetch.py:
 
 import argparse
 import json
-import time
-import requests
 from typing import List, Dict, Optional
 
+from ck_cache import KittyCache, OfflineCacheMiss, add_cache_args, cache_from_args, cached_fetch
+from ck_http import (
+    RateLimiter,
+    add_http_args,
+    add_rate_limit_args,
+    get_with_retry,
+    make_session,
+    session_from_args,
+)
+
 API_BASE = "https://api.cryptokitties.co/v3"
 USER_AGENT = "ck-rare-trait-finder/1.0"
 
+DEFAULT_MAX_RPS = 4.0
+
+# Shared on-disk response cache (set from --cache-dir/--offline in main)
+CACHE: Optional[KittyCache] = None
+
+# Adaptive token bucket pacing every API request (rate set from --max-rps in main)
+LIMITER = RateLimiter(DEFAULT_MAX_RPS)
+
+# Pooled keep-alive client reused by every request (rebuilt from --pool-size/--http2 in main)
+SESSION = make_session(user_agent=USER_AGENT)
+
 # Tier IIII traits (Kai 'w' = index 30) - rarest
 TIER_IIII_TRAITS = {
     'body': 'liger',
@@ -78,10 +104,12 @@ def search_by_cattribute(trait_value: str, limit: int = 10, offset: int = 0) ->
         'orderBy': 'id',
         'orderDirection': 'asc',
     }
-    headers = {'User-Agent': USER_AGENT}
+    if CACHE is not None and CACHE.offline:
+        print(f"  Skipping search for '{trait_value}' (offline)")
+        return []
 
     try:
-        resp = requests.get(url, params=params, headers=headers, timeout=30)
+        resp = get_with_retry(SESSION.get, url, LIMITER, params=params, timeout=30)
         resp.raise_for_status()
         data = resp.json()
         return data.get('kitties', [])
@@ -92,11 +120,18 @@ def search_by_cattribute(trait_value: str, limit: int = 10, offset: int = 0) ->
 
 def get_kitty_details(kitty_id: int) -> Optional[Dict]:
     """Get full details for a kitty including enhanced_cattributes."""
+    try:
+        return cached_fetch(CACHE, kitty_id, _get_kitty_details_uncached)
+    except OfflineCacheMiss:
+        print(f"  Kitty {kitty_id} not in cache (offline)")
+        return None
+
+
+def _get_kitty_details_uncached(kitty_id: int) -> Optional[Dict]:
     url = f"{API_BASE}/kitties/{kitty_id}"
-    headers = {'User-Agent': USER_AGENT}
 
     try:
-        resp = requests.get(url, headers=headers, timeout=30)
+        resp = get_with_retry(SESSION.get, url, LIMITER, timeout=30)
         resp.raise_for_status()
         return resp.json()
     except Exception as e:
@@ -141,11 +176,8 @@ def find_diamonds(limit: int = 10) -> List[Dict]:
                     })
                     print(f"    Found diamond: #{kid} - {attr.get('description')}")
 
-            time.sleep(0.2)
-
         if len(results) >= limit:
             break
-        time.sleep(0.3)
 
     return results[:limit]
 
@@ -190,8 +222,6 @@ def find_by_tier(tier: str, limit: int = 10) -> List[Dict]:
                     })
                     print(f"    #{kid} {k.get('name') or 'unnamed'} (Gen {k.get('generation')})")
 
-            time.sleep(0.3)
-
         if len(results) >= limit:
             break
 
@@ -216,6 +246,90 @@ def find_by_trait(trait_value: str, limit: int = 10) -> List[Dict]:
     return results
 
 
+def load_local_index(path: str):
+    """(Pedigree, allele array, AlleleIndex) for a local dataset."""
+    from ck_allele_index import AlleleIndex
+    from ck_genome import decode_alleles
+    from ck_pedigree import load_dataset
+
+    ped = load_dataset(path)
+    alleles = decode_alleles(ped)
+    return ped, alleles, AlleleIndex.from_pedigree(ped, alleles)
+
+
+def find_by_trait_local(ped, index, trait_value: str, limit: int = 10) -> List[Dict]:
+    """Find kitties expressing a trait value in a local dataset."""
+    print(f"Searching for trait: {trait_value}...")
+    try:
+        hits = index.trait(trait_value)
+    except ValueError as e:
+        print(f"  {e}")
+        return []
+
+    results = []
+    for slot in hits[:limit].tolist():
+        k = ped.record(slot)
+        results.append({
+            'id': ped.ids[slot],
+            'name': k.get('name'),
+            'generation': k.get('generation'),
+            'trait': trait_value,
+        })
+        print(f"  #{ped.ids[slot]} {k.get('name') or 'unnamed'} (Gen {k.get('generation')})")
+
+    return results
+
+
+def find_by_tier_local(ped, alleles, index, tier: str, limit: int = 10) -> List[Dict]:
+    """Find kitties expressing a trait of a specific tier in a local dataset."""
+    from ck_traits import KAI, TRAIT_NAMES, get_trait_name
+
+    results = []
+    seen = set()
+
+    for t, category in enumerate(TRAIT_NAMES):
+        for slot in index.tier(tier, traits=[t]).tolist():
+            if len(results) >= limit:
+                return results
+            if slot in seen:
+                continue
+            seen.add(slot)
+            k = ped.record(slot)
+            results.append({
+                'id': ped.ids[slot],
+                'name': k.get('name'),
+                'generation': k.get('generation'),
+                'category': category,
+                'trait': get_trait_name(t, KAI[alleles[slot, t, 0]]),
+                'tier': tier,
+            })
+            print(f"    #{ped.ids[slot]} {k.get('name') or 'unnamed'} (Gen {k.get('generation')})")
+
+    return results
+
+
+def find_diamonds_local(ped, limit: int = 10) -> List[Dict]:
+    """Find kitties of a local dataset recorded as first discoverer (position 1) of a cattribute."""
+    results = []
+    for k in ped.kitties():
+        kid = k.get('id')
+        for attr in k.get('enhanced_cattributes') or []:
+            if attr.get('kittyId') == kid and attr.get('position') == 1:
+                results.append({
+                    'id': kid,
+                    'name': k.get('name'),
+                    'generation': k.get('generation'),
+                    'trait_type': attr.get('type'),
+                    'trait_value': attr.get('description'),
+                    'gem': 'diamond',
+                })
+                print(f"    Found diamond: #{kid} - {attr.get('description')}")
+        if len(results) >= limit:
+            break
+
+    return results[:limit]
+
+
 def main():
     parser = argparse.ArgumentParser(description="Find CryptoKitties with rare traits")
     parser.add_argument('--trait', type=str, help='Search for specific trait value')
@@ -225,22 +339,45 @@ def main():
     parser.add_argument('--output', '-o', type=str, help='Save results to JSON file')
     parser.add_argument('--ids-file', type=str, help='Save IDs to file (for use with ck_fetch.py --ids-file)')
     parser.add_argument('--ids-only', action='store_true', help='Output only comma-separated IDs')
+    parser.add_argument('--dataset', metavar='PATH',
+                        help='Search this local JSON/NDJSON/CKPD dataset (allele index) instead of the API')
+    add_rate_limit_args(parser, DEFAULT_MAX_RPS)
+    add_cache_args(parser)
+    add_http_args(parser)
 
     args = parser.parse_args()
 
+    global CACHE, SESSION
+    CACHE = cache_from_args(args)
+    SESSION = session_from_args(args, user_agent=USER_AGENT)
+    LIMITER.set_rate(max(0.0, args.max_rps))
+
     results = []
+    if not (args.trait or args.tier or args.diamonds):
+        parser.print_help()
+        return 1
+
+    if args.dataset:
+        ped, alleles, index = load_local_index(args.dataset)
+        print(f"Indexed {len(index)} kitties from {args.dataset}")
 
     if args.trait:
-        results = find_by_trait(args.trait, args.limit)
+        if args.dataset:
+            results = find_by_trait_local(ped, index, args.trait, args.limit)
+        else:
+            results = find_by_trait(args.trait, args.limit)
     elif args.tier:
         print(f"Finding Tier {args.tier} kitties...")
-        results = find_by_tier(args.tier, args.limit)
+        if args.dataset:
+            results = find_by_tier_local(ped, alleles, index, args.tier, args.limit)
+        else:
+            results = find_by_tier(args.tier, args.limit)
     elif args.diamonds:
         print("Finding diamond gem kitties (first discoverers)...")
-        results = find_diamonds(args.limit)
-    else:
-        parser.print_help()
-        return 1
+        if args.dataset:
+            results = find_diamonds_local(ped, args.limit)
+        else:
+            results = find_diamonds(args.limit)
 
     print(f"\nFound {len(results)} kitties")
 
@@ -260,6 +397,9 @@ def main():
         print(f"Saved {len(ids)} IDs to {args.ids_file}")
         print(f"  Use with: python3 ck_fetch.py --ids-file {args.ids_file} --parents 3 --out output.json")
 
+    if CACHE is not None:
+        CACHE.close()
+
     return 0
 
 
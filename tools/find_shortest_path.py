@@ -19,6 +19,12 @@ Usage:
   # Export the connected graph
   python3 find_shortest_path.py --from-ids 1461,896775 --to-json holiday_fancies.json --out connected.json
 
+  # Search a local index built from existing datasets and the response cache;
+  # only kitties missing from it are fetched from the API
+  python3 find_shortest_path.py --from-ids 1461 --to-ids 896775 \
+      --index-json ../dist/examples/*/*.json --index-cache --cache-dir --save-index pedigree.json.gz
+  python3 find_shortest_path.py --from-ids 1461 --to-ids 896775 --index pedigree.json.gz --no-api
+
 Output:
   - Prints the shortest path(s) found
   - Optionally exports a JSON with all kitties needed to connect the groups
@@ -27,6 +33,7 @@ Output:
 from __future__ import annotations
 
 import argparse
+import gzip
 import json
 import logging
 import sys
@@ -34,50 +41,76 @@ import time
 from collections import deque
 from typing import Any, Dict, List, Optional, Set, Tuple
 
-import requests
+from ck_cache import KittyCache, OfflineCacheMiss, add_cache_args, cache_from_args, cached_fetch
+from ck_http import (
+    HTTP_ERRORS,
+    RateLimiter,
+    add_http_args,
+    add_rate_limit_args,
+    get_with_retry,
+    make_session,
+    session_from_args,
+)
+from ck_pedigree import Pedigree, load_dataset
 
 API_BASE = "https://api.cryptokitties.co/v3"
 KITTIES_ENDPOINT = f"{API_BASE}/kitties"
+MAX_CHILD_PAGES = 50  # safety cap on children paging (50 x 100 per kitty)
 
 # Retry configuration
 MAX_RETRIES = 8
 BACKOFF_BASE_S = 0.75
 REQUEST_TIMEOUT_S = 30
+DEFAULT_MAX_RPS = 4.0
 
 logging.basicConfig(format="%(levelname)s: %(message)s")
 log = logging.getLogger(__name__)
 
-
-def request_with_retry(url: str, timeout: int = REQUEST_TIMEOUT_S) -> Optional[requests.Response]:
-    """Make a GET request with exponential backoff retry."""
-    last_err = None
-    for attempt in range(MAX_RETRIES):
-        try:
-            log.debug(f"GET {url}")
-            resp = requests.get(url, timeout=timeout)
-            if resp.status_code == 429:
-                last_err = RuntimeError(f"429 rate limited: {url}")
-                sleep_time = BACKOFF_BASE_S * (2 ** attempt)
-                log.warning(f"429 rate limited, sleeping {sleep_time:.2f}s")
-                time.sleep(sleep_time)
-                continue
-            if resp.status_code == 404:
-                # Don't retry 404s - they're permanent
-                log.debug(f"404 Not Found: {url}")
-                return None
-            resp.raise_for_status()
-            return resp
-        except requests.exceptions.RequestException as e:
-            last_err = e
-            sleep_time = BACKOFF_BASE_S * (2 ** attempt)
-            log.warning(f"Request failed ({e}), sleeping {sleep_time:.2f}s")
-            time.sleep(sleep_time)
-    log.error(f"GET failed after {MAX_RETRIES} retries: {url} | Last error: {last_err}")
-    return None
+# Shared on-disk response cache (set from --cache-dir/--offline in main)
+CACHE: Optional[KittyCache] = None
+
+# One adaptive token bucket paces every API request (rate set from --max-rps in main)
+LIMITER = RateLimiter(DEFAULT_MAX_RPS)
+
+# Pooled keep-alive client reused by every request (rebuilt from --pool-size/--http2 in main)
+SESSION = make_session()
+
+
+def request_with_retry(url: str, timeout: int = REQUEST_TIMEOUT_S) -> Optional[Any]:
+    """Make a GET request paced by the shared rate limiter, retrying failures."""
+    if CACHE is not None and CACHE.offline:
+        log.debug(f"offline, skipping GET {url}")
+        return None
+    try:
+        resp = get_with_retry(
+            SESSION.get, url, LIMITER,
+            max_retries=MAX_RETRIES, backoff_base_s=BACKOFF_BASE_S, timeout=timeout
+        )
+    except RuntimeError as e:
+        log.error(str(e))
+        return None
+    if resp.status_code == 404:
+        # Don't retry 404s - they're permanent
+        log.debug(f"404 Not Found: {url}")
+        return None
+    try:
+        resp.raise_for_status()
+    except HTTP_ERRORS as e:
+        log.error(f"GET failed: {url} | {e}")
+        return None
+    return resp
 
 
 def fetch_kitty(kitty_id: int) -> Optional[Dict[str, Any]]:
-    """Fetch a single kitty from the API."""
+    """Fetch a single kitty from the response cache or the API."""
+    try:
+        return cached_fetch(CACHE, kitty_id, _fetch_kitty_uncached)
+    except OfflineCacheMiss as e:
+        log.debug(str(e))
+        return None
+
+
+def _fetch_kitty_uncached(kitty_id: int) -> Optional[Dict[str, Any]]:
     resp = request_with_retry(f"{KITTIES_ENDPOINT}/{kitty_id}")
     if resp is not None:
         return resp.json()
@@ -89,7 +122,8 @@ def fetch_kitties_batch(kitty_ids: List[int]) -> Dict[int, Dict[str, Any]]:
     if not kitty_ids:
         return {}
 
-    results = {}
+    results = CACHE.get_many(kitty_ids) if CACHE is not None else {}
+    kitty_ids = [kid for kid in kitty_ids if kid not in results]
     # API supports up to 100 IDs per request
     batch_size = 100
     for i in range(0, len(kitty_ids), batch_size):
@@ -108,27 +142,32 @@ def fetch_kitties_batch(kitty_ids: List[int]) -> Dict[int, Dict[str, Any]]:
                 if k:
                     results[k["id"]] = k
 
-        if i + batch_size < len(kitty_ids):
-            time.sleep(0.5)  # Rate limiting between batches
-
     return results
 
 
 def fetch_children(kitty_id: int, limit: int = 100) -> List[Dict[str, Any]]:
-    """Fetch children of a kitty (where this kitty is matron or sire)."""
-    children = []
+    """
+    Fetch all children of a kitty (where this kitty is matron or sire).
 
-    # Search for kitties where this is the matron
-    resp = request_with_retry(f"{KITTIES_ENDPOINT}?matron_id={kitty_id}&limit={limit}")
-    if resp is not None:
-        data = resp.json()
-        children.extend(data.get("kitties", []))
+    Pages the same way as ck_fetch (parent=, page=). Stops on a short page, on a
+    page that adds no new ids (a server ignoring page= would otherwise repeat the
+    first page forever), or after MAX_CHILD_PAGES pages.
+    """
+    children: List[Dict[str, Any]] = []
+    seen: Set[int] = set()
 
-    # Search for kitties where this is the sire
-    resp = request_with_retry(f"{KITTIES_ENDPOINT}?sire_id={kitty_id}&limit={limit}")
-    if resp is not None:
-        data = resp.json()
-        children.extend(data.get("kitties", []))
+    for page in range(1, MAX_CHILD_PAGES + 1):
+        resp = request_with_retry(f"{KITTIES_ENDPOINT}?parent={kitty_id}&page={page}&limit={limit}")
+        if resp is None:
+            break
+        items = resp.json().get("kitties", [])
+        new = [k for k in items if k.get("id") is not None and k["id"] not in seen]
+        seen.update(k["id"] for k in new)
+        children.extend(new)
+        if not new or len(items) < limit:
+            break
+    else:
+        log.warning(f"Kitty {kitty_id}: stopped after {MAX_CHILD_PAGES} pages of children")
 
     return children
 
@@ -146,35 +185,136 @@ def get_parents(kitty: Dict[str, Any]) -> List[int]:
 
 
 def load_kitties_from_json(path: str) -> Dict[int, Dict[str, Any]]:
-    """Load kitties from a JSON file."""
-    with open(path, "r") as f:
-        data = json.load(f)
+    """Load kitties from a JSON/NDJSON dataset (see ck_pedigree.load_dataset)."""
+    return load_dataset(path).as_dict()
+
+
+class PedigreeIndex:
+    """
+    Local adjacency index (parents + children) for offline path search.
 
-    kitties = {}
-    # Handle different JSON formats
-    if "kitties" in data:
-        for k in data["kitties"]:
-            kitties[k["id"]] = k
-    elif "data" in data:
-        for k in data["data"]:
-            kitties[k["id"]] = k
-    elif isinstance(data, list):
-        for k in data:
-            kitties[k["id"]] = k
+    Built from aggregation JSONs and/or the response cache, and saved/loaded as
+    gzipped JSON. A kitty is "in" the index once its parents are known; its
+    children are every indexed kitty naming it as a parent, plus any complete
+    children lists stored by ck_fetch in the cache.
+    """
 
-    return kitties
+    VERSION = 1
+
+    def __init__(self) -> None:
+        self.parents: Dict[int, Tuple[int, int]] = {}  # id -> (matron, sire), 0 = none
+        self.children: Dict[int, Set[int]] = {}
+
+    def __contains__(self, kitty_id: int) -> bool:
+        return kitty_id in self.parents
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def add_kitty(self, kitty: Dict[str, Any]) -> None:
+        kid = int(kitty["id"])
+        matron = int(kitty.get("matron_id") or (kitty.get("matron") or {}).get("id") or 0)
+        sire = int(kitty.get("sire_id") or (kitty.get("sire") or {}).get("id") or 0)
+        self.parents[kid] = (matron, sire)
+        for pid in (matron, sire):
+            if pid:
+                self.children.setdefault(pid, set()).add(kid)
+
+    def add_children(self, parent_id: int, child_ids: List[int]) -> None:
+        self.children.setdefault(int(parent_id), set()).update(int(c) for c in child_ids)
+
+    def add_json(self, path: str) -> int:
+        return self.add_pedigree(load_dataset(path, keep_records=False))
+
+    def add_pedigree(self, ped: Pedigree) -> int:
+        for i in range(len(ped)):
+            kid, matron, sire = ped.ids[i], ped.matron_id[i], ped.sire_id[i]
+            self.parents[kid] = (matron, sire)
+            for pid in (matron, sire):
+                if pid:
+                    self.children.setdefault(pid, set()).add(kid)
+        return len(ped)
+
+    def add_cache(self, cache: KittyCache) -> int:
+        count = 0
+        for _kid, payload in cache.iter_kitties():
+            if payload.get("id") is not None:
+                self.add_kitty(payload)
+                count += 1
+        for parent_id, child_ids in cache.iter_children():
+            self.add_children(parent_id, child_ids)
+        return count
+
+    def stub(self, kitty_id: int) -> Dict[str, Any]:
+        """Minimal record (id and parent ids) for an indexed kitty with no full record at hand."""
+        matron, sire = self.parents[kitty_id]
+        return {"id": kitty_id, "matron_id": matron or None, "sire_id": sire or None}
+
+    def neighbors(self, kitty_id: int) -> Set[int]:
+        matron, sire = self.parents[kitty_id]
+        out = set(self.children.get(kitty_id, ()))
+        out.update(p for p in (matron, sire) if p)
+        return out
+
+    def save(self, path: str) -> None:
+        data = {
+            "version": self.VERSION,
+            "parents": [[kid, m, s] for kid, (m, s) in self.parents.items()],
+            "children": {str(pid): sorted(cids) for pid, cids in self.children.items()},
+        }
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "PedigreeIndex":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != cls.VERSION:
+            raise ValueError(f"unsupported index version in {path}: {data.get('version')}")
+        index = cls()
+        index.parents = {kid: (m, s) for kid, m, s in data["parents"]}
+        index.children = {int(pid): set(cids) for pid, cids in data["children"].items()}
+        return index
+
+
+def local_records(
+    kitty_ids: List[int],
+    dataset_paths: List[str],
+    cache: Optional[KittyCache] = None,
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Records for kitty_ids from local data only: the given datasets (the index
+    keeps no records, so they are reloaded), then the response cache.
+    """
+    found: Dict[int, Dict[str, Any]] = {}
+    for path in dataset_paths:
+        wanted = [kid for kid in kitty_ids if kid not in found]
+        if not wanted:
+            break
+        ped = load_dataset(path)
+        for kid in wanted:
+            rec = ped.get(kid)
+            if rec is not None:
+                found[kid] = rec
+    if cache is not None:
+        found.update(cache.get_many((kid for kid in kitty_ids if kid not in found), accept_search=True))
+    return found
 
 
 def find_shortest_paths(
     from_ids: Set[int],
     to_ids: Set[int],
     max_depth: int = 50,
-    verbose: bool = False
+    verbose: bool = False,
+    index: Optional[PedigreeIndex] = None,
+    use_api: bool = True,
 ) -> Tuple[List[List[int]], Dict[int, Dict[str, Any]]]:
     """
     Find shortest path(s) between two groups of kitties using bidirectional BFS.
 
-    Expands both parents AND children at each step.
+    Expands both parents AND children at each step. Kitties in the local index
+    are expanded from it without any request; only kitties missing from it are
+    fetched from the API (unless use_api is False, which makes them dead ends).
 
     Returns:
         - List of paths (each path is a list of kitty IDs)
@@ -189,6 +329,38 @@ def find_shortest_paths(
 
     # neighbors[id] = set of connected kitty IDs (parents + children)
     neighbors: Dict[int, Set[int]] = {}
+    api_expansions = 0
+
+    def expand(kid: int) -> bool:
+        """Fill neighbors[kid]; False if the kitty is unknown."""
+        nonlocal api_expansions
+        if kid in neighbors:
+            return True
+        if index is not None and kid in index:
+            neighbors[kid] = index.neighbors(kid)
+            return True
+        if not use_api:
+            return False
+
+        # Fetch this kitty if we don't have it
+        if kid not in all_kitties:
+            fetched = fetch_kitty(kid)
+            if fetched:
+                all_kitties[kid] = fetched
+        kitty = all_kitties.get(kid)
+        if not kitty:
+            return False
+
+        api_expansions += 1
+        parents = get_parents(kitty)
+        neighbors[kid] = set(parents)
+        children = fetch_children(kid)
+        for child in children:
+            all_kitties[child["id"]] = child
+            neighbors[kid].add(child["id"])
+        if children:
+            log.info(f"  Kitty {kid}: {len(parents)} parents, {len(children)} children")
+        return True
 
     # Track which side discovered each kitty and at what depth
     forward_visited: Dict[int, int] = {kid: 0 for kid in from_ids}
@@ -219,32 +391,9 @@ def find_shortest_paths(
                 log.info(f"Forward depth {current_depth}: expanding {len(frontier_ids)} kitties")
 
             for kid in frontier_ids:
-                # Fetch this kitty if we don't have it
-                if kid not in all_kitties:
-                    fetched = fetch_kitty(kid)
-                    if fetched:
-                        all_kitties[kid] = fetched
-
-                kitty = all_kitties.get(kid)
-                if not kitty:
-                    continue
-
                 # Get neighbors (parents + children)
-                if kid not in neighbors:
-                    neighbors[kid] = set()
-
-                    # Add parents
-                    parents = get_parents(kitty)
-                    neighbors[kid].update(parents)
-
-                    # Add children
-                    children = fetch_children(kid, limit=50)
-                    for child in children:
-                        all_kitties[child["id"]] = child
-                        neighbors[kid].add(child["id"])
-
-                    if children:
-                        log.info(f"  Kitty {kid}: {len(parents)} parents, {len(children)} children")
+                if not expand(kid):
+                    continue
 
                 # Check for meeting points and queue unvisited neighbors
                 for nid in neighbors[kid]:
@@ -271,29 +420,9 @@ def find_shortest_paths(
                 log.info(f"Backward depth {current_depth}: expanding {len(frontier_ids)} kitties")
 
             for kid in frontier_ids:
-                if kid not in all_kitties:
-                    fetched = fetch_kitty(kid)
-                    if fetched:
-                        all_kitties[kid] = fetched
-
-                kitty = all_kitties.get(kid)
-                if not kitty:
+                if not expand(kid):
                     continue
 
-                if kid not in neighbors:
-                    neighbors[kid] = set()
-
-                    parents = get_parents(kitty)
-                    neighbors[kid].update(parents)
-
-                    children = fetch_children(kid, limit=50)
-                    for child in children:
-                        all_kitties[child["id"]] = child
-                        neighbors[kid].add(child["id"])
-
-                    if children:
-                        log.info(f"  Kitty {kid}: {len(parents)} parents, {len(children)} children")
-
                 for nid in neighbors[kid]:
                     if nid in forward_visited:
                         total = backward_visited[kid] + 1 + forward_visited[nid]
@@ -311,6 +440,9 @@ def find_shortest_paths(
         if meeting_points and current_depth * 2 > best_total_depth + 2:
             break
 
+    if index is not None:
+        log.info(f"Expanded {len(neighbors)} kitties, {api_expansions} via the API")
+
     if not meeting_points:
         log.warning(f"No connection found within {max_depth} generations")
         return [], all_kitties
@@ -361,8 +493,37 @@ def main():
     parser.add_argument("--out", help="Output JSON file with connected graph")
     parser.add_argument("-v", "--verbose", action="store_true", help="Verbose output")
 
+    idx = parser.add_argument_group("local index")
+    idx.add_argument("--index", help="Load a saved adjacency index (.json.gz from --save-index)")
+    idx.add_argument(
+        "--index-json",
+        nargs="+",
+        default=[],
+        metavar="FILE",
+        help="Add the kitties of these aggregation JSONs to the index",
+    )
+    idx.add_argument(
+        "--index-cache",
+        action="store_true",
+        help="Add every kitty and children list in the response cache to the index (needs --cache-dir)",
+    )
+    idx.add_argument("--save-index", metavar="PATH", help="Save the built index for later --index runs")
+    idx.add_argument(
+        "--no-api",
+        action="store_true",
+        help="Search the index only; kitties missing from it are dead ends instead of API fetches",
+    )
+    add_rate_limit_args(parser, DEFAULT_MAX_RPS)
+    add_cache_args(parser)
+    add_http_args(parser)
+
     args = parser.parse_args()
 
+    global CACHE, SESSION
+    CACHE = cache_from_args(args)
+    SESSION = session_from_args(args)
+    LIMITER.set_rate(max(0.0, args.max_rps))
+
     if args.verbose:
         log.setLevel(logging.INFO)
     else:
@@ -396,16 +557,38 @@ def main():
         print("Error: Must specify --to-ids or --to-json", file=sys.stderr)
         sys.exit(1)
 
+    index: Optional[PedigreeIndex] = None
+    if args.index or args.index_json or args.index_cache:
+        t0 = time.time()
+        index = PedigreeIndex.load(args.index) if args.index else PedigreeIndex()
+        for path in args.index_json:
+            log.info(f"Indexed {index.add_json(path)} kitties from {path}")
+        if args.index_cache:
+            if CACHE is None:
+                print("Error: --index-cache needs --cache-dir", file=sys.stderr)
+                sys.exit(1)
+            log.info(f"Indexed {index.add_cache(CACHE)} kitties from {CACHE.path}")
+        for kitty in list(from_kitties.values()) + list(to_kitties.values()):
+            index.add_kitty(kitty)
+        print(f"Index: {len(index)} kitties ({time.time() - t0:.2f}s)")
+        if args.save_index:
+            index.save(args.save_index)
+            print(f"Saved index: {args.save_index}")
+
     print(f"Finding shortest path between {len(from_ids)} and {len(to_ids)} kitties...")
     print(f"From: {sorted(from_ids)[:10]}{'...' if len(from_ids) > 10 else ''}")
     print(f"To: {sorted(to_ids)[:10]}{'...' if len(to_ids) > 10 else ''}")
     print()
 
+    t0 = time.time()
     paths, fetched_kitties = find_shortest_paths(
         from_ids, to_ids,
         max_depth=args.max_depth,
-        verbose=args.verbose
+        verbose=args.verbose,
+        index=index,
+        use_api=not args.no_api,
     )
+    log.info(f"Search took {time.time() - t0:.3f}s")
 
     if not paths:
         print("No connection found!")
@@ -430,11 +613,24 @@ def main():
         for path in paths:
             path_ids.update(path)
 
-        missing = [kid for kid in path_ids if kid not in all_kitties]
+        # Path kitties found through the index have no record yet: take them from
+        # local data first, and only go to the API for the rest (never with --no-api)
+        missing = sorted(kid for kid in path_ids if kid not in all_kitties)
         if missing:
+            all_kitties.update(local_records(missing, args.index_json, CACHE))
+            missing = [kid for kid in missing if kid not in all_kitties]
+        if missing and not args.no_api:
             log.info(f"Fetching {len(missing)} missing path kitties")
             fetched = fetch_kitties_batch(missing)
             all_kitties.update(fetched)
+            missing = [kid for kid in missing if kid not in all_kitties]
+        if missing:
+            stubs = [kid for kid in missing if index is not None and kid in index]
+            for kid in stubs:
+                all_kitties[kid] = index.stub(kid)
+            print(f"Warning: no record for {len(missing)} path kitties "
+                  f"({', '.join(str(k) for k in missing[:10])}{'...' if len(missing) > 10 else ''}); "
+                  f"{len(stubs)} exported with parent ids only", file=sys.stderr)
 
         # Build output
         output = {
@@ -450,6 +646,9 @@ def main():
 
         print(f"\nExported {len(all_kitties)} kitties to {args.out}")
 
+    if CACHE is not None:
+        CACHE.close()
+
 
 if __name__ == "__main__":
     main()
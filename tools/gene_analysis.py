@@ -22,80 +22,30 @@ Examples:
 """
 
 import argparse
-import json
+import os
 from collections import defaultdict, Counter
+from dataclasses import dataclass
 from typing import Dict, List, Set, Tuple, Optional, Any
 
-# Import trait data (mewtation tiers, trait names, etc.)
-try:
-    from ck_traits import (
-        get_mewtation_tier, get_tier_rank, get_trait_name,
-        TRAIT_CATEGORIES, TRAIT_NAMES, KAI
-    )
-    HAS_TRAIT_DATA = True
-except ImportError:
-    HAS_TRAIT_DATA = False
-    # Fallback definitions
-    TRAIT_NAMES = [
-        'body', 'pattern', 'eyecolor', 'eyeshape',
-        'basecolor', 'highlight', 'accent', 'wild',
-        'mouth', 'environment', 'secret', 'purrstige'
-    ]
-    KAI = '123456789abcdefghijkmnopqrstuvwx'
-
-    def get_mewtation_tier(kai_char):
-        idx = KAI.index(kai_char) if kai_char in KAI else -1
-        if idx <= 15: return 'base'
-        elif idx <= 23: return 'I'
-        elif idx <= 27: return 'II'
-        elif idx <= 29: return 'III'
-        elif idx == 30: return 'IIII'
-        return None
-
-    def get_tier_rank(tier):
-        return {'base': 0, 'I': 1, 'II': 2, 'III': 3, 'IIII': 4}.get(tier, -1)
+import numpy as np
 
-    def get_trait_name(category_idx, kai_char):
-        return None  # No trait names without ck_traits.py
+from ck_allele_index import AlleleIndex
+from ck_genome import (
+    FirstMutationTable, allele_masks, column, decode_genome, decode_limbs, genes_mask, inheritance_triples,
+    kitty_keys, mask_cells, mask_values, popcount
+)
+from ck_parallel import add_jobs_arg, run_sharded
+from ck_pedigree import GENE_LIMBS, Pedigree, load_dataset, load_records
+from ck_traits import KAI, TRAIT_NAMES, get_mewtation_tier, get_tier_rank, get_trait_name
 
 # CryptoKitties gene structure:
 # 256 bits = 48 "kai" genes (each 5 bits = values 0-31)
 # Grouped into 12 trait categories, 4 genes each (dominant + 3 recessive)
 
 
-def genes_to_kai(genes_int: int | str) -> str:
-    """Convert genes integer to kai string (48 chars)."""
-    kai = ''
-    n = int(genes_int)
-    for _ in range(48):
-        kai = KAI[n % 32] + kai
-        n //= 32
-    return kai
-
-
-def kai_to_int(kai: str) -> int:
-    """Convert kai string back to genes integer."""
-    n = 0
-    for char in kai:
-        n = n * 32 + KAI.index(char)
-    return n
-
-
-def kai_to_trait_blocks(kai: str) -> List[str]:
-    """Return list of 12 trait blocks, each with 4 alleles (d, r1, r2, r3)."""
-    # Traits are stored LSB-first in the gene, so reverse the kai string
-    kai_rev = kai[::-1]
-    blocks = []
-    for i in range(12):
-        start = i * 4
-        blocks.append(kai_rev[start:start + 4])
-    return blocks
-
-
 def decode_traits(genes_int: int | str) -> Dict[str, Dict[str, str]]:
     """Decode genes to a dictionary of trait blocks with named alleles."""
-    kai = genes_to_kai(genes_int)
-    blocks = kai_to_trait_blocks(kai)
+    blocks = decode_genome(genes_int).blocks
     traits = {}
     for i, name in enumerate(TRAIT_NAMES):
         block = blocks[i]
@@ -108,26 +58,11 @@ def decode_traits(genes_int: int | str) -> Dict[str, Dict[str, str]]:
     return traits
 
 
-def get_all_alleles(genes_int: int | str, trait_idx: int) -> Set[str]:
-    """Get all 4 alleles for a specific trait."""
-    kai = genes_to_kai(genes_int)
-    blocks = kai_to_trait_blocks(kai)
-    return set(blocks[trait_idx])
-
-
-def load_kitties(json_path: str) -> Tuple[Dict[int, Dict], List[int]]:
-    """Load kitties from JSON file, return (kitties_by_id, root_ids)."""
-    with open(json_path, 'r') as f:
-        data = json.load(f)
-
-    kitties = {}
-    for k in data.get('kitties', []):
-        kid = k.get('id')
-        if kid:
-            kitties[int(kid)] = k
-
-    root_ids = [int(r) for r in data.get('root_ids', [])]
-    return kitties, root_ids
+def allele_counter(values: np.ndarray) -> Counter:
+    """Counter of kai characters for an array of allele values, keyed in order of first appearance."""
+    counts = np.bincount(values, minlength=len(KAI))
+    uniq, first = np.unique(values, return_index=True)
+    return Counter({KAI[v]: int(counts[v]) for v in uniq[np.argsort(first)]})
 
 
 def print_kitty_genome(kitty: Dict, kitties: Dict[int, Dict] = None):
@@ -149,14 +84,11 @@ def print_kitty_genome(kitty: Dict, kitties: Dict[int, Dict] = None):
         print("No genes data available")
         return
 
-    kai = genes_to_kai(genes)
+    genome = decode_genome(genes)
     print(f"Genes (decimal): {genes}")
-    print(f"Genes (kai):     {kai}")
+    print(f"Genes (kai):     {genome.kai}")
     print()
 
-    traits = decode_traits(genes)
-    blocks = kai_to_trait_blocks(kai)
-
     # Print with trait names and mewtation tiers
     print("Decoded traits (d=dominant, r1/r2/r3=recessive):")
     print("-" * 80)
@@ -165,10 +97,9 @@ def print_kitty_genome(kitty: Dict, kitties: Dict[int, Dict] = None):
 
     mewtation_count = 0
     for i, trait_name in enumerate(TRAIT_NAMES):
-        alleles = traits[trait_name]
-        d_char = alleles['d']
-        tier = get_mewtation_tier(d_char)
-        trait = get_trait_name(i, d_char) if HAS_TRAIT_DATA else None
+        d_char, r1, r2, r3 = genome.blocks[i]
+        tier = genome.tiers[i]
+        trait = genome.expressed[i]
 
         # Count mewtations (non-base dominant traits)
         if tier and tier != 'base':
@@ -178,7 +109,7 @@ def print_kitty_genome(kitty: Dict, kitties: Dict[int, Dict] = None):
         tier_str = f" ({tier})" if tier and tier != 'base' else ""
         trait_str = trait or '?'
 
-        print(f"  {trait_name:<12} {d_char:^6} {alleles['r1']:^6} {alleles['r2']:^6} {alleles['r3']:^6}  {trait_str}{tier_str}")
+        print(f"  {trait_name:<12} {d_char:^6} {r1:^6} {r2:^6} {r3:^6}  {trait_str}{tier_str}")
 
     print("-" * 80)
     print(f"Mewtations in dominant genes: {mewtation_count}/12")
@@ -191,78 +122,174 @@ def print_kitty_genome(kitty: Dict, kitties: Dict[int, Dict] = None):
             print(f"  {trait_type}: {value}")
 
 
-def analyze_inheritance(kitties: Dict[int, Dict]) -> Dict[str, Any]:
+ANALYSIS_CACHE_SUFFIX = '.analysis.npz'
+ANALYSIS_CACHE_VERSION = 1
+
+
+def load_partials(path: str) -> Optional[Dict[str, np.ndarray]]:
+    """Cached per-kitty partials (ids, keys, alleles, mutated), None if absent or unreadable."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            if int(data['version']) != ANALYSIS_CACHE_VERSION:
+                return None
+            return {name: data[name] for name in ('ids', 'keys', 'alleles', 'mutated')}
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Ignoring unreadable analysis cache {path}: {e}")
+        return None
+
+
+def save_partials(path: str, ids: np.ndarray, keys: np.ndarray, alleles: np.ndarray, mutated: np.ndarray):
+    """Write per-kitty partials atomically."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        np.savez(f, version=ANALYSIS_CACHE_VERSION, ids=ids, keys=keys, alleles=alleles, mutated=mutated)
+    os.replace(tmp, path)
+
+
+def partials_shard(start: int, stop: int, shared: Dict[str, np.ndarray], state: Any = None):
+    """Decode kitties new[start:stop] and mask their alleles not in either parent (worker for --jobs)."""
+    limbs = [shared[f'genes{k}'] for k in range(GENE_LIMBS)]
+    slots = shared['new'][start:stop]
+    alleles = shared['alleles']
+    alleles[slots] = decode_limbs([limb[slots] for limb in limbs])
+
+    # Parents may sit in another shard: decode them straight from the shared genome limbs
+    child = slots[shared['triple'][slots]]
+    matron, sire = shared['matron'][child], shared['sire'][child]
+    pool = allele_masks(decode_limbs([limb[matron] for limb in limbs]))
+    pool |= allele_masks(decode_limbs([limb[sire] for limb in limbs]))
+    shared['mutated'][child] = allele_masks(alleles[child]) & ~pool
+
+
+def genome_partials(ped: Pedigree, cache_path: Optional[str] = None, jobs: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-kitty partial results every analysis aggregates over:
+    - alleles: (N, 12, 4) decoded genomes
+    - mutated: (N, 12) uint32 masks of alleles a kitty has but neither parent
+      does (0 unless both parents are in the dataset, all three with genes)
+
+    With cache_path, kitties whose id and content key (kitty_keys) match the
+    cache reuse its partials; only new or changed kitties are decoded and
+    compared with their parents, and the cache is rewritten when anything changed.
+    With jobs > 1 that work is sharded across processes (see ck_parallel).
+    """
+    n = len(ped)
+    ids = column(ped.ids, np.int64)
+    alleles = np.zeros((n, 12, 4), dtype=np.uint8)
+    mutated = np.zeros((n, 12), dtype=np.uint32)
+    todo = np.ones(n, dtype=bool)
+
+    keys = kitty_keys(ped) if cache_path else None
+    cached = load_partials(cache_path) if cache_path else None
+    if cached is not None and len(cached['ids']):
+        order = np.argsort(cached['ids'])
+        pos = order[np.minimum(np.searchsorted(cached['ids'], ids, sorter=order), len(order) - 1)]
+        hit = (cached['ids'][pos] == ids) & (cached['keys'][pos] == keys)
+        alleles[hit] = cached['alleles'][pos[hit]]
+        mutated[hit] = cached['mutated'][pos[hit]]
+        todo = ~hit
+
+    new = np.nonzero(todo)[0]
+    if cache_path:
+        print(f"Analysis cache: {n - len(new)} kitties reused, {len(new)} to process")
+    if len(new):
+        child, matron, sire = inheritance_triples(ped)
+        triple = np.zeros(n, dtype=bool)
+        triple[child] = True
+        shared = {f'genes{k}': column(col, np.uint64) for k, col in enumerate(ped.genes)}
+        shared.update(
+            new=new, triple=triple, matron=column(ped.matron, np.int32), sire=column(ped.sire, np.int32),
+            alleles=alleles, mutated=mutated,
+        )
+        run_sharded(partials_shard, len(new), jobs, shared=shared, outputs=('alleles', 'mutated'))
+
+        if cache_path:
+            save_partials(cache_path, ids, keys, alleles, mutated)
+
+    return alleles, mutated
+
+
+@dataclass
+class MutationEvents:
+    """Mutation events as parallel arrays, one entry per (child, trait, allele not in either parent)."""
+    kitty_id: np.ndarray     # int64
+    generation: np.ndarray   # int32, -1 = unknown
+    trait: np.ndarray        # trait index
+    allele: np.ndarray       # allele value (KAI index)
+    matron_mask: np.ndarray  # uint32 allele masks of the parents for that trait
+    sire_mask: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.kitty_id)
+
+    def event(self, i: int) -> Dict[str, Any]:
+        """Event i as a report dict."""
+        gen = int(self.generation[i])
+        return {
+            'kitty_id': int(self.kitty_id[i]),
+            'trait': TRAIT_NAMES[self.trait[i]],
+            'allele': KAI[self.allele[i]],
+            'matron_alleles': {KAI[v] for v in mask_values(int(self.matron_mask[i]))},
+            'sire_alleles': {KAI[v] for v in mask_values(int(self.sire_mask[i]))},
+            'generation': gen if gen >= 0 else None
+        }
+
+
+def analyze_inheritance(ped: Pedigree, alleles: np.ndarray, mutated: np.ndarray) -> Dict[str, Any]:
     """Analyze inheritance patterns and detect mutations."""
-    stats = defaultdict(lambda: {'from_parent': 0, 'mutation': 0, 'total': 0})
-    mutation_events = []
-    analyzed = 0
-
-    for kid, k in kitties.items():
-        matron_id = k.get('matron_id')
-        sire_id = k.get('sire_id')
-
-        if not matron_id or not sire_id:
-            continue
-        if matron_id not in kitties or sire_id not in kitties:
-            continue
-
-        matron_genes = kitties[matron_id].get('genes')
-        sire_genes = kitties[sire_id].get('genes')
-        child_genes = k.get('genes')
-
-        if not all([matron_genes, sire_genes, child_genes]):
-            continue
-
-        analyzed += 1
-
-        for trait_idx, trait_name in enumerate(TRAIT_NAMES):
-            child_alleles = get_all_alleles(child_genes, trait_idx)
-            matron_alleles = get_all_alleles(matron_genes, trait_idx)
-            sire_alleles = get_all_alleles(sire_genes, trait_idx)
-            parent_pool = matron_alleles | sire_alleles
-
-            for allele in child_alleles:
-                stats[trait_name]['total'] += 1
-                if allele in parent_pool:
-                    stats[trait_name]['from_parent'] += 1
-                else:
-                    stats[trait_name]['mutation'] += 1
-                    mutation_events.append({
-                        'kitty_id': kid,
-                        'trait': trait_name,
-                        'allele': allele,
-                        'matron_alleles': matron_alleles,
-                        'sire_alleles': sire_alleles,
-                        'generation': k.get('generation')
-                    })
+    child, matron, sire = inheritance_triples(ped)
+
+    # Every parent-child triple at once: (triples, trait) allele masks
+    child_masks = allele_masks(alleles[child])
+    matron_masks = allele_masks(alleles[matron])
+    sire_masks = allele_masks(alleles[sire])
+    mutated = mutated[child]
+
+    totals = popcount(child_masks).sum(axis=0, dtype=np.int64)
+    mutations = popcount(mutated).sum(axis=0, dtype=np.int64)
+    stats = {}
+    for trait_idx, trait_name in enumerate(TRAIT_NAMES):
+        total, mutation = int(totals[trait_idx]), int(mutations[trait_idx])
+        stats[trait_name] = {'from_parent': total - mutation, 'mutation': mutation, 'total': total}
+
+    # One entry per new allele of each triple
+    rows, traits, allele = mask_cells(mutated)
+    slots = child[rows]
+    events = MutationEvents(
+        kitty_id=column(ped.ids, np.int64)[slots],
+        generation=column(ped.generation, np.int32)[slots],
+        trait=traits.astype(np.uint8),
+        allele=allele.astype(np.uint8),
+        matron_mask=matron_masks[rows, traits],
+        sire_mask=sire_masks[rows, traits],
+    )
 
     return {
-        'analyzed': analyzed,
-        'stats': dict(stats),
-        'mutations': mutation_events
+        'analyzed': len(child),
+        'stats': stats,
+        'mutations': events
     }
 
 
-def analyze_diversity(kitties: Dict[int, Dict]) -> Dict[str, Dict]:
+def index_counter(counts: np.ndarray, first: np.ndarray) -> Counter:
+    """Counter of kai characters from per-value counts, keyed in order of first appearance (first key per value)."""
+    present = np.nonzero(counts)[0]
+    return Counter({KAI[v]: int(counts[v]) for v in present[np.argsort(first[present], kind='stable')]})
+
+
+def analyze_diversity(index: AlleleIndex) -> Dict[str, Dict]:
     """Analyze genetic diversity across the collection."""
     diversity = {}
 
     for trait_idx, trait in enumerate(TRAIT_NAMES):
-        all_alleles = Counter()
-        dominant_alleles = Counter()
-
-        for k in kitties.values():
-            genes = k.get('genes')
-            if not genes:
-                continue
-
-            kai = genes_to_kai(genes)
-            blocks = kai_to_trait_blocks(kai)
-            block = blocks[trait_idx]
-
-            for allele in block:
-                all_alleles[allele] += 1
-            dominant_alleles[block[0]] += 1
+        # Frequencies straight from the index; first appearance ordered by (slot, position)
+        counts = [index.counts(trait_idx, p) for p in range(4)]
+        firsts = [index.first_slots(trait_idx, p) for p in range(4)]
+        first_any = np.min([np.where(f >= 0, f * 4 + p, np.iinfo(np.int64).max) for p, f in enumerate(firsts)], axis=0)
+        all_alleles = index_counter(np.sum(counts, axis=0), first_any)
+        dominant_alleles = index_counter(counts[0], firsts[0])
 
         diversity[trait] = {
             'unique_alleles': len(all_alleles),
@@ -275,82 +302,46 @@ def analyze_diversity(kitties: Dict[int, Dict]) -> Dict[str, Dict]:
     return diversity
 
 
-def analyze_founders(kitties: Dict[int, Dict]) -> Dict[str, Any]:
+def analyze_founders(ped: Pedigree, alleles: np.ndarray) -> Dict[str, Any]:
     """Analyze the Gen 0 founder gene pool."""
-    gen0_cats = [k for k in kitties.values() if k.get('generation') == 0]
-
-    founder_traits = defaultdict(Counter)
-    for k in gen0_cats:
-        genes = k.get('genes')
-        if not genes:
-            continue
-
-        kai = genes_to_kai(genes)
-        blocks = kai_to_trait_blocks(kai)
+    gen0 = column(ped.generation, np.int32) == 0
+    rows = alleles[gen0 & genes_mask(ped)]
 
+    founder_traits = {}
+    if len(rows):
         for i, trait in enumerate(TRAIT_NAMES):
-            dominant = blocks[i][0]
-            founder_traits[trait][dominant] += 1
+            founder_traits[trait] = allele_counter(rows[:, i, 0])
 
     return {
-        'count': len(gen0_cats),
+        'count': int(gen0.sum()),
         'trait_dominants': {trait: dict(counts) for trait, counts in founder_traits.items()},
         'top_by_trait': {trait: counts.most_common(5) for trait, counts in founder_traits.items()}
     }
 
 
-def find_first_mutations(kitties: Dict[int, Dict]) -> Dict[Tuple[str, str], int]:
+def find_first_mutations(ped: Pedigree, mutated: np.ndarray) -> FirstMutationTable:
     """Find the first occurrence of each mutation."""
-    first_mutation = {}
-
-    for k in sorted(kitties.values(), key=lambda x: x.get('id', 0)):
-        kid = k.get('id')
-        matron_id = k.get('matron_id')
-        sire_id = k.get('sire_id')
-
-        if not matron_id or not sire_id:
-            continue
-        if matron_id not in kitties or sire_id not in kitties:
-            continue
-
-        child_genes = k.get('genes')
-        matron_genes = kitties[matron_id].get('genes')
-        sire_genes = kitties[sire_id].get('genes')
-
-        if not all([child_genes, matron_genes, sire_genes]):
-            continue
+    return FirstMutationTable.build(column(ped.ids, np.int64), mutated)
 
-        for trait_idx, trait in enumerate(TRAIT_NAMES):
-            child_alleles = get_all_alleles(child_genes, trait_idx)
-            parent_alleles = get_all_alleles(matron_genes, trait_idx) | get_all_alleles(sire_genes, trait_idx)
 
-            for allele in child_alleles - parent_alleles:
-                key = (trait, allele)
-                if key not in first_mutation:
-                    first_mutation[key] = kid
-
-    return first_mutation
-
-
-def trace_ancestry(kitty_id: int, kitties: Dict[int, Dict], matron_only: bool = False) -> List[Tuple[int, str, int]]:
+def trace_ancestry(kitty_id: int, ped: Pedigree, matron_only: bool = False) -> List[Tuple[int, str, int]]:
     """Trace ancestry path to Gen 0."""
     path = []
-    current_id = kitty_id
+    i = ped.index_of(kitty_id)
 
-    while current_id and current_id in kitties:
-        k = kitties[current_id]
-        name = k.get('name') or 'unnamed'
-        gen = k.get('generation')
-        path.append((current_id, name, gen))
+    while i >= 0:
+        name = ped.name_of(i) or 'unnamed'
+        gen = ped.generation[i] if ped.generation[i] >= 0 else None
+        path.append((ped.ids[i], name, gen))
 
         if gen == 0:
             break
 
         if matron_only:
-            current_id = k.get('matron_id')
+            i = ped.matron[i]
         else:
             # For full trace, we'd need to handle both parents (tree structure)
-            current_id = k.get('matron_id')
+            i = ped.matron[i]
 
     return path
 
@@ -384,11 +375,11 @@ def print_inheritance_report(result: Dict[str, Any]):
     print(f"{'TOTAL':<12} {total_from_parent:>12} {total_mutations:>12} {overall_rate:>13.2f}%")
 
 
-def print_mutation_report(mutations: List[Dict], limit: int = 10):
+def print_mutation_report(mutations: MutationEvents, limit: int = 10):
     """Print mutation events."""
     print(f"\n=== MUTATION EVENTS ({min(limit, len(mutations))} of {len(mutations)}) ===\n")
 
-    for m in mutations[:limit]:
+    for m in (mutations.event(i) for i in range(min(limit, len(mutations)))):
         print(f"Kitty #{m['kitty_id']} (Gen {m['generation']})")
         print(f"  Trait: {m['trait']}")
         print(f"  Child allele: '{m['allele']}' (not in parents)")
@@ -424,13 +415,13 @@ def print_founder_report(founders: Dict[str, Any]):
             print(f"{trait:<12}: {top_str}")
 
 
-def print_first_mutations_report(first_mutations: Dict[Tuple[str, str], int]):
+def print_first_mutations_report(first_mutations: FirstMutationTable):
     """Print first mutation discoveries."""
     print(f"\n=== MEWTATION DISCOVERY TIMELINE ===\n")
     print(f"Found {len(first_mutations)} unique mutation events (first occurrences)\n")
 
     by_trait = defaultdict(list)
-    for (trait, allele), kid in first_mutations.items():
+    for (trait, allele), kid in first_mutations.as_dict().items():
         by_trait[trait].append((allele, kid))
 
     for trait in TRAIT_NAMES:
@@ -440,44 +431,43 @@ def print_first_mutations_report(first_mutations: Dict[Tuple[str, str], int]):
             print(f"{trait:<12}: {mut_str}")
 
 
-def analyze_mewtations(kitties: Dict[int, Dict]) -> Dict[str, Any]:
+def analyze_mewtations(ped: Pedigree, alleles: np.ndarray, index: AlleleIndex) -> Dict[str, Any]:
     """Analyze mewtation distribution across the collection."""
-    tier_counts = defaultdict(Counter)  # tier -> trait -> count
-    kitty_mewtations = []  # List of (kitty_id, mewtation_count, top_tier)
-
-    for kid, k in kitties.items():
-        genes = k.get('genes')
-        if not genes:
-            continue
+    tiers = [get_mewtation_tier(c) for c in KAI]  # tier by allele value
+    rank_of = np.array([get_tier_rank(t) for t in tiers], dtype=np.int8)
 
-        kai = genes_to_kai(genes)
-        blocks = kai_to_trait_blocks(kai)
+    has = np.nonzero(genes_mask(ped))[0]
+    dominant = alleles[has, :, 0]  # (kitties with genes, trait)
 
-        kitty_tiers = []
-        for i, trait in enumerate(TRAIT_NAMES):
-            d_char = blocks[i][0]  # Dominant allele
-            tier = get_mewtation_tier(d_char)
-            if tier:
-                tier_counts[tier][trait] += 1
-                if tier != 'base':
-                    kitty_tiers.append((trait, tier, d_char))
-
-        if kitty_tiers:
-            # Find highest tier
-            top_tier = max(kitty_tiers, key=lambda x: get_tier_rank(x[1]))
-            kitty_mewtations.append((kid, len(kitty_tiers), top_tier))
-
-    # Sort by number of mewtations (descending)
-    kitty_mewtations.sort(key=lambda x: (-x[1], -get_tier_rank(x[2][1])))
+    tier_counts = defaultdict(Counter)  # tier -> trait -> count
+    for i, trait in enumerate(TRAIT_NAMES):
+        for value, count in enumerate(index.counts(i, 0).tolist()):
+            if count and tiers[value]:
+                tier_counts[tiers[value]][trait] += count
+
+    # Per kitty: number of non-base dominant alleles and the first highest-tier one
+    rank = rank_of[dominant]
+    mewt_count = (rank > 0).sum(axis=1)
+    top_trait = rank.argmax(axis=1)
+    sel = np.nonzero(mewt_count)[0]
+    top_rank = rank[sel, top_trait[sel]]
+
+    # Sort by number of mewtations, then tier (descending), keeping file order for ties
+    order = sel[np.lexsort((sel, -top_rank.astype(np.int16), -mewt_count[sel]))][:20]
+    kitty_mewtations = []  # List of (kitty_id, mewtation_count, top_tier)
+    for row in order.tolist():
+        t = int(top_trait[row])
+        value = int(dominant[row, t])
+        kitty_mewtations.append((ped.ids[has[row]], int(mewt_count[row]), (TRAIT_NAMES[t], tiers[value], KAI[value])))
 
     return {
         'tier_counts': {tier: dict(counts) for tier, counts in tier_counts.items()},
-        'top_kitties': kitty_mewtations[:20],
-        'total_analyzed': len(kitties),
+        'top_kitties': kitty_mewtations,
+        'total_analyzed': len(ped),
     }
 
 
-def print_mewtation_report(result: Dict[str, Any], kitties: Dict[int, Dict]):
+def print_mewtation_report(result: Dict[str, Any], ped: Pedigree):
     """Print mewtation analysis report."""
     print(f"\n=== MEWTATION ANALYSIS ===\n")
     print(f"Analyzed {result['total_analyzed']} kitties\n")
@@ -509,10 +499,10 @@ def print_mewtation_report(result: Dict[str, Any], kitties: Dict[int, Dict]):
     print("-" * 70)
 
     for kid, mewt_count, (trait, tier, char) in result['top_kitties'][:10]:
-        k = kitties.get(kid, {})
-        name = (k.get('name') or 'unnamed')[:20]
-        gen = k.get('generation', '?')
-        trait_name = get_trait_name(TRAIT_NAMES.index(trait), char) if HAS_TRAIT_DATA else char
+        i = ped.index_of(kid)
+        name = (ped.name_of(i) or 'unnamed')[:20]
+        gen = ped.generation[i] if ped.generation[i] >= 0 else '?'
+        trait_name = get_trait_name(TRAIT_NAMES.index(trait), char)
         print(f"{kid:>10} {name:<20} {gen:>4} {mewt_count:>6}   {trait}: {trait_name or char} ({tier})")
 
     # Tier breakdown by trait
@@ -547,29 +537,34 @@ def main():
     parser.add_argument('--trace', type=int, metavar='ID', help='Trace ancestry for a specific kitty')
     parser.add_argument('--all', action='store_true', help='Run all analyses')
     parser.add_argument('--limit', type=int, default=10, help='Limit mutation output (default: 10)')
+    parser.add_argument('--analysis-cache', nargs='?', const='', metavar='FILE',
+                        help=f'Reuse per-kitty results from FILE (default: JSON_FILE{ANALYSIS_CACHE_SUFFIX}); '
+                             'only new or changed kitties are processed')
+    add_jobs_arg(parser)
 
     args = parser.parse_args()
 
-    # Load data
-    kitties, root_ids = load_kitties(args.json_file)
-    print(f"Loaded {len(kitties)} kitties from {args.json_file}")
+    # Load data: arrays and names only, full records are re-read for the genomes printed in full
+    ped = load_dataset(args.json_file, keep_records=False)
+    root_ids = ped.root_ids
+    print(f"Loaded {len(ped)} kitties from {args.json_file}")
     print(f"Root IDs: {root_ids}")
 
     # Generation distribution
-    gens = Counter(k.get('generation') for k in kitties.values() if k.get('generation') is not None)
+    gens = Counter(g for g in ped.generation if g >= 0)
     print(f"Generations: {min(gens.keys())} to {max(gens.keys())}")
     print()
 
     if args.trace:
-        if args.trace not in kitties:
+        if args.trace not in ped:
             print(f"Kitty #{args.trace} not found in dataset")
             return 1
 
         print(f"\n=== ANCESTRY TRACE: #{args.trace} ===\n")
-        print_kitty_genome(kitties[args.trace], kitties)
+        print_kitty_genome(load_records(args.json_file, [args.trace])[args.trace])
 
         print(f"\nMatron line to Gen 0:")
-        path = trace_ancestry(args.trace, kitties, matron_only=True)
+        path = trace_ancestry(args.trace, ped, matron_only=True)
         for kid, name, gen in path:
             print(f"  Gen {gen:>2}: #{kid:>6} ({name})")
         print(f"\nReached Gen 0 founder in {len(path)} generations")
@@ -577,30 +572,44 @@ def main():
 
     if args.full or args.all:
         print("\n=== ROOT KITTY GENOMES ===")
-        for rid in root_ids[:3]:  # Limit to first 3 for readability
-            if rid in kitties:
-                print()
-                print_kitty_genome(kitties[rid], kitties)
+        shown = [rid for rid in root_ids[:3] if rid in ped]  # Limit to first 3 for readability
+        records = load_records(args.json_file, shown)
+        for rid in shown:
+            print()
+            print_kitty_genome(records[rid])
+
+    # Decode every genome once; all dataset-wide analyses index this (N, 12, 4) array
+    alleles = mutated = None
+    if args.mutations or args.diversity or args.founders or args.mewtations or args.all:
+        cache_path = None
+        if args.analysis_cache is not None:
+            cache_path = args.analysis_cache or args.json_file + ANALYSIS_CACHE_SUFFIX
+        alleles, mutated = genome_partials(ped, cache_path, args.jobs)
+
+    # Allele frequencies (diversity, mewtation tiers) come from the inverted index
+    index = None
+    if args.diversity or args.mewtations or args.all:
+        index = AlleleIndex.from_pedigree(ped, alleles)
 
     if args.mutations or args.all:
-        result = analyze_inheritance(kitties)
+        result = analyze_inheritance(ped, alleles, mutated)
         print_inheritance_report(result)
         print_mutation_report(result['mutations'], args.limit)
 
-        first_mutations = find_first_mutations(kitties)
+        first_mutations = find_first_mutations(ped, mutated)
         print_first_mutations_report(first_mutations)
 
     if args.diversity or args.all:
-        diversity = analyze_diversity(kitties)
+        diversity = analyze_diversity(index)
         print_diversity_report(diversity)
 
     if args.founders or args.all:
-        founders = analyze_founders(kitties)
+        founders = analyze_founders(ped, alleles)
         print_founder_report(founders)
 
     if args.mewtations or args.all:
-        mewtations = analyze_mewtations(kitties)
-        print_mewtation_report(mewtations, kitties)
+        mewtations = analyze_mewtations(ped, alleles, index)
+        print_mewtation_report(mewtations, ped)
 
     return 0
 
@@ -17,9 +17,11 @@ Usage:
 """
 
 import argparse
-import json
 from collections import Counter, defaultdict
-from typing import Dict, List, Tuple
+from typing import Dict
+
+from ck_genome import decode_alleles, decode_genome, genes_mask, inheritance_triples
+from ck_pedigree import Pedigree, load_dataset
 
 try:
     import matplotlib.pyplot as plt
@@ -52,35 +54,6 @@ ALLELE_COLORS = {
 }
 
 
-def genes_to_kai(genes_int: int | str) -> str:
-    """Convert genes integer to kai string (48 chars)."""
-    kai = ''
-    n = int(genes_int)
-    for _ in range(48):
-        kai = KAI[n % 32] + kai
-        n //= 32
-    return kai
-
-
-def kai_to_trait_blocks(kai: str) -> List[str]:
-    """Return list of 12 trait blocks, each with 4 alleles."""
-    kai_rev = kai[::-1]
-    blocks = []
-    for i in range(12):
-        start = i * 4
-        blocks.append(kai_rev[start:start + 4])
-    return blocks
-
-
-def load_kitties(json_path: str) -> Tuple[Dict[int, Dict], List[int]]:
-    """Load kitties from JSON file."""
-    with open(json_path, 'r') as f:
-        data = json.load(f)
-    kitties = {int(k['id']): k for k in data.get('kitties', []) if k.get('id')}
-    root_ids = [int(r) for r in data.get('root_ids', [])]
-    return kitties, root_ids
-
-
 def draw_genome_strip(kitty: Dict, ax=None, show_labels: bool = True):
     """Draw a genome strip visualization for a kitty."""
     if not HAS_MATPLOTLIB:
@@ -92,8 +65,7 @@ def draw_genome_strip(kitty: Dict, ax=None, show_labels: bool = True):
         print(f"No genes for kitty #{kitty.get('id')}")
         return
 
-    kai = genes_to_kai(genes)
-    blocks = kai_to_trait_blocks(kai)
+    blocks = decode_genome(genes).blocks
 
     if ax is None:
         fig, ax = plt.subplots(figsize=(14, 2))
@@ -139,7 +111,7 @@ def draw_genome_strip(kitty: Dict, ax=None, show_labels: bool = True):
     return ax
 
 
-def draw_inheritance_diagram(child: Dict, matron: Dict, sire: Dict, kitties: Dict):
+def draw_inheritance_diagram(child: Dict, matron: Dict, sire: Dict, kitties: Dict = None):
     """Draw inheritance diagram showing how child got its alleles."""
     if not HAS_MATPLOTLIB:
         print("matplotlib required for visualization")
@@ -164,32 +136,20 @@ def draw_inheritance_diagram(child: Dict, matron: Dict, sire: Dict, kitties: Dic
     return fig
 
 
-def draw_diversity_heatmap(kitties: Dict[int, Dict]):
+def draw_diversity_heatmap(ped: Pedigree):
     """Draw heatmap showing allele diversity across traits."""
     if not HAS_MATPLOTLIB:
         print("matplotlib required for visualization")
         return
 
-    # Count alleles per trait
-    trait_alleles = defaultdict(Counter)
-
-    for k in kitties.values():
-        genes = k.get('genes')
-        if not genes:
-            continue
-
-        blocks = kai_to_trait_blocks(genes_to_kai(genes))
-        for i, trait in enumerate(TRAIT_NAMES):
-            for allele in blocks[i]:
-                trait_alleles[trait][allele] += 1
-
-    # Create matrix
-    all_alleles = sorted(set(a for counts in trait_alleles.values() for a in counts.keys()))
-    matrix = np.zeros((len(TRAIT_NAMES), len(all_alleles)))
+    # Count alleles per trait: (trait, allele value) over every slot of every genome
+    rows = decode_alleles(ped)[genes_mask(ped)]
+    counts = np.stack([np.bincount(rows[:, i, :].ravel(), minlength=len(KAI)) for i in range(len(TRAIT_NAMES))])
 
-    for i, trait in enumerate(TRAIT_NAMES):
-        for j, allele in enumerate(all_alleles):
-            matrix[i, j] = trait_alleles[trait].get(allele, 0)
+    # Create matrix (alleles that occur at all, in kai order)
+    present = np.nonzero(counts.sum(axis=0))[0]
+    all_alleles = [KAI[v] for v in present]
+    matrix = counts[:, present].astype(float)
 
     # Normalize by row
     row_sums = matrix.sum(axis=1, keepdims=True)
@@ -213,42 +173,23 @@ def draw_diversity_heatmap(kitties: Dict[int, Dict]):
     return fig
 
 
-def draw_mutation_rate_chart(kitties: Dict[int, Dict]):
+def draw_mutation_rate_chart(ped: Pedigree):
     """Draw bar chart of mutation rates by trait."""
     if not HAS_MATPLOTLIB:
         print("matplotlib required for visualization")
         return
 
-    # Calculate mutation rates
-    stats = {trait: {'from_parent': 0, 'mutation': 0} for trait in TRAIT_NAMES}
-
-    for kid, k in kitties.items():
-        matron_id = k.get('matron_id')
-        sire_id = k.get('sire_id')
-
-        if not matron_id or not sire_id:
-            continue
-        if matron_id not in kitties or sire_id not in kitties:
-            continue
-
-        child_genes = k.get('genes')
-        matron_genes = kitties[matron_id].get('genes')
-        sire_genes = kitties[sire_id].get('genes')
-
-        if not all([child_genes, matron_genes, sire_genes]):
-            continue
-
-        child_blocks = kai_to_trait_blocks(genes_to_kai(child_genes))
-        matron_blocks = kai_to_trait_blocks(genes_to_kai(matron_genes))
-        sire_blocks = kai_to_trait_blocks(genes_to_kai(sire_genes))
+    # Calculate mutation rates: each child allele slot either occurs among the parents' 8 or is a mutation
+    alleles = decode_alleles(ped)
+    child, matron, sire = inheritance_triples(ped)
+    parents = np.concatenate([alleles[matron], alleles[sire]], axis=2)  # (M, 12, 8)
+    inherited = (alleles[child][:, :, :, None] == parents[:, :, None, :]).any(axis=3)  # (M, 12, 4)
+    from_parent = inherited.sum(axis=(0, 2))
+    total_slots = inherited.shape[0] * inherited.shape[2]
 
-        for i, trait in enumerate(TRAIT_NAMES):
-            parent_alleles = set(matron_blocks[i]) | set(sire_blocks[i])
-            for allele in child_blocks[i]:
-                if allele in parent_alleles:
-                    stats[trait]['from_parent'] += 1
-                else:
-                    stats[trait]['mutation'] += 1
+    stats = {}
+    for i, trait in enumerate(TRAIT_NAMES):
+        stats[trait] = {'from_parent': int(from_parent[i]), 'mutation': total_slots - int(from_parent[i])}
 
     # Calculate rates
     rates = []
@@ -281,8 +222,8 @@ def print_ascii_genome_strip(kitty: Dict):
         print(f"No genes for kitty #{kitty.get('id')}")
         return
 
-    kai = genes_to_kai(genes)
-    blocks = kai_to_trait_blocks(kai)
+    genome = decode_genome(genes)
+    kai, blocks = genome.kai, genome.blocks
 
     name = kitty.get('name') or f"Kitty #{kitty.get('id')}"
     print(f"\n{'=' * 70}")
@@ -315,19 +256,20 @@ def main():
 
     args = parser.parse_args()
 
-    kitties, root_ids = load_kitties(args.json_file)
-    print(f"Loaded {len(kitties)} kitties")
+    # Every drawing needs only id, name, generation, parents and genes: records are not kept
+    ped = load_dataset(args.json_file, keep_records=False)
+    print(f"Loaded {len(ped)} kitties")
 
     if args.strip:
-        if args.strip not in kitties:
+        if args.strip not in ped:
             print(f"Kitty #{args.strip} not found")
             return 1
 
         if args.ascii or not HAS_MATPLOTLIB:
-            print_ascii_genome_strip(kitties[args.strip])
+            print_ascii_genome_strip(ped.get(args.strip))
         else:
             fig, ax = plt.subplots(figsize=(14, 2))
-            draw_genome_strip(kitties[args.strip], ax)
+            draw_genome_strip(ped.get(args.strip), ax)
             if args.output:
                 plt.savefig(args.output, dpi=150, bbox_inches='tight')
                 print(f"Saved to {args.output}")
@@ -336,17 +278,17 @@ def main():
 
     elif args.compare:
         id1, id2 = args.compare
-        if id1 not in kitties or id2 not in kitties:
+        if id1 not in ped or id2 not in ped:
             print(f"Kitty not found")
             return 1
 
         if args.ascii or not HAS_MATPLOTLIB:
-            print_ascii_genome_strip(kitties[id1])
-            print_ascii_genome_strip(kitties[id2])
+            print_ascii_genome_strip(ped.get(id1))
+            print_ascii_genome_strip(ped.get(id2))
         else:
             fig, axes = plt.subplots(2, 1, figsize=(14, 4))
-            draw_genome_strip(kitties[id1], axes[0])
-            draw_genome_strip(kitties[id2], axes[1])
+            draw_genome_strip(ped.get(id1), axes[0])
+            draw_genome_strip(ped.get(id2), axes[1])
             plt.tight_layout()
             if args.output:
                 plt.savefig(args.output, dpi=150, bbox_inches='tight')
@@ -354,7 +296,7 @@ def main():
                 plt.show()
 
     elif args.inheritance:
-        child = kitties.get(args.inheritance)
+        child = ped.get(args.inheritance)
         if not child:
             print(f"Kitty #{args.inheritance} not found")
             return 1
@@ -366,8 +308,8 @@ def main():
             print(f"Kitty #{args.inheritance} has no parents (Gen 0)")
             return 1
 
-        matron = kitties.get(matron_id)
-        sire = kitties.get(sire_id)
+        matron = ped.get(matron_id)
+        sire = ped.get(sire_id)
 
         if not matron or not sire:
             print(f"Parents not in dataset")
@@ -382,7 +324,7 @@ def main():
             print("\nCHILD:")
             print_ascii_genome_strip(child)
         else:
-            fig = draw_inheritance_diagram(child, matron, sire, kitties)
+            fig = draw_inheritance_diagram(child, matron, sire)
             if args.output:
                 plt.savefig(args.output, dpi=150, bbox_inches='tight')
             else:
@@ -392,7 +334,7 @@ def main():
         if not HAS_MATPLOTLIB:
             print("matplotlib required for heatmap")
             return 1
-        fig = draw_diversity_heatmap(kitties)
+        fig = draw_diversity_heatmap(ped)
         if args.output:
             plt.savefig(args.output, dpi=150, bbox_inches='tight')
         else:
@@ -402,7 +344,7 @@ def main():
         if not HAS_MATPLOTLIB:
             print("matplotlib required for chart")
             return 1
-        fig = draw_mutation_rate_chart(kitties)
+        fig = draw_mutation_rate_chart(ped)
         if args.output:
             plt.savefig(args.output, dpi=150, bbox_inches='tight')
         else:
@@ -411,9 +353,9 @@ def main():
     else:
         # Default: show ASCII strips for first few root kitties
         print("\nNo visualization option specified. Showing root kitties:\n")
-        for rid in root_ids[:3]:
-            if rid in kitties:
-                print_ascii_genome_strip(kitties[rid])
+        for rid in ped.root_ids[:3]:
+            if rid in ped:
+                print_ascii_genome_strip(ped.get(rid))
 
         print("\nOptions:")
         print("  --strip ID        Show genome strip for a kitty")
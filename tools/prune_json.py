@@ -2,6 +2,9 @@
 """
 Prune CryptoKitties JSON files to keep only fields used by the visualizer.
 Significantly reduces file size while preserving all functionality.
+
+With --format ckpd the pruned dataset is written as a CKPD binary file
+(ck_pedigree.py) that the analysis tools memory-map instead of parsing.
 """
 
 import argparse
@@ -9,6 +12,8 @@ import json
 import sys
 from pathlib import Path
 
+from ck_pedigree import Pedigree
+
 # Fields needed by the visualizer
 KITTY_FIELDS = {
     'id',
@@ -124,11 +129,16 @@ def main():
     parser.add_argument('-o', '--output', help='Output file (default: overwrite input)')
     parser.add_argument('-v', '--verbose', action='store_true', help='Show size reduction')
     parser.add_argument('--dry-run', action='store_true', help='Show reduction without writing')
+    parser.add_argument('--format', choices=['json', 'ckpd'], default='json',
+                        help='Output format (default: json). ckpd defaults the output to <input>.ckpd')
 
     args = parser.parse_args()
 
     input_path = Path(args.input)
-    output_path = Path(args.output) if args.output else input_path
+    if args.output:
+        output_path = Path(args.output)
+    else:
+        output_path = input_path.with_suffix('.ckpd') if args.format == 'ckpd' else input_path
 
     # Read input
     with open(input_path) as f:
@@ -139,16 +149,19 @@ def main():
     pruned = prune_json(data)
 
     # Serialize
-    output_json = json.dumps(pruned, separators=(',', ':'))
-    new_size = len(output_json)
+    if args.format == 'ckpd':
+        output = Pedigree.from_payload(pruned).dumps()
+    else:
+        output = json.dumps(pruned, separators=(',', ':')).encode('utf-8')
+    new_size = len(output)
 
     if args.verbose or args.dry_run:
         reduction = (1 - new_size / original_size) * 100
         print(f"{input_path.name}: {original_size:,} -> {new_size:,} bytes ({reduction:.1f}% reduction)")
 
     if not args.dry_run:
-        with open(output_path, 'w') as f:
-            f.write(output_json)
+        with open(output_path, 'wb') as f:
+            f.write(output)
         if args.verbose:
             print(f"  Written to: {output_path}")
 
@@ -5,138 +5,92 @@ Prune kitties JSON to only keep direct ancestor paths to Gen 0 founders.
 Modes:
   --all       Keep ALL ancestor paths (both matron and sire lines) [default]
   --shortest  Keep only the SHORTEST path to Gen 0 (follows lower-gen parent)
+  --exact     Keep only a path with the fewest hops to Gen 0 (distance table)
   --matron    Keep only the matron line
   --sire      Keep only the sire line
 
+Ancestors of all roots are collected in one iterative pass over the pedigree's
+parent slots, so deep lineages and thousands of roots prune in linear time.
+--exact builds a distance-to-founder table for every kitty in one pass (roots
+without a reachable founder fall back to the greedy walk); --founder-cache
+saves it next to the input so later runs over the same dataset reuse it.
+
 Usage:
     python3 prune_to_ancestors.py input.json -o output.json
     python3 prune_to_ancestors.py input.json --shortest -o output.json
+    python3 prune_to_ancestors.py input.json --exact --founder-cache -o output.json
     python3 prune_to_ancestors.py input.json --dry-run  # Show stats without writing
+    python3 prune_to_ancestors.py input.json --dry-run --per-root  # Plus ancestor count of each root
 """
 
 import argparse
 import json
-from typing import Dict, Set, List
-
-
-def load_kitties(json_path: str) -> tuple:
-    """Load kitties from JSON file."""
-    with open(json_path, 'r') as f:
-        data = json.load(f)
-
-    kitties = {}
-    for k in data.get('kitties', []):
-        kid = k.get('id')
-        if kid:
-            kitties[int(kid)] = k
-
-    root_ids = [int(r) for r in data.get('root_ids', [])]
-    config = data.get('config', {})
-
-    return kitties, root_ids, config, data
+from typing import Dict, List, Optional, Set
 
+from ck_pedigree import FounderDistances, Pedigree, load_dataset
 
-def find_all_ancestors(kitty_id: int, kitties: Dict[int, dict], ancestors: Set[int]) -> None:
-    """Recursively find ALL ancestors of a kitty (both matron and sire lines)."""
-    if kitty_id in ancestors:
-        return  # Already processed
+FOUNDER_CACHE_SUFFIX = '.founders.bin'
 
-    if kitty_id not in kitties:
-        return  # Kitty not in dataset
 
-    ancestors.add(kitty_id)
-
-    k = kitties[kitty_id]
-    matron_id = k.get('matron_id')
-    sire_id = k.get('sire_id')
-
-    if matron_id:
-        find_all_ancestors(int(matron_id), kitties, ancestors)
-    if sire_id:
-        find_all_ancestors(int(sire_id), kitties, ancestors)
+def load_kitties(json_path: str) -> tuple:
+    """Load a JSON/NDJSON dataset, return (pedigree, root_ids, config, other top-level keys)."""
+    ped = load_dataset(json_path)
+    return ped, ped.root_ids, ped.meta.get('config', {}), ped.meta
 
 
-def find_shortest_path(kitty_id: int, kitties: Dict[int, dict], ancestors: Set[int]) -> None:
+def find_shortest_path(i: int, ped: Pedigree, ancestors: Set[int]) -> None:
     """Find shortest path to Gen 0 by always following the lower-generation parent."""
-    if kitty_id in ancestors:
-        return  # Already processed
-
-    if kitty_id not in kitties:
-        return  # Kitty not in dataset
-
-    ancestors.add(kitty_id)
-
-    k = kitties[kitty_id]
-    gen = k.get('generation', 0)
+    while i >= 0 and i not in ancestors:  # Stop outside the dataset or at an already kept kitty
+        ancestors.add(i)
 
-    if gen == 0:
-        return  # Reached founder
+        if ped.generation[i] <= 0:
+            return  # Reached founder (unknown generation counts as one)
 
-    matron_id = k.get('matron_id')
-    sire_id = k.get('sire_id')
+        matron, sire = ped.parents_of(i)
 
-    # Get parent generations
-    matron_gen = kitties.get(int(matron_id), {}).get('generation', 999) if matron_id else 999
-    sire_gen = kitties.get(int(sire_id), {}).get('generation', 999) if sire_id else 999
+        # Get parent generations (999 = parent missing or generation unknown)
+        matron_gen = ped.generation[matron] if matron >= 0 and ped.generation[matron] >= 0 else 999
+        sire_gen = ped.generation[sire] if sire >= 0 and ped.generation[sire] >= 0 else 999
 
-    # Follow the lower-generation parent (shorter path to Gen 0)
-    if matron_gen <= sire_gen and matron_id and int(matron_id) in kitties:
-        find_shortest_path(int(matron_id), kitties, ancestors)
-    elif sire_id and int(sire_id) in kitties:
-        find_shortest_path(int(sire_id), kitties, ancestors)
-    elif matron_id and int(matron_id) in kitties:
-        find_shortest_path(int(matron_id), kitties, ancestors)
+        # Follow the lower-generation parent (shorter path to Gen 0)
+        if matron_gen <= sire_gen and matron >= 0:
+            i = matron
+        else:
+            i = sire if sire >= 0 else matron
 
 
-def find_matron_line(kitty_id: int, kitties: Dict[int, dict], ancestors: Set[int]) -> None:
-    """Find matron-only lineage to Gen 0."""
-    if kitty_id in ancestors:
-        return
+def prune_to_ancestors(ped: Pedigree, root_ids: List[int], mode: str = 'all',
+                       distances: Optional[FounderDistances] = None) -> Set[int]:
+    """Find kitty ids to keep based on pruning mode ('exact' builds distances if not given)."""
+    roots = [ped.index_of(root_id) for root_id in root_ids]
 
-    if kitty_id not in kitties:
-        return
+    if mode == 'shortest':
+        ancestors = set()
+        for i in roots:
+            find_shortest_path(i, ped, ancestors)
+        return {ped.ids[i] for i in ancestors}
 
-    ancestors.add(kitty_id)
+    if mode == 'exact':
+        distances = distances or FounderDistances.build(ped)
+        ancestors = set()
+        for i in roots:
+            path = distances.path(i)
+            if path:
+                ancestors.update(path)
+            else:
+                find_shortest_path(i, ped, ancestors)  # No founder in the dataset: greedy walk
+        return {ped.ids[i] for i in ancestors}
 
-    k = kitties[kitty_id]
-    matron_id = k.get('matron_id')
+    # One iterative pass over the parent edges for all roots (linear in the graph size)
+    keep = ped.ancestor_mask(roots, matron=(mode != 'sire'), sire=(mode != 'matron'))
+    return {ped.ids[i] for i, kept in enumerate(keep) if kept}
 
-    if matron_id and int(matron_id) in kitties:
-        find_matron_line(int(matron_id), kitties, ancestors)
 
-
-def find_sire_line(kitty_id: int, kitties: Dict[int, dict], ancestors: Set[int]) -> None:
-    """Find sire-only lineage to Gen 0."""
-    if kitty_id in ancestors:
-        return
-
-    if kitty_id not in kitties:
-        return
-
-    ancestors.add(kitty_id)
-
-    k = kitties[kitty_id]
-    sire_id = k.get('sire_id')
-
-    if sire_id and int(sire_id) in kitties:
-        find_sire_line(int(sire_id), kitties, ancestors)
-
-
-def prune_to_ancestors(kitties: Dict[int, dict], root_ids: List[int], mode: str = 'all') -> Set[int]:
-    """Find kitties to keep based on pruning mode."""
-    ancestors = set()
-
-    finder = {
-        'all': find_all_ancestors,
-        'shortest': find_shortest_path,
-        'matron': find_matron_line,
-        'sire': find_sire_line,
-    }.get(mode, find_all_ancestors)
-
-    for root_id in root_ids:
-        finder(root_id, kitties, ancestors)
-
-    return ancestors
+def ancestors_per_root(ped: Pedigree, root_ids: List[int]) -> Dict[int, int]:
+    """Number of ancestors (root included) of each root id in the dataset."""
+    roots = {root_id: ped.index_of(root_id) for root_id in root_ids}
+    _, sets = ped.ancestor_bitsets(roots.values())
+    return {root_id: sets[i].bit_count() for root_id, i in roots.items() if i >= 0}
 
 
 def main():
@@ -149,6 +103,7 @@ def main():
     parser.add_argument('-o', '--output', metavar='FILE', help='Output JSON file')
     parser.add_argument('--dry-run', action='store_true', help='Show stats without writing')
     parser.add_argument('--keep-raw', action='store_true', help='Keep raw API data in output')
+    parser.add_argument('--per-root', action='store_true', help='Show the number of ancestors of each root')
 
     # Pruning mode (mutually exclusive)
     mode_group = parser.add_mutually_exclusive_group()
@@ -156,37 +111,52 @@ def main():
                            help='Keep ALL ancestor paths (default)')
     mode_group.add_argument('--shortest', action='store_const', const='shortest', dest='mode',
                            help='Keep only shortest path to Gen 0')
+    mode_group.add_argument('--exact', action='store_const', const='exact', dest='mode',
+                           help='Keep only a path with the fewest hops to Gen 0')
     mode_group.add_argument('--matron', action='store_const', const='matron', dest='mode',
                            help='Keep only matron line')
     mode_group.add_argument('--sire', action='store_const', const='sire', dest='mode',
                            help='Keep only sire line')
     parser.set_defaults(mode='all')
+    parser.add_argument('--founder-cache', nargs='?', const='', metavar='FILE',
+                        help=f'With --exact, reuse the distance table in FILE (default: INPUT{FOUNDER_CACHE_SUFFIX}), '
+                             'rebuilding it when the dataset changed')
 
     args = parser.parse_args()
 
     # Load data
-    kitties, root_ids, config, original_data = load_kitties(args.input_file)
-    print(f"Loaded {len(kitties)} kitties from {args.input_file}")
+    ped, root_ids, config, original_data = load_kitties(args.input_file)
+    print(f"Loaded {len(ped)} kitties from {args.input_file}")
     print(f"Root IDs: {root_ids}")
     print(f"Mode: {args.mode}")
 
     # Find ancestors
-    ancestors = prune_to_ancestors(kitties, root_ids, args.mode)
+    distances = None
+    if args.mode == 'exact':
+        cache_path = None
+        if args.founder_cache is not None:
+            cache_path = args.founder_cache or args.input_file + FOUNDER_CACHE_SUFFIX
+        distances = FounderDistances.cached(ped, cache_path)
+    ancestors = prune_to_ancestors(ped, root_ids, args.mode, distances)
 
     # Stats
-    removed = set(kitties.keys()) - ancestors
+    removed = set(ped.index) - ancestors
     print(f"\nAncestor kitties to keep: {len(ancestors)}")
     print(f"Non-ancestor kitties to remove: {len(removed)}")
-    print(f"Reduction: {len(kitties)} → {len(ancestors)} ({100 - len(ancestors)/len(kitties)*100:.1f}% smaller)")
+    print(f"Reduction: {len(ped)} → {len(ancestors)} ({100 - len(ancestors)/len(ped)*100:.1f}% smaller)")
 
     # Generation breakdown
     gen_kept = {}
     gen_removed = {}
+    def generation(kid: int):
+        gen = ped.generation[ped.index[kid]]
+        return gen if gen >= 0 else '?'
+
     for kid in ancestors:
-        gen = kitties[kid].get('generation', '?')
+        gen = generation(kid)
         gen_kept[gen] = gen_kept.get(gen, 0) + 1
     for kid in removed:
-        gen = kitties[kid].get('generation', '?')
+        gen = generation(kid)
         gen_removed[gen] = gen_removed.get(gen, 0) + 1
 
     print("\nBy generation:")
@@ -198,8 +168,20 @@ def main():
         rem = gen_removed.get(gen, 0)
         print(f"{gen:>4} {kept:>6} {rem:>8}")
 
+    if args.per_root:
+        print("\nAncestors per root (root included):")
+        for root_id, count in ancestors_per_root(ped, root_ids).items():
+            print(f"  #{root_id:>7} {count:>6}")
+
+    if distances is not None:
+        print("\nHops to Gen 0 per root:")
+        for root_id in root_ids:
+            i = ped.index_of(root_id)
+            hops = distances.dist[i] if i >= 0 else -1
+            print(f"  #{root_id:>7} {hops if hops >= 0 else 'no founder in dataset':>6}")
+
     # Gen 0 founders in the pruned set
-    founders = [kid for kid in ancestors if kitties[kid].get('generation') == 0]
+    founders = [kid for kid in ancestors if generation(kid) == 0]
     print(f"\nGen 0 founders in ancestry: {len(founders)}")
 
     if args.dry_run:
@@ -213,7 +195,7 @@ def main():
     # Build output
     pruned_kitties = []
     for kid in sorted(ancestors):
-        k = kitties[kid].copy()
+        k = ped.get(kid).copy()
         if not args.keep_raw and 'raw' in k:
             del k['raw']
         pruned_kitties.append(k)
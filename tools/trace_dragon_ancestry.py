@@ -4,172 +4,165 @@ Trace Dragon's ancestry to create a demo showing:
 - Dragon's full ancestry tree (all ancestors, not just shortest path)
 - #1461 highlighted as the notable ancestor
 
+The tree is crawled with ck_fetch's level-by-level BFS: each generation's
+unseen ancestors go out as comma-joined id batches on concurrent workers,
+through the shared response cache, paced by one rate limiter. The result is
+written as an aggregation JSON the viewer loads, and the shortest path to the
+notable ancestor is found with a parent-pointer BFS over the pedigree.
+
 Usage:
   python3 trace_dragon_ancestry.py
+  python3 trace_dragon_ancestry.py --id 896775 --target 1461 --depth 14 -o dragon.json
+  python3 trace_dragon_ancestry.py --cache-dir        # reuse/populate the shared response cache
+  python3 trace_dragon_ancestry.py --offline          # cache only, no network
 """
 
+import argparse
 import json
-import requests
+import logging
 import time
 from collections import deque
-from typing import Dict, List, Optional, Any, Set
+from typing import List, Optional
 
-API_BASE = "https://api.cryptokitties.co/v3"
-KITTIES_ENDPOINT = f"{API_BASE}/kitties"
+from ck_cache import add_cache_args, cache_from_args
+from ck_fetch import Config, build_aggregation
+from ck_http import add_http_args, add_rate_limit_args
+from ck_kinship import Kinship
+from ck_pedigree import Pedigree
 
 MAX_RETRIES = 8
 BACKOFF_BASE_S = 0.75
+DEFAULT_MAX_RPS = 6.0
+DEFAULT_WORKERS = 8
+DEFAULT_BATCH_SIZE = 50
 
 DRAGON_ID = 896775
 TARGET_ID = 1461
-
-
-def request_with_retry(url: str, timeout: int = 30) -> Optional[requests.Response]:
-    """Make a GET request with exponential backoff retry."""
-    last_err = None
-    for attempt in range(MAX_RETRIES):
-        try:
-            resp = requests.get(url, timeout=timeout)
-            if resp.status_code == 429:
-                sleep_time = BACKOFF_BASE_S * (2 ** attempt)
-                print(f"  429 rate limited, sleeping {sleep_time:.2f}s")
-                time.sleep(sleep_time)
-                continue
-            if resp.status_code == 404:
-                return None
-            resp.raise_for_status()
-            return resp
-        except requests.exceptions.RequestException as e:
-            last_err = e
-            sleep_time = BACKOFF_BASE_S * (2 ** attempt)
-            print(f"  Request failed ({e}), retrying...")
-            time.sleep(sleep_time)
-    print(f"  Failed after {MAX_RETRIES} retries: {url}")
-    return None
-
-
-def fetch_kitty(kitty_id: int) -> Optional[Dict[str, Any]]:
-    resp = request_with_retry(f"{KITTIES_ENDPOINT}/{kitty_id}")
-    if resp:
-        return resp.json()
-    return None
-
-
-def fetch_full_ancestry(start_id: int, max_depth: int = 12) -> Dict[int, Any]:
+DEFAULT_DEPTH = 12
+DEFAULT_OUT = '../dist/examples/shortest_path/dragon_1461_connection.json'
+
+
+def ancestry_config(args: argparse.Namespace) -> Config:
+    """ck_fetch crawl settings for a parents-only walk of --depth generations."""
+    return Config(
+        parent_levels=max(0, args.depth),
+        child_levels=0,
+        child_parent_levels=0,
+        child_page_limit=100,
+        request_timeout_s=30,
+        sleep_s=0.0,
+        max_total_kitties=max(1, args.max_total),
+        user_agent="ck-trace-ancestry/1.0",
+        max_retries=MAX_RETRIES,
+        backoff_base_s=BACKOFF_BASE_S,
+        shadow_mode="darken",
+        shadow_factor=0.18,
+        css_url="",
+        css_palette_enabled=False,
+        embedded_only=False,
+        workers=max(1, args.workers),
+        max_rps=max(0.0, args.max_rps),
+        batch_size=max(0, min(100, args.batch_size)),
+        pool_size=max(1, args.pool_size),
+        keepalive_s=max(0.0, args.keepalive),
+        http2=args.http2,
+    )
+
+
+def find_path_to_target(ped: Pedigree, start_id: int, target_id: int) -> Optional[List[int]]:
     """
-    Fetch full ancestry tree (both parents at each level).
-    Returns dict of kitty_id -> kitty data.
+    Fewest-generation path from start up to target through the fetched ancestry.
+    Parent-pointer BFS: each kitty records the child it was reached from, and the
+    path is rebuilt once by walking those pointers back from the target.
     """
-    kitties: Dict[int, Any] = {}
-    queue = deque([(start_id, 0)])
-
-    print(f"Fetching full ancestry of #{start_id} (max depth {max_depth})...")
-
-    while queue:
-        kid, depth = queue.popleft()
-
-        if depth > max_depth:
-            continue
-        if kid in kitties:
-            continue
-
-        print(f"  Depth {depth}: fetching #{kid}...")
-        k = fetch_kitty(kid)
-        if not k:
-            continue
-
-        kitties[kid] = k
-        gen = k.get('generation', '?')
-        name = k.get('name', 'unnamed')
-
-        # Extract parent IDs
-        matron = k.get('matron_id') or (k.get('matron', {}) or {}).get('id')
-        sire = k.get('sire_id') or (k.get('sire', {}) or {}).get('id')
-
-        print(f"    -> {name} (Gen {gen}), parents: {matron}, {sire}")
-
-        # Queue both parents
-        if matron:
-            queue.append((int(matron), depth + 1))
-        if sire:
-            queue.append((int(sire), depth + 1))
-
-        time.sleep(0.15)
-
-    return kitties
-
-
-def find_path_to_target(kitties: Dict[int, Any], start_id: int, target_id: int) -> Optional[List[int]]:
-    """Find path from start to target through ancestry."""
-    if target_id not in kitties:
+    start, target = ped.index_of(start_id), ped.index_of(target_id)
+    if start < 0 or target < 0:
         return None
 
-    # BFS through the fetched kitties
-    visited = set()
-    queue = deque([(start_id, [start_id])])
-
+    reached_from = {start: -1}
+    queue = deque([start])
     while queue:
-        kid, path = queue.popleft()
-
-        if kid == target_id:
-            return path
-
-        if kid in visited or kid not in kitties:
-            continue
-        visited.add(kid)
-
-        k = kitties[kid]
-        matron = k.get('matron_id') or (k.get('matron', {}) or {}).get('id')
-        sire = k.get('sire_id') or (k.get('sire', {}) or {}).get('id')
-
-        if matron:
-            queue.append((int(matron), path + [int(matron)]))
-        if sire:
-            queue.append((int(sire), path + [int(sire)]))
-
+        i = queue.popleft()
+        if i == target:
+            path = []
+            while i >= 0:
+                path.append(ped.ids[i])
+                i = reached_from[i]
+            return path[::-1]
+        for p in ped.parents_of(i):
+            if p >= 0 and p not in reached_from:
+                reached_from[p] = i
+                queue.append(p)
     return None
 
 
 def main():
-    # Fetch Dragon's full ancestry tree
-    kitties = fetch_full_ancestry(DRAGON_ID, max_depth=12)
-
-    print(f"\nFetched {len(kitties)} ancestors")
-
-    # Check if #1461 is in the ancestry
-    if TARGET_ID in kitties:
-        print(f"\n✓ #{TARGET_ID} found in Dragon's ancestry!")
+    parser = argparse.ArgumentParser(description="Trace Dragon's full ancestry tree")
+    parser.add_argument('--id', type=int, default=DRAGON_ID, help=f'Kitty to trace (default {DRAGON_ID}, Dragon)')
+    parser.add_argument('--target', type=int, default=TARGET_ID,
+                        help=f'Notable ancestor to find (default {TARGET_ID})')
+    parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH,
+                        help=f'Parent generations to fetch (default {DEFAULT_DEPTH})')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUT, help=f'Output aggregation JSON (default {DEFAULT_OUT})')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Concurrent requests per generation (default {DEFAULT_WORKERS})')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'Ids per batched request, 0 = one request per kitty (default {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--max-total', type=int, default=20000, help='Hard cap on fetched kitties (default 20000)')
+    parser.add_argument('-v', '--verbose', action='count', default=0, help='-v: log each level, -vv: each request')
+    add_rate_limit_args(parser, DEFAULT_MAX_RPS)
+    add_cache_args(parser)
+    add_http_args(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=[logging.WARNING, logging.INFO, logging.DEBUG][min(args.verbose, 2)],
+                        format="%(asctime)s %(levelname)s %(message)s")
+    cache = cache_from_args(args)
+
+    # Fetch the full ancestry tree, one generation per batched, concurrent level
+    print(f"Fetching full ancestry of #{args.id} (max depth {args.depth})...")
+    t0 = time.perf_counter()
+    payload = build_aggregation([args.id], ancestry_config(args), cache)
+    elapsed = time.perf_counter() - t0
+    ped = Pedigree.from_payload(payload, keep_records=False)
+
+    print(f"\nFetched {len(ped)} ancestors in {elapsed:.1f} s ({payload['counts']['errors']} errors)")
+
+    # Check if the target is in the ancestry
+    if args.target in ped:
+        print(f"\n✓ #{args.target} found in #{args.id}'s ancestry!")
 
         # Find the specific path
-        path = find_path_to_target(kitties, DRAGON_ID, TARGET_ID)
+        path = find_path_to_target(ped, args.id, args.target)
         if path:
             print(f"\nShortest path ({len(path)} generations):")
             print(f"  {' -> '.join(str(x) for x in path)}")
+        kin = Kinship(ped)
+        a, b = ped.index_of(args.id), ped.index_of(args.target)
+        print(f"Relationship: {kin.relationship(a, b):.6f} (kinship {kin.kinship(a, b):.6f})")
     else:
-        print(f"\n✗ #{TARGET_ID} not found in fetched ancestry")
-        print("  Try increasing max_depth")
+        print(f"\n✗ #{args.target} not found in fetched ancestry")
+        print("  Try increasing --depth")
 
-    # Build output JSON
-    output = {
-        "generated": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-        "description": f"Dragon (#{DRAGON_ID}) full ancestry tree - #{TARGET_ID} is a notable ancestor",
-        "root_ids": [DRAGON_ID],
-        "notable_ancestor": TARGET_ID,
-        "kitties": list(kitties.values())
-    }
+    # Aggregation JSON the viewer loads, plus the demo's description
+    payload["description"] = f"#{args.id} full ancestry tree - #{args.target} is a notable ancestor"
+    payload["notable_ancestor"] = args.target
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
 
-    out_path = '../dist/examples/shortest_path/dragon_1461_connection.json'
-    with open(out_path, 'w') as f:
-        json.dump(output, f, indent=2)
-
-    print(f"\n✓ Wrote {len(kitties)} kitties to {out_path}")
+    print(f"\n✓ Wrote {len(ped)} kitties to {args.output}")
 
     # Stats
     gens = {}
-    for k in kitties.values():
-        g = k.get('generation', '?')
+    for g in ped.generation:
+        g = g if g >= 0 else '?'
         gens[g] = gens.get(g, 0) + 1
-    print(f"\nBy generation: {dict(sorted(gens.items()))}")
+    print(f"\nBy generation: {dict(sorted(gens.items(), key=lambda kv: kv[0] if isinstance(kv[0], int) else 999))}")
+
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Cache: {stats['hits']} hits, {stats['misses']} misses ({stats['path']})")
+        cache.close()
 
 
 if __name__ == '__main__':